@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import DailyExpenseTotal, DailyIncomeTotal, MonthlyExpenseTotal, MonthlyIncomeTotal
+
+# Register your models here.
+admin.site.register(DailyExpenseTotal)
+admin.site.register(MonthlyExpenseTotal)
+admin.site.register(DailyIncomeTotal)
+admin.site.register(MonthlyIncomeTotal)
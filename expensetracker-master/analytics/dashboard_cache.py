@@ -0,0 +1,72 @@
+# analytics/dashboard_cache.py
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+
+class DashboardCache:
+    """
+    Per-user cache for dashboard numbers, invalidated by writes rather than by time.
+
+    Every user has a data version kept in the ``DASHBOARD_CACHE`` alias, and
+    each cached value's key includes it. ``analytics.signals`` bumps the
+    version after any write to the user's expenses, income, limit or
+    preferences, so the next dashboard load misses and recomputes while the
+    old entries simply age out. Values are only reused within one day,
+    because "today" and "this week" move even when nothing is written.
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.DASHBOARD_CACHE]
+
+    def version_key(self, user_id):
+        return f'dashboard-version:{user_id}'
+
+    def data_version(self, user_id):
+        key = self.version_key(user_id)
+        version = self.cache.get(key)
+        if version is None:
+            # A fresh token rather than a counter, so a version that was
+            # evicted can never come back and match entries computed under it.
+            version = self._new_version()
+            if not self.cache.add(key, version, None):
+                version = self.cache.get(key, version)
+        return version
+
+    def data_versions(self, user_ids):
+        """Return {user id: data version} for many users with one cache read."""
+        keys = {self.version_key(user_id): user_id for user_id in user_ids}
+        found = self.cache.get_many(keys)
+        versions = {keys[key]: version for key, version in found.items()}
+        for key, user_id in keys.items():
+            if key not in found:
+                versions[user_id] = self.data_version(user_id)
+        return versions
+
+    def bump(self, user_id):
+        self.cache.set(self.version_key(user_id), self._new_version(), None)
+
+    def key(self, user_id, name, *parts):
+        today = timezone.localdate().isoformat()
+        return ':'.join(['dashboard', str(user_id), self.data_version(user_id), today, name, *map(str, parts)])
+
+    def get_or_compute(self, user_id, name, compute, *parts):
+        """Return the cached value of ``compute()`` for this user, computing it on a miss."""
+        key = self.key(user_id, name, *parts)
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            self.cache.set(key, value)
+        return value
+
+    def _new_version(self):
+        return format(time.time_ns(), 'x')
+
+
+dashboard_cache = DashboardCache()
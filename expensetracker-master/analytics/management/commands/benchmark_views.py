@@ -0,0 +1,192 @@
+import datetime
+import json
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from analytics.dashboard_cache import dashboard_cache
+from analytics.rollups import EXPENSES, INCOME
+from api.benchmarks import ROLLED_BACK_NOTE, PeakRssGrowth, percentiles, rolled_back, seed_transactions
+from search import index as search_index
+from search.backends import get_backend
+
+
+START = datetime.date(2024, 1, 1)
+END = datetime.date(2024, 12, 31)
+REPORT_RANGE = {'start_date': START.isoformat(), 'end_date': END.isoformat()}
+
+
+class View:
+    """One request the benchmark drives, with the most SQL queries it may run."""
+
+    def __init__(self, url_name, query_budget, method='get', params=None, body=None, default=True):
+        self.url_name = url_name
+        self.query_budget = query_budget
+        self.method = method
+        self.params = params or {}
+        self.body = body
+        self.default = default
+
+    def request(self, client):
+        url = reverse(self.url_name)
+        if self.method == 'post':
+            response = client.post(url, json.dumps(self.body), content_type='application/json')
+        else:
+            response = client.get(url, self.params)
+        # Drain streamed responses so their queries and rendering are measured.
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(content)
+
+
+# Budgets are for a cold dashboard cache and must hold at every history size:
+# a view whose query count grows with the rows is a regression. Session and
+# user lookups are included.
+VIEWS = {
+    'expenses-index': View('expenses', 5),
+    'expenses-index-sorted': View('expenses', 5, params={'sort': 'amount_desc', 'page': '40'}),
+    'income-index': View('income', 5),
+    'income-index-sorted': View('income', 5, params={'sort': 'date_asc', 'page': '40'}),
+    'search-expenses': View('search_expenses', 3, method='post', body={'searchText': '2024-03-0'}),
+    'search-expenses-text': View('search_expenses', 3, method='post', body={'searchText': 'bench 3'}),
+    'search-income': View('search_income', 3, method='post', body={'searchText': 'Freelance'}),
+    'suggest-expenses': View('suggest_expenses', 3, params={'q': 'ben'}),
+    'suggest-income': View('suggest_income', 3, params={'q': 'fr'}),
+    'expense-category-summary': View('expense_category_summary', 4),
+    'income-summary': View('income-summary', 4),
+    'monthly-income-data': View('monthly_income_data', 4),
+    # Without a cached snapshot the exports stream each section's rows and SUM it.
+    'export-csv': View('export_csv', 6, params=REPORT_RANGE),
+    'export-xlsx': View('export_xlsx', 6, params=REPORT_RANGE),
+    # Renders the whole year through xhtml2pdf inside the request; opt in with --views.
+    'export-pdf': View('export_pdf', 10, params=REPORT_RANGE, default=False),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a user with synthetic history and drive the list, search, summary and export views '
+        'through the test client, recording latency percentiles, SQL query counts and memory. '
+        'Fails when a view exceeds its query budget or regresses against --baseline. ' + ROLLED_BACK_NOTE
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Transactions per seeded user, split evenly between income and expenses')
+        parser.add_argument('--views', nargs='+', choices=sorted(VIEWS),
+                            default=[name for name, view in VIEWS.items() if view.default])
+        parser.add_argument('--requests', type=int, default=20, help='Warm requests timed per view')
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='Also record the peak Python heap of one cold request with tracemalloc')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', help='Results JSON of an earlier run to compare warm p50 latency with')
+        parser.add_argument('--threshold', type=float, default=1.5,
+                            help='Fail when a warm p50 exceeds the baseline by this factor')
+        parser.add_argument('--min-regression-ms', type=float, default=5.0,
+                            help='Ignore slowdowns smaller than this, which are timer noise')
+        parser.add_argument('--output', help='Write the results as JSON to this file (usable as a baseline)')
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = {(run['view'], run['rows']): run for run in json.load(source)['runs']}
+
+        results = {'seed': options['seed'], 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'runs': []}
+        failures = []
+        self.stdout.write(
+            f"{'rows':>8} {'view':<26} {'status':>6} {'cold ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'budget':>6} {'rss +MB':>8} {'heap MB':>8}")
+        for size in sorted(options['sizes']):
+            with rolled_back():
+                owner = self.seed(size, options['seed'])
+                # Server errors are recorded and reported, not raised.
+                client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+                client.force_login(owner)
+                for name in options['views']:
+                    run = self.measure(name, VIEWS[name], client, owner, options)
+                    run['rows'] = size
+                    results['runs'].append(run)
+                    failures.extend(self.violations(run, baseline.get((name, size)), options))
+                    self.write_run(run)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def seed(self, size, seed):
+        owner = User.objects.create_user(username=f'view-benchmark-{size}')
+        seed_transactions(owner, size, START, seed=seed)
+        # The summary views read the rollups and the searches the search
+        # index, which bulk inserts bypass.
+        for spec in (EXPENSES, INCOME):
+            spec.rebuild(owner_id=owner.pk)
+        search_backend = get_backend()
+        for spec in (search_index.EXPENSES, search_index.INCOME):
+            search_backend.rebuild(spec, owner_id=owner.pk)
+        return owner
+
+    def measure(self, name, view, client, owner, options):
+        with PeakRssGrowth() as rss:
+            # A new data version makes the first request miss every per-user cache.
+            dashboard_cache.bump(owner.pk)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                status, size = view.request(client)
+                cold = time.perf_counter() - started
+            query_counts = [len(queries)]
+
+            samples = []
+            for _ in range(options['requests']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    view.request(client)
+                    samples.append(time.perf_counter() - started)
+                query_counts.append(len(queries))
+
+        run = {
+            'view': name,
+            'status': status,
+            'bytes': size,
+            'cold_ms': round(cold * 1000, 3),
+            'warm': percentiles(samples),
+            'queries': max(query_counts),
+            'warm_queries': min(query_counts),
+            'query_budget': view.query_budget,
+            'peak_rss_growth_bytes': rss.bytes,
+        }
+        if options['trace_memory']:
+            dashboard_cache.bump(owner.pk)
+            tracemalloc.start()
+            view.request(client)
+            run['heap_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return run
+
+    def violations(self, run, previous, options):
+        label = f"{run['view']} at {run['rows']} rows"
+        if run['status'] >= 400:
+            yield f"{label}: HTTP {run['status']}"
+        if run['queries'] > run['query_budget']:
+            yield f"{label}: {run['queries']} queries, budget {run['query_budget']}"
+        if previous is not None and previous['warm']['p50'] is not None:
+            before, now = previous['warm']['p50'], run['warm']['p50']
+            if now > before * options['threshold'] and now - before > options['min_regression_ms']:
+                yield f"{label}: warm p50 {now:.1f} ms, baseline {before:.1f} ms"
+
+    def write_run(self, run):
+        heap = run.get('heap_peak_bytes')
+        warm = run['warm']
+        self.stdout.write(
+            f"{run['rows']:>8} {run['view']:<26} {run['status']:>6} {run['cold_ms']:>9.1f} "
+            f"{warm['p50'] or 0:>8.1f} {warm['p95'] or 0:>8.1f} {warm['p99'] or 0:>8.1f} "
+            f"{run['queries']:>8} {run['query_budget']:>6} {run['peak_rss_growth_bytes'] / 2 ** 20:>8.1f} "
+            f"{heap / 2 ** 20 if heap is not None else float('nan'):>8.1f}")
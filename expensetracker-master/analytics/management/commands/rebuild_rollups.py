@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import EXPENSES, INCOME
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily and monthly expense and income rollups from the transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the rollups of this user id')
+
+    def handle(self, *args, **options):
+        for label, spec in (('expense', EXPENSES), ('income', INCOME)):
+            rows = spec.rebuild(owner_id=options['user'])
+            self.stdout.write(f'{rows} {label} rollup rows written')
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def populate_rollups(apps, schema_editor):
+    from analytics.rollups import RollupSpec
+
+    RollupSpec(
+        apps.get_model('expenses', 'Expense'), 'category_id',
+        apps.get_model('analytics', 'DailyExpenseTotal'), apps.get_model('analytics', 'MonthlyExpenseTotal'),
+    ).rebuild()
+    RollupSpec(
+        apps.get_model('userincome', 'UserIncome'), 'source',
+        apps.get_model('analytics', 'DailyIncomeTotal'), apps.get_model('analytics', 'MonthlyIncomeTotal'),
+    ).rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('userincome', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
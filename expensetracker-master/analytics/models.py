@@ -0,0 +1,57 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+from expenses.models import Category
+
+
+class Rollup(models.Model):
+    """
+    Running total of one owner's transactions in one bucket.
+
+    ``period`` is the day for daily rollups and the first day of the month
+    for monthly ones. Rows are kept current by ``analytics.signals`` and can
+    be rebuilt from scratch with ``manage.py rebuild_rollups``.
+    """
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    period = models.DateField()
+    total = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyExpenseTotal(Rollup):
+    category = models.ForeignKey(to=Category, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'period', 'category'], name='unique_daily_expense_total'),
+        ]
+
+
+class MonthlyExpenseTotal(Rollup):
+    category = models.ForeignKey(to=Category, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'period', 'category'], name='unique_monthly_expense_total'),
+        ]
+
+
+class DailyIncomeTotal(Rollup):
+    source = models.CharField(max_length=266)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'period', 'source'], name='unique_daily_income_total'),
+        ]
+
+
+class MonthlyIncomeTotal(Rollup):
+    source = models.CharField(max_length=266)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'period', 'source'], name='unique_monthly_income_total'),
+        ]
@@ -0,0 +1,108 @@
+# analytics/rollups.py
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from expenses.models import Expense
+from userincome.models import UserIncome
+from .models import DailyExpenseTotal, DailyIncomeTotal, MonthlyExpenseTotal, MonthlyIncomeTotal
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+class RollupSpec:
+    """
+    How one transaction model is rolled up into its daily and monthly tables.
+
+    ``key`` names the grouping column, which has the same name on the
+    transaction model and on both rollup tables (``category_id`` for
+    expenses, ``source`` for income). An entry is the
+    ``(owner_id, date, key, amount)`` tuple a transaction contributes.
+    """
+
+    def __init__(self, model, key, daily, monthly):
+        self.model = model
+        self.key = key
+        self.daily = daily
+        self.monthly = monthly
+
+    def entry(self, instance):
+        # Views assign the raw POST strings before saving, so normalise here.
+        date = self.model._meta.get_field('date').to_python(instance.date)
+        return instance.owner_id, date, getattr(instance, self.key), float(instance.amount)
+
+    def stored_entry(self, pk):
+        return self.model.objects.filter(pk=pk).values_list('owner_id', 'date', self.key, 'amount').first()
+
+    def replace(self, old, new):
+        """Move a transaction's contribution from entry ``old`` to entry ``new``; either may be None."""
+        if old is not None and new is not None and old[:3] == new[:3]:
+            if new[3] != old[3]:
+                self.add(new, new[3] - old[3], 0)
+            return
+        if old is not None:
+            self.add(old, -old[3], -1)
+        if new is not None:
+            self.add(new, new[3], 1)
+
+    def add(self, entry, amount, count):
+        owner_id, date, key, _ = entry
+        for table, period in ((self.daily, date), (self.monthly, month_start(date))):
+            self._add(table, {'owner_id': owner_id, 'period': period, self.key: key}, amount, count)
+
+    def _add(self, table, bucket, amount, count):
+        updated = table.objects.filter(**bucket).update(total=F('total') + amount, count=F('count') + count)
+        if count < 0:
+            table.objects.filter(count__lte=0, **bucket).delete()
+        if updated or count <= 0:
+            # Removals never create rows, so a cascading delete of the owner
+            # or category cannot resurrect a bucket that is being deleted.
+            return
+        try:
+            with transaction.atomic():
+                table.objects.create(total=amount, count=count, **bucket)
+        except IntegrityError:
+            # Another writer created the bucket between our update and insert.
+            table.objects.filter(**bucket).update(total=F('total') + amount, count=F('count') + count)
+
+    def rebuild(self, owner_id=None, batch_size=1000):
+        """Recompute both tables from the transactions, for one owner or everybody."""
+        transactions = self.model.objects.all()
+        if owner_id is not None:
+            transactions = transactions.filter(owner_id=owner_id)
+
+        with transaction.atomic():
+            rows = 0
+            for table, period in ((self.daily, F('date')), (self.monthly, TruncMonth('date'))):
+                existing = table.objects.all()
+                if owner_id is not None:
+                    existing = existing.filter(owner_id=owner_id)
+                existing.delete()
+
+                groups = (
+                    transactions.annotate(bucket=period)
+                    .values('owner_id', 'bucket', self.key)
+                    .annotate(bucket_total=Sum('amount'), bucket_count=Count('id'))
+                    .order_by()
+                )
+                batch = []
+                for group in groups.iterator(chunk_size=batch_size):
+                    batch.append(table(
+                        owner_id=group['owner_id'], period=group['bucket'], total=group['bucket_total'],
+                        count=group['bucket_count'], **{self.key: group[self.key]},
+                    ))
+                    if len(batch) >= batch_size:
+                        table.objects.bulk_create(batch)
+                        rows += len(batch)
+                        batch = []
+                table.objects.bulk_create(batch)
+                rows += len(batch)
+        return rows
+
+
+EXPENSES = RollupSpec(Expense, 'category_id', DailyExpenseTotal, MonthlyExpenseTotal)
+INCOME = RollupSpec(UserIncome, 'source', DailyIncomeTotal, MonthlyIncomeTotal)
+
+SPECS = {Expense: EXPENSES, UserIncome: INCOME}
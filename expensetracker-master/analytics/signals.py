@@ -0,0 +1,65 @@
+# analytics/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from expenses.models import Category, Expense, ExpenseLimit
+from userincome.models import UserIncome
+from userpreferences.models import UserPreference
+from .dashboard_cache import dashboard_cache
+from .rollups import SPECS
+
+
+# Model.save() and delete() keep the rollups current. Queryset update(),
+# bulk_create() and raw SQL bypass these signals; run rebuild_rollups
+# after using them.
+
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=UserIncome)
+def remember_rollup_entry(sender, instance, raw=False, **kwargs):
+    instance._rollup_entry = None
+    if not raw and instance.pk is not None and not instance._state.adding:
+        instance._rollup_entry = SPECS[sender].stored_entry(instance.pk)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=UserIncome)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        spec = SPECS[sender]
+        spec.replace(getattr(instance, '_rollup_entry', None), spec.entry(instance))
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=UserIncome)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    spec = SPECS[sender]
+    spec.replace(spec.entry(instance), None)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=UserIncome)
+@receiver(post_save, sender=ExpenseLimit)
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=UserIncome)
+@receiver(post_delete, sender=ExpenseLimit)
+@receiver(post_delete, sender=UserPreference)
+def bump_dashboard_version(sender, instance, **kwargs):
+    user_id = instance.user_id if sender is UserPreference else instance.owner_id
+    # After commit, so a dashboard read racing the write can't cache the
+    # old numbers under the new version.
+    transaction.on_commit(lambda: dashboard_cache.bump(user_id))
+
+
+@receiver(post_save, sender=Category)
+def bump_dashboard_versions_on_category_rename(sender, instance, created=False, raw=False, **kwargs):
+    # Cached summaries and search suggestions show category names.
+    if not created and not raw:
+        owner_ids = list(Expense.objects.filter(category=instance).values_list('owner_id', flat=True).distinct())
+
+        def bump_owners():
+            for owner_id in owner_ids:
+                dashboard_cache.bump(owner_id)
+
+        transaction.on_commit(bump_owners)
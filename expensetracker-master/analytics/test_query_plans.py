@@ -0,0 +1,87 @@
+"""
+Query plan checks for the owner-scoped hot queries.
+
+Each view of the benchmark (``manage.py benchmark_views``) is requested
+for a seeded user, and every query it runs against the transaction and
+rollup tables is run again under ``EXPLAIN QUERY PLAN``. A plan that
+scans one of those tables instead of searching an index fails the test:
+the query would read every user's rows.
+"""
+import re
+import unittest
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from analytics.management.commands.benchmark_views import VIEWS, Command as BenchmarkViews
+from expenses.models import Category
+from expenses.pagination import KeysetPaginator, sort_ordering
+from userincome.models import UserIncome
+
+HOT_TABLES = {
+    'expenses_expense', 'expenses_category', 'userincome_userincome', 'userincome_source',
+    'analytics_dailyexpensetotal', 'analytics_monthlyexpensetotal',
+    'analytics_dailyincometotal', 'analytics_monthlyincometotal',
+}
+TRANSACTION_TABLES = {'expenses_expense', 'userincome_userincome'}
+# "SCAN expenses_expense" and "SCAN expenses_expense USING INDEX ..." both
+# read the whole table; "SEARCH ..." reads a range of an index.
+SCAN = re.compile(r'^SCAN (\w+)')
+SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def unindexed_steps(sql):
+    """Return the plan steps of ``sql`` that scan a hot table or sort a transaction table."""
+    sorts_in_index = any(table in sql for table in TRANSACTION_TABLES) and '_fts' not in sql
+    return [step for step in query_plan(sql)
+            if (match := SCAN.match(step)) and match.group(1) in HOT_TABLES
+            or step == SORT and sorts_in_index]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = BenchmarkViews().seed(40, 0)
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.owner)
+
+    def assertIndexed(self, queries, label):
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(label, sql=sql):
+                self.assertEqual(unindexed_steps(sql), [])
+
+    def test_views_search_indexes(self):
+        for name, view in VIEWS.items():
+            if not view.default:
+                continue
+            with CaptureQueriesContext(connection) as queries:
+                status, _ = view.request(self.client)
+            self.assertEqual(status, 200, name)
+            self.assertIndexed(queries, name)
+
+    def test_list_pages_seek_by_every_sort(self):
+        for sort in ('amount_asc', 'amount_desc', 'date_asc', 'date_desc'):
+            paginator = KeysetPaginator(UserIncome.objects.filter(owner=self.owner), 5, sort_ordering(sort))
+            cursor = paginator.get_page(None).next_page_number()
+            with CaptureQueriesContext(connection) as queries:
+                paginator.get_page(cursor)
+                paginator.get_page(str(paginator.num_pages))
+            self.assertIndexed(queries, sort)
+
+    def test_category_lookup_by_name(self):
+        with CaptureQueriesContext(connection) as queries:
+            Category.objects.get(name='Benchmark 1')
+        self.assertIndexed(queries, 'category')
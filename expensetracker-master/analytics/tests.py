@@ -0,0 +1,302 @@
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.models import Category, Expense, ExpenseLimit
+from userincome.models import UserIncome
+from userpreferences.models import UserPreference
+from .dashboard_cache import dashboard_cache
+from .management.commands.benchmark_views import VIEWS, View
+from .models import DailyExpenseTotal, DailyIncomeTotal, MonthlyExpenseTotal, MonthlyIncomeTotal
+from .rollups import EXPENSES, INCOME
+from .totals import grouped_totals, monthly_series, totals_by
+
+
+def rollup_rows(table):
+    return sorted(table.objects.values_list('owner_id', 'period', 'total', 'count', *(
+        ['category_id'] if table in (DailyExpenseTotal, MonthlyExpenseTotal) else ['source'])))
+
+
+class RollupMaintenanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollups', password='secret')
+        self.food = Category.objects.create(name='Food')
+        self.travel = Category.objects.create(name='Travel')
+
+    def add_expense(self, amount, date, category=None):
+        return Expense.objects.create(
+            owner=self.user, amount=amount, date=date, category=category or self.food, description='x')
+
+    def test_create_adds_to_daily_and_monthly_buckets(self):
+        self.add_expense(10, datetime.date(2024, 3, 5))
+        self.add_expense('2.5', datetime.date(2024, 3, 5))
+        self.add_expense(4, datetime.date(2024, 3, 20))
+
+        daily = DailyExpenseTotal.objects.get(owner=self.user, period=datetime.date(2024, 3, 5), category=self.food)
+        monthly = MonthlyExpenseTotal.objects.get(owner=self.user, period=datetime.date(2024, 3, 1), category=self.food)
+        self.assertEqual((daily.total, daily.count), (12.5, 2))
+        self.assertEqual((monthly.total, monthly.count), (16.5, 3))
+
+    def test_edit_moves_the_amount_between_buckets(self):
+        expense = self.add_expense(10, datetime.date(2024, 3, 5))
+        expense = Expense.objects.get(pk=expense.pk)
+        expense.amount = 7
+        expense.save()
+        self.assertEqual(DailyExpenseTotal.objects.get().total, 7)
+
+        expense.category = self.travel
+        expense.date = datetime.date(2024, 4, 1)
+        expense.save()
+
+        self.assertEqual(
+            list(MonthlyExpenseTotal.objects.values_list('period', 'category_id', 'total', 'count')),
+            [(datetime.date(2024, 4, 1), self.travel.pk, 7, 1)],
+        )
+        self.assertEqual(DailyExpenseTotal.objects.count(), 1)
+
+    def test_delete_removes_empty_buckets(self):
+        kept = self.add_expense(3, datetime.date(2024, 3, 5))
+        removed = self.add_expense(10, datetime.date(2024, 3, 6))
+        removed.delete()
+
+        self.assertEqual(MonthlyExpenseTotal.objects.get().total, 3)
+        self.assertFalse(DailyExpenseTotal.objects.filter(period=datetime.date(2024, 3, 6)).exists())
+        kept.delete()
+        self.assertFalse(MonthlyExpenseTotal.objects.exists())
+
+    def test_deleting_the_owner_cascades_cleanly(self):
+        self.add_expense(3, datetime.date(2024, 3, 5))
+        UserIncome.objects.create(owner=self.user, amount=100, date=datetime.date(2024, 3, 5), source='Salary')
+        self.user.delete()
+
+        self.assertFalse(DailyExpenseTotal.objects.exists())
+        self.assertFalse(MonthlyIncomeTotal.objects.exists())
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        self.add_expense(10, datetime.date(2024, 3, 5))
+        self.add_expense(5, datetime.date(2024, 3, 5), self.travel)
+        moved = self.add_expense(1, datetime.date(2024, 2, 28))
+        moved.date = datetime.date(2024, 3, 31)
+        moved.save()
+        UserIncome.objects.create(owner=self.user, amount=100, date=datetime.date(2024, 3, 1), source='Salary')
+        UserIncome.objects.create(owner=self.user, amount=50, date=datetime.date(2024, 3, 9), source='Salary')
+        tables = [DailyExpenseTotal, MonthlyExpenseTotal, DailyIncomeTotal, MonthlyIncomeTotal]
+        maintained = [rollup_rows(table) for table in tables]
+
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        self.assertEqual([rollup_rows(table) for table in tables], maintained)
+
+
+class GroupedTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='totals', password='secret')
+        self.other = User.objects.create_user(username='someone', password='secret')
+        self.food = Category.objects.create(name='Food')
+        self.travel = Category.objects.create(name='Travel')
+        for day, amount, category in [
+            (datetime.date(2023, 12, 31), 1, self.food),
+            (datetime.date(2024, 1, 1), 2, self.food),   # Monday
+            (datetime.date(2024, 1, 7), 4, self.travel),
+            (datetime.date(2024, 1, 8), 8, self.food),
+            (datetime.date(2024, 2, 29), 16, self.food),
+            (datetime.date(2024, 3, 1), 32, self.travel),
+        ]:
+            Expense.objects.create(owner=self.user, amount=amount, date=day, category=category, description='x')
+        Expense.objects.create(owner=self.other, amount=1000, date=datetime.date(2024, 1, 1),
+                               category=self.food, description='x')
+        UserIncome.objects.create(owner=self.user, amount=100, date=datetime.date(2024, 1, 15), source='Salary')
+        UserIncome.objects.create(owner=self.user, amount=50, date=datetime.date(2024, 1, 20), source='Salary')
+        UserIncome.objects.create(owner=self.user, amount=10, date=datetime.date(2024, 2, 1), source='Gift')
+
+    def totals(self, *args, **kwargs):
+        with self.assertNumQueries(1):
+            return grouped_totals(*args, **kwargs)
+
+    def test_whole_range_total(self):
+        rows = self.totals(EXPENSES, self.user, datetime.date(2024, 1, 1), datetime.date(2024, 2, 29))
+        self.assertEqual(rows, [{'total': 30, 'count': 4}])
+        self.assertEqual(self.totals(EXPENSES, self.user)[0]['total'], 63)
+        self.assertEqual(self.totals(INCOME, self.user, datetime.date(2025, 1, 1))[0], {'total': 0, 'count': 0})
+
+    def test_buckets_by_week_month_and_year(self):
+        weeks = self.totals(EXPENSES, self.user, datetime.date(2023, 12, 31), datetime.date(2024, 1, 14), bucket='week')
+        self.assertEqual(
+            [(row['bucket'], row['total']) for row in weeks],
+            [(datetime.date(2023, 12, 25), 1), (datetime.date(2024, 1, 1), 6), (datetime.date(2024, 1, 8), 8)],
+        )
+        months = self.totals(EXPENSES, self.user, datetime.date(2024, 1, 5), datetime.date(2024, 3, 1), bucket='month')
+        self.assertEqual(
+            [(row['bucket'], row['total']) for row in months],
+            [(datetime.date(2024, 1, 1), 12), (datetime.date(2024, 2, 1), 16), (datetime.date(2024, 3, 1), 32)],
+        )
+        years = self.totals(EXPENSES, self.user, bucket='year')
+        self.assertEqual([(row['bucket'], row['total']) for row in years],
+                         [(datetime.date(2023, 1, 1), 1), (datetime.date(2024, 1, 1), 62)])
+
+    def test_grouped_by_category_and_source(self):
+        self.assertEqual(
+            self.totals(EXPENSES, self.user, datetime.date(2024, 1, 1), datetime.date(2024, 1, 31), bucket='month', by='category'),
+            [{'bucket': datetime.date(2024, 1, 1), 'category': 'Food', 'total': 10, 'count': 2},
+             {'bucket': datetime.date(2024, 1, 1), 'category': 'Travel', 'total': 4, 'count': 1}],
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(totals_by(INCOME, self.user, datetime.date(2024, 1, 16), None, by='source'),
+                             {'Salary': 50, 'Gift': 10})
+
+    def test_matches_a_scan_of_the_transactions(self):
+        start, end = datetime.date(2023, 12, 30), datetime.date(2024, 2, 29)
+        expected = {}
+        for expense in Expense.objects.filter(owner=self.user, date__range=(start, end)):
+            key = (expense.date.replace(day=1), expense.category.name)
+            expected[key] = expected.get(key, 0) + expense.amount
+        rows = self.totals(EXPENSES, self.user, start, end, bucket='month', by='category')
+        self.assertEqual({(row['bucket'], row['category']): row['total'] for row in rows}, expected)
+        self.assertEqual(monthly_series(INCOME, self.user, 2024)[:3], [150, 10, 0])
+
+    def test_reads_monthly_rows_only_when_no_month_is_split(self):
+        with self.assertNumQueries(1) as queries:
+            grouped_totals(EXPENSES, self.user, datetime.date(2024, 1, 1), datetime.date(2024, 2, 29), bucket='month')
+        self.assertIn('analytics_monthlyexpensetotal', queries.captured_queries[0]['sql'])
+        with self.assertNumQueries(1) as queries:
+            grouped_totals(EXPENSES, self.user, datetime.date(2024, 1, 1), datetime.date(2024, 2, 28), bucket='month')
+        self.assertIn('analytics_dailyexpensetotal', queries.captured_queries[0]['sql'])
+
+    def test_rejects_unknown_buckets_and_groups(self):
+        with self.assertRaises(ValueError):
+            grouped_totals(EXPENSES, self.user, bucket='quarter')
+        with self.assertRaises(ValueError):
+            grouped_totals(INCOME, self.user, by='category')
+
+
+class RollupDashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dashboard', password='secret')
+        self.other = User.objects.create_user(username='other', password='secret')
+        self.client.login(username='dashboard', password='secret')
+        self.today = datetime.date.today()
+        caches['dashboards'].clear()
+
+    def test_monthly_income_sums_every_entry_in_the_month(self):
+        month = self.today.replace(day=1)
+        UserIncome.objects.create(owner=self.user, amount=100, date=month, source='Salary')
+        UserIncome.objects.create(owner=self.user, amount=25, date=month, source='Gift')
+        UserIncome.objects.create(owner=self.other, amount=999, date=month, source='Salary')
+
+        for name, key in (('get_monthly_data', 'monthly_data'), ('monthly_income_data', 'monthly_income_data')):
+            caches['dashboards'].clear()  # both endpoints share one cached series
+            with self.assertNumQueries(3):  # session, user, rollups
+                data = self.client.get(reverse(name)).json()[key]
+            self.assertEqual(data[self.today.month - 1], 125)
+            self.assertEqual(sum(data), 125)
+
+    def test_income_summary_reads_rollups_in_one_query(self):
+        UserIncome.objects.create(owner=self.user, amount=10, date=self.today, source='Salary')
+        UserIncome.objects.create(owner=self.user, amount=5, date=self.today, source='Gift')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('income-summary'))
+        self.assertEqual(response.context['daily_income'], 15)
+        self.assertEqual(response.context['yearly_income'], 15)
+
+    def test_expense_category_summary_reads_rollups(self):
+        food = Category.objects.create(name='Food')
+        Expense.objects.create(owner=self.user, amount=12, date=self.today, category=food, description='lunch')
+        Expense.objects.create(owner=self.user, amount=8, date=self.today, category=food, description='dinner')
+
+        with self.assertNumQueries(3):  # session, user, rollups
+            response = self.client.get(reverse('expense_category_summary'))
+        self.assertEqual(response.json(), {'expense_category_data': {'Food': 20}})
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.user = User.objects.create_user(username='cached', password='secret')
+        self.client.login(username='cached', password='secret')
+        self.today = datetime.date.today()
+        self.food = Category.objects.create(name='Food')
+
+    def add_expense(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Expense.objects.create(
+                owner=self.user, amount=amount, date=self.today, category=self.food, description='x')
+
+    def test_unchanged_dashboards_skip_the_database(self):
+        self.add_expense(10)
+        UserIncome.objects.create(owner=self.user, amount=100, date=self.today, source='Salary')
+        urls = [reverse('expense_category_summary'), reverse('income-summary'),
+                reverse('get_monthly_data'), reverse('monthly_income_data')]
+        first = [self.client.get(url).content for url in urls]
+
+        for url, content in zip(urls, first):
+            with self.assertNumQueries(2):  # session and user only
+                self.assertEqual(self.client.get(url).content, content)
+
+    def test_writes_invalidate_the_users_dashboards(self):
+        expense = self.add_expense(10)
+        self.assertEqual(self.client.get(reverse('expense_category_summary')).json(),
+                         {'expense_category_data': {'Food': 10}})
+
+        self.add_expense(5)
+        self.assertEqual(self.client.get(reverse('expense_category_summary')).json(),
+                         {'expense_category_data': {'Food': 15}})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.delete()
+        self.assertEqual(self.client.get(reverse('expense_category_summary')).json(),
+                         {'expense_category_data': {'Food': 5}})
+
+    def test_version_is_bumped_per_user_by_every_tracked_model(self):
+        other = User.objects.create_user(username='bystander', password='secret')
+        others_version = dashboard_cache.data_version(other.pk)
+
+        for create in (
+            lambda: ExpenseLimit.objects.create(owner=self.user, daily_expense_limit=100),
+            lambda: UserPreference.objects.create(user=self.user, currency='USD'),
+            lambda: UserIncome.objects.create(owner=self.user, amount=1, date=self.today, source='Gift'),
+        ):
+            before = dashboard_cache.data_version(self.user.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                create()
+            self.assertNotEqual(dashboard_cache.data_version(self.user.pk), before)
+
+        self.assertEqual(dashboard_cache.data_version(other.pk), others_version)
+
+
+class BenchmarkViewsTests(TestCase):
+    def run_benchmark(self, *args):
+        output = StringIO()
+        call_command('benchmark_views', '--sizes', '40', '--requests', '2', *args, stdout=output)
+        return output.getvalue()
+
+    def test_views_stay_within_their_query_budgets(self):
+        # Every default view, so one going over its budget fails the suite.
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'results.json')
+        self.run_benchmark('--output', path)
+        with open(path) as results:
+            runs = json.load(results)['runs']
+        self.assertEqual([run['view'] for run in runs], [name for name, view in VIEWS.items() if view.default])
+        self.assertTrue(all(run['status'] == 200 and run['warm']['p50'] is not None for run in runs))
+        # Seeded rows are rolled back afterwards.
+        self.assertFalse(Expense.objects.exists())
+
+    def test_fails_over_budget_or_against_a_faster_baseline(self):
+        with mock.patch.dict(VIEWS, {'expenses-index': View('expenses', 1)}):
+            with self.assertRaisesMessage(CommandError, 'expenses-index at 40 rows: 5 queries, budget 1'):
+                self.run_benchmark('--views', 'expenses-index')
+
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'baseline.json')
+        with open(path, 'w') as baseline:
+            json.dump({'runs': [{'view': 'income-summary', 'rows': 40, 'warm': {'p50': 0.001}}]}, baseline)
+        with self.assertRaisesMessage(CommandError, 'income-summary at 40 rows: warm p50'):
+            self.run_benchmark('--views', 'income-summary', '--baseline', path, '--min-regression-ms', '0')
@@ -0,0 +1,109 @@
+# analytics/totals.py
+"""
+Grouped, time-bucketed totals over the expense and income rollups.
+
+Every call compiles to exactly one query: a GROUP BY over the daily or
+monthly rollup table of ``analytics.rollups``. Rows are read per bucket
+rather than per transaction, so a dashboard costs O(days or months in
+range x categories) no matter how many expenses a user has.
+"""
+import datetime
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+
+from .rollups import EXPENSES, INCOME
+
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+# Grouping keys callers may use, per rollup; maps the public name to the lookup.
+GROUPS = {
+    EXPENSES: {'category': 'category__name', 'category_id': 'category_id'},
+    INCOME: {'source': 'source'},
+}
+
+
+def _covers_whole_months(start, end):
+    if start is not None and start.day != 1:
+        return False
+    return end is None or (end + datetime.timedelta(days=1)).day == 1
+
+
+def grouped_totals(spec, owner, start=None, end=None, bucket=None, by=None):
+    """
+    Return summed rollups for ``owner`` between ``start`` and ``end`` inclusive.
+
+    ``bucket`` is one of ``day``, ``week``, ``month`` or ``year`` (weeks start
+    on Monday), or None for one total over the whole range. ``by`` groups
+    by ``category`` (or ``category_id``) for expenses and ``source`` for
+    income. Either bound may be None for an open range.
+
+    Returns a list of dicts ordered by bucket then group, each with
+    ``total``, ``count`` and, when requested, ``bucket`` (the first day of
+    the bucket) and the ``by`` key.
+    """
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket {bucket!r}; expected one of {", ".join(BUCKETS)}')
+    if by is not None and by not in GROUPS[spec]:
+        raise ValueError(f'Cannot group {spec.model.__name__} totals by {by!r}')
+
+    # Monthly rows are enough when neither the range nor the buckets split a month.
+    use_monthly = bucket in (None, 'month', 'year') and _covers_whole_months(start, end)
+    rows = (spec.monthly if use_monthly else spec.daily).objects.filter(owner=owner)
+    if start is not None:
+        rows = rows.filter(period__gte=start)
+    if end is not None:
+        rows = rows.filter(period__lte=end)
+
+    names, lookups = [], []
+    if bucket is not None:
+        rows = rows.annotate(bucket=BUCKETS[bucket]('period'))
+        names.append('bucket')
+        lookups.append('bucket')
+    if by is not None:
+        names.append(by)
+        lookups.append(GROUPS[spec][by])
+
+    if not names:
+        result = rows.aggregate(sum_total=Sum('total'), sum_count=Sum('count'))
+        return [{'total': result['sum_total'] or 0, 'count': result['sum_count'] or 0}]
+
+    rows = rows.values(*lookups).annotate(sum_total=Sum('total'), sum_count=Sum('count')).order_by(*lookups)
+    return [
+        dict(zip(names, (row[lookup] for lookup in lookups)), total=row['sum_total'], count=row['sum_count'])
+        for row in rows
+    ]
+
+
+def totals_by(spec, owner, start, end, by):
+    """Return {group value: total} over the range."""
+    return {row[by]: row['total'] for row in grouped_totals(spec, owner, start, end, by=by)}
+
+
+def range_total(spec, owner, start, end):
+    return grouped_totals(spec, owner, start, end)[0]['total']
+
+
+def row_count(spec, owner):
+    """
+    Return how many rows ``owner`` has, summed from the monthly rollups.
+
+    Rows written in bulk are missing until the rollups are rebuilt, so
+    treat this as approximate; it is meant for page counts, not totals.
+    """
+    return grouped_totals(spec, owner)[0]['count']
+
+
+def monthly_series(spec, owner, year):
+    """Return the twelve monthly totals of ``year``, January first."""
+    series = [0] * 12
+    rows = grouped_totals(spec, owner, datetime.date(year, 1, 1), datetime.date(year, 12, 31), bucket='month')
+    for row in rows:
+        series[row['bucket'].month - 1] = row['total']
+    return series
@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import TrainingExample, TrainingFeedback
 
 # Register your models here.
+admin.site.register(TrainingFeedback)
+admin.site.register(TrainingExample)
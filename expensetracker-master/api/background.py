@@ -0,0 +1,65 @@
+# api/background.py
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    A daemon thread that runs jobs off the request path, started on first use.
+
+    Jobs submitted with a ``key`` are collapsed while one with the same key
+    is still waiting, so a burst of saves for one user schedules one
+    retrain. With ``CATEGORY_TASKS_EAGER`` set, jobs run inline, which is
+    what the tests use.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func, *args, key=None):
+        if settings.CATEGORY_TASKS_EAGER:
+            func(*args)
+            return True
+
+        with self._lock:
+            if key is not None:
+                if key in self._pending:
+                    return False
+                self._pending.add(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._queue.put((key, func, args))
+        return True
+
+    def join(self):
+        """Block until every submitted job has finished."""
+        self._queue.join()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            key, func, args = self._queue.get()
+            with self._lock:
+                self._pending.discard(key)
+            try:
+                close_old_connections()
+                func(*args)
+            except Exception:
+                logger.exception('Background job %s failed', getattr(func, '__name__', func))
+            finally:
+                close_old_connections()
+                self._queue.task_done()
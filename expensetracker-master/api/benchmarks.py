@@ -0,0 +1,142 @@
+# api/benchmarks.py
+"""Helpers shared by the benchmark commands."""
+import csv
+import datetime
+import random
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+CATEGORIES = [
+    'Food', 'Transportation', 'Entertainment', 'Healthcare', 'Utilities', 'Housing',
+    'Education', 'Shopping', 'Personal Care', 'Work', 'Travel', 'Insurance',
+]
+
+_SYLLABLES = ['ka', 'ro', 'mi', 'ta', 'ne', 'lo', 'shi', 'van', 'tor', 'pel', 'qua', 'zin', 'bru', 'dex', 'fo', 'gar']
+
+
+def synthetic_vocabulary(size, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_corpus(rows, vocabulary_size=5000, seed=0):
+    """
+    Yield (description, category, clean_description) rows in the dataset.csv schema.
+
+    Each category draws most of its words from its own slice of the
+    vocabulary with a skewed distribution, so term frequencies look like
+    real merchant descriptions rather than uniform noise.
+    """
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(vocabulary_size, seed)
+    slice_size = max(1, len(vocabulary) // len(CATEGORIES))
+    for _ in range(rows):
+        category_index = rng.randrange(len(CATEGORIES))
+        start = category_index * slice_size
+        words = [
+            vocabulary[start + min(int(rng.paretovariate(1.2)) - 1, slice_size - 1)]
+            for _ in range(rng.randint(1, 3))
+        ]
+        if rng.random() < 0.3:
+            words.append(rng.choice(vocabulary))
+        description = ' '.join(words)
+        yield description, CATEGORIES[category_index], description
+
+
+def write_corpus(path, rows, vocabulary_size=5000, seed=0):
+    """Write a synthetic corpus to ``path`` with the ``dataset.csv`` header."""
+    with open(path, 'w', newline='') as dataset:
+        writer = csv.writer(dataset)
+        writer.writerow(['description', 'category', 'clean_description'])
+        writer.writerows(synthetic_corpus(rows, vocabulary_size, seed))
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRssGrowth:
+    """
+    Context manager measuring how far a block pushes the process's peak RSS.
+
+    Peak RSS never goes down, so ``bytes`` is the growth of the high-water
+    mark (0 if the block stayed under it), not what the block allocated.
+    """
+
+    def __enter__(self):
+        self.before = peak_rss_bytes()
+        self.bytes = None
+        return self
+
+    def __exit__(self, *exc_info):
+        self.bytes = peak_rss_bytes() - self.before
+
+
+# For the help text of commands that seed inside rolled_back().
+ROLLED_BACK_NOTE = 'Rows are inserted in a transaction that is rolled back afterwards.'
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back, so seeded rows never persist."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return {'p50': ..., ...} in milliseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{p}': None for p in points}
+    return {
+        f'p{p}': round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+        for p in points
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def seed_transactions(owner, rows, start, days=365, seed=0, batch_size=5000):
+    """
+    Bulk-insert ``rows`` transactions for ``owner``, half income and half expenses.
+
+    Dates are spread uniformly over ``days`` days from ``start``. Bulk
+    inserts skip the model signals, so callers that read the rollups must
+    rebuild them afterwards.
+    """
+    from expenses.models import Category, Expense
+    from userincome.models import UserIncome
+
+    rng = random.Random(seed)
+    categories = [Category.objects.get_or_create(name=f'Benchmark {i}')[0] for i in range(12)]
+    sources = ['Salary', 'Freelance', 'Dividends', 'Rent', 'Gifts']
+
+    def day():
+        return start + datetime.timedelta(days=rng.randrange(days))
+
+    for model, count, make in (
+        (UserIncome, rows // 2, lambda: UserIncome(
+            owner=owner, amount=round(rng.uniform(10, 5000), 2), date=day(),
+            source=rng.choice(sources), description='benchmark')),
+        (Expense, rows - rows // 2, lambda: Expense(
+            owner=owner, amount=round(rng.uniform(1, 500), 2), date=day(),
+            category=rng.choice(categories), description='benchmark')),
+    ):
+        for offset in range(0, count, batch_size):
+            model.objects.bulk_create([make() for _ in range(min(batch_size, count - offset))])
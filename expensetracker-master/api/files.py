@@ -0,0 +1,25 @@
+# api/files.py
+import os
+import tempfile
+
+
+def atomic_write(path, write):
+    """
+    Create or replace ``path`` with what ``write(file)`` writes to a binary file.
+
+    The data goes to a temporary file in the same directory that is renamed
+    over ``path`` once complete, so readers in other processes see the old
+    file or the new one, never a partial write. If ``write`` raises, the
+    temporary file is removed and ``path`` is left untouched.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            write(tmp)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
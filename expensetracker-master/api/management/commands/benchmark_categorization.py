@@ -0,0 +1,138 @@
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+import sklearn
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import peak_rss_bytes, percentiles, synthetic_corpus, timed, write_corpus
+from api.model_registry import BATCH, INCREMENTAL, CategoryModelRegistry
+from api.preprocessing import preprocess_text, preprocess_texts
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold start, prediction latency, feedback throughput and peak RSS of the '
+        'category model on synthetic corpora in the dataset.csv schema'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Corpus sizes in rows; 1000000 is supported but slow to train in batch mode')
+        parser.add_argument('--mode', choices=[BATCH, INCREMENTAL], default=None,
+                            help='Model mode to benchmark (defaults to CATEGORY_MODEL_MODE)')
+        parser.add_argument('--queries', type=int, default=500, help='Single-description predictions per size')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--batches', type=int, default=50)
+        parser.add_argument('--feedback', type=int, default=200, help='Feedback rows to ingest per size')
+        parser.add_argument('--feedback-seconds', type=float, default=60,
+                            help='Stop ingesting feedback after this long, whichever comes first')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        mode = options['mode'] or settings.CATEGORY_MODEL_MODE
+        results = {
+            'mode': mode,
+            'seed': options['seed'],
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'sklearn': sklearn.__version__,
+            'runs': [],
+        }
+
+        # Peak RSS only ever grows within a process, so run the smallest
+        # corpus first and each figure is the peak up to that size.
+        self.stdout.write(
+            f"{'rows':>10} {'train s':>9} {'load s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'batch p50':>10} {'feedback/s':>11} {'rss MB':>8}")
+        for size in sorted(options['sizes']):
+            work_dir = tempfile.mkdtemp(prefix='category-benchmark-')
+            try:
+                run = self.run_size(size, mode, work_dir, options)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            results['runs'].append(run)
+            self.stdout.write(
+                f"{size:>10} {run['cold_start']['train_seconds']:>9.2f} {run['cold_start']['load_seconds']:>8.3f} "
+                f"{run['single']['p50']:>8.3f} {run['single']['p99']:>8.3f} {run['batch']['p50']:>10.3f} "
+                f"{run['feedback']['rows_per_second']:>11.1f} {run['peak_rss_bytes'] / 2 ** 20:>8.1f}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run_size(self, size, mode, work_dir, options):
+        dataset_path = os.path.join(work_dir, 'dataset.csv')
+        model_dir = os.path.join(work_dir, 'models')
+        write_corpus(dataset_path, size, seed=options['seed'])
+        descriptions = [row[0] for row in synthetic_corpus(
+            max(options['queries'], options['batch_size']), seed=options['seed'] + 1)]
+        preprocess_text.cache_clear()
+
+        # Cold start: the first worker trains and saves the model, later
+        # workers only hash the dataset and load the saved file.
+        trainer = CategoryModelRegistry(dataset_path=dataset_path, model_dir=model_dir, mode=mode)
+        train_seconds, _ = timed(trainer.get_model)
+        registry = CategoryModelRegistry(dataset_path=dataset_path, model_dir=model_dir, mode=mode)
+        load_seconds, _ = timed(registry.get_model)
+        first_seconds, _ = timed(registry.predict_with_confidence, preprocess_texts(descriptions[:1]))
+
+        single = [
+            timed(lambda d: registry.predict_with_confidence([preprocess_text(d)]), description)[0]
+            for description in descriptions[:options['queries']]
+        ]
+
+        rng = random.Random(options['seed'])
+        batch = [
+            timed(registry.predict_with_confidence, preprocess_texts(rng.sample(descriptions, options['batch_size'])))[0]
+            for _ in range(options['batches'])
+        ]
+
+        feedback = self.ingest_feedback(registry, options)
+        if registry._retrain_thread is not None:
+            registry._retrain_thread.join()
+
+        return {
+            'rows': size,
+            'dataset_bytes': os.path.getsize(dataset_path),
+            'cold_start': {
+                'train_seconds': round(train_seconds, 4),
+                'load_seconds': round(load_seconds, 4),
+                'first_prediction_ms': round(first_seconds * 1000, 3),
+            },
+            'single': dict(percentiles(single), count=len(single)),
+            'batch': dict(percentiles(batch), count=len(batch), size=options['batch_size']),
+            'feedback': feedback,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+
+    def ingest_feedback(self, registry, options):
+        """Append corrections the way ``CategorizationService.record_feedback`` does."""
+        rows = synthetic_corpus(options['feedback'], seed=options['seed'] + 2)
+        source = registry.source
+        latencies = []
+        started = time.perf_counter()
+        for description, category, _ in rows:
+            if time.perf_counter() - started >= options['feedback_seconds']:
+                break
+            elapsed, _ = timed(self.record_feedback, registry, source, description, category)
+            latencies.append(elapsed)
+        total = time.perf_counter() - started
+        return dict(
+            percentiles(latencies),
+            count=len(latencies),
+            seconds=round(total, 4),
+            rows_per_second=round(len(latencies) / total, 2) if total else 0.0,
+        )
+
+    def record_feedback(self, registry, source, description, category):
+        clean_description = preprocess_text(description)
+        source.append(description, clean_description, category)
+        registry.learn(clean_description, category)
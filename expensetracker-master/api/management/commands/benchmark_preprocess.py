@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import synthetic_corpus
+from api.preprocessing import get_stop_words, preprocess_text, tokenize
+
+
+def nltk_preprocess_text(text):
+    from nltk.tokenize import word_tokenize
+    stop_words = get_stop_words()
+    return ' '.join(t for t in word_tokenize(text.lower()) if t.isalnum() and t not in stop_words)
+
+
+class Command(BaseCommand):
+    help = 'Measure preprocess_text throughput for unique and repeated descriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--texts', type=int, default=100000)
+        parser.add_argument('--distinct', type=int, default=1000,
+                            help='Number of distinct descriptions in the repeated workload')
+        parser.add_argument('--punctuated', type=float, default=0.2,
+                            help='Share of descriptions that contain punctuation')
+        parser.add_argument('--compare-nltk', action='store_true',
+                            help='Also time the word_tokenize implementation (needs the punkt corpus)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        texts = []
+        for description, _, _ in synthetic_corpus(options['texts'], seed=options['seed']):
+            if rng.random() < options['punctuated']:
+                description = f"{description.title()}'s, {rng.randint(1, 99)}.99!"
+            texts.append(description)
+        repeated = [texts[rng.randrange(min(options['distinct'], len(texts)))] for _ in texts]
+
+        self.report('tokenize (unique)', tokenize, [t.lower() for t in texts])
+        preprocess_text.cache_clear()
+        self.report('preprocess_text (unique)', preprocess_text, texts)
+        preprocess_text.cache_clear()
+        self.report('preprocess_text (repeated)', preprocess_text, repeated)
+        self.stdout.write(f'memo: {preprocess_text.cache_info()}')
+
+        if options['compare_nltk']:
+            try:
+                self.report('word_tokenize (unique)', nltk_preprocess_text, texts)
+            except LookupError:
+                self.stderr.write('Skipping word_tokenize comparison: the punkt corpus is not installed')
+
+    def report(self, label, func, texts):
+        started = time.perf_counter()
+        for text in texts:
+            func(text)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<28} {len(texts) / elapsed:>12,.0f} texts/s')
@@ -0,0 +1,31 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import percentiles, synthetic_corpus, timed
+from api.similarity import SimilarityIndex
+
+
+class Command(BaseCommand):
+    help = 'Measure nearest-description lookup latency as the training corpus grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for size in options['sizes']:
+            descriptions, categories, clean = zip(*synthetic_corpus(size, seed=options['seed']))
+            build_seconds, index = timed(SimilarityIndex.build, descriptions, categories, clean)
+
+            rng = random.Random(options['seed'])
+            queries = [clean[rng.randrange(size)] for _ in range(options['queries'])]
+            index.query(queries[0], options['k'])  # warm up
+            latencies = [timed(index.query, query, options['k'])[0] for query in queries]
+
+            stats = percentiles(latencies)
+            self.stdout.write(
+                f"{size:>10} {build_seconds:>9.2f} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.training_store import training_store
+
+
+class Command(BaseCommand):
+    help = 'Fold the training feedback log into weighted training examples'
+
+    def handle(self, *args, **options):
+        folded = training_store.compact()
+        self.stdout.write(self.style.SUCCESS(f'Compacted {folded} feedback rows'))
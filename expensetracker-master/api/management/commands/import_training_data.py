@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.training_store import training_store
+
+
+class Command(BaseCommand):
+    help = 'Append a dataset.csv style file to the training store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=None,
+                            help='Defaults to CATEGORY_DATASET_PATH')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.CATEGORY_DATASET_PATH
+        imported = training_store.import_csv(path)
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} rows from {path}'))
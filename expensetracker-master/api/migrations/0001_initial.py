@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-17 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingExample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('description', models.TextField()),
+                ('clean_description', models.TextField()),
+                ('category', models.CharField(max_length=255)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('last_feedback_id', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrainingFeedback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('clean_description', models.TextField()),
+                ('category', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
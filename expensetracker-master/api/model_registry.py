@@ -0,0 +1,363 @@
+# api/model_registry.py
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+from django.conf import settings
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from .files import atomic_write
+from .similarity import SimilarityIndex
+from .training_store import CsvTrainingSource, training_store
+
+
+BATCH = 'batch'
+INCREMENTAL = 'incremental'
+
+
+class CategoryModel:
+    """A fitted vectorizer/classifier pair stamped with the data version it was trained on."""
+
+    def __init__(self, version, vectorizer, classifier, trained_at):
+        self.version = version
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.trained_at = trained_at
+
+    def predict(self, clean_descriptions):
+        X = self.vectorizer.transform(clean_descriptions)
+        return self.classifier.predict(X)
+
+    def predict_with_confidence(self, clean_descriptions):
+        """Return (categories, confidences) for the whole batch from one matrix prediction."""
+        X = self.vectorizer.transform(clean_descriptions)
+        probabilities = self.classifier.predict_proba(X)
+        best = probabilities.argmax(axis=1)
+        categories = self.classifier.classes_[best]
+        confidences = probabilities[np.arange(len(best)), best]
+        return categories, confidences
+
+
+class IncrementalCategoryModel(CategoryModel):
+    """
+    Hashing features plus an online linear classifier.
+
+    The hashing vectorizer has no vocabulary, so feedback rows can be folded
+    in with ``partial_fit`` without refitting anything. Every update bumps
+    the version so caches keyed by it never serve stale predictions.
+    """
+
+    def __init__(self, version, vectorizer, classifier, trained_at, updates=0):
+        super().__init__(version, vectorizer, classifier, trained_at)
+        self.base_version = version
+        self.updates = updates
+        if updates:
+            self.version = f'{version}.{updates}'
+
+    def knows(self, category):
+        return category in self.classifier.classes_
+
+    def partial_fit(self, clean_descriptions, categories):
+        X = self.vectorizer.transform(clean_descriptions)
+        self.classifier.partial_fit(X, categories)
+        self.updates += 1
+        self.version = f'{self.base_version}.{self.updates}'
+
+
+def make_hashing_vectorizer():
+    return HashingVectorizer(n_features=settings.CATEGORY_HASHING_FEATURES, alternate_sign=False)
+
+
+class CategoryModelRegistry:
+    """
+    Keeps one trained category model per worker process.
+
+    The model is trained once per version of the training data (see
+    ``api.training_store``) and saved to
+    ``CATEGORY_MODEL_DIR``. Workers load it lazily on first use and only
+    reload when the training data version changes, so a prediction is a
+    ``transform`` plus a ``predict``.
+
+    In ``incremental`` mode feedback is applied to the live model with
+    ``partial_fit``. In both modes a full retrain runs in a background
+    thread once ``CATEGORY_RETRAIN_ROWS`` rows have arrived or
+    ``CATEGORY_RETRAIN_MINUTES`` have passed; until then a batch model keeps
+    serving the version it was trained on, unless another worker has
+    already saved a newer one. The retrained model is swapped in with a
+    single reference assignment, so predictions never see a half-built model.
+    """
+
+    def __init__(self, dataset_path=None, model_dir=None, mode=None, source=None):
+        self._source = source or (CsvTrainingSource(dataset_path) if dataset_path else None)
+        self._model_dir = model_dir
+        self._mode = mode
+        self._lock = threading.Lock()
+        self._model = None
+        self._index = None
+        self._pointer_key = None
+        self._pending_rows = []
+        self._retraining = False
+        self._retrain_thread = None
+        self.last_retrain = time.monotonic()
+        self.load_seconds = None
+        self.train_seconds = None
+
+    @property
+    def source(self):
+        if self._source is None:
+            if settings.CATEGORY_TRAINING_STORE == 'database':
+                self._source = training_store
+            else:
+                self._source = CsvTrainingSource(settings.CATEGORY_DATASET_PATH)
+        return self._source
+
+    @property
+    def model_dir(self):
+        return self._model_dir or settings.CATEGORY_MODEL_DIR
+
+    @property
+    def mode(self):
+        return self._mode or settings.CATEGORY_MODEL_MODE
+
+    def data_version(self):
+        return self.source.version()
+
+    def model_path(self, version):
+        if self.mode == INCREMENTAL:
+            return os.path.join(self.model_dir, f'category-model-{version}-incremental.joblib')
+        return os.path.join(self.model_dir, f'category-model-{version}.joblib')
+
+    def index_path(self, version):
+        return os.path.join(self.model_dir, f'similarity-index-{version}.joblib')
+
+    @property
+    def pointer_path(self):
+        return os.path.join(self.model_dir, 'incremental-current')
+
+    def get_model(self):
+        if self.mode == INCREMENTAL:
+            return self._get_incremental_model()
+
+        version = self.data_version()
+        model = self._model
+        if model is not None and model.version == version:
+            return model
+
+        with self._lock:
+            if self._model is None:
+                self._model = self._load(version) or self._train(version)
+            elif self._model.version != version:
+                self._model = self._load(version) or self._model
+            model = self._model
+        if model.version != version and self._retrain_due():
+            self.schedule_retrain()
+        return model
+
+    def predict(self, clean_descriptions):
+        return self.get_model().predict(clean_descriptions)
+
+    def predict_with_confidence(self, clean_descriptions):
+        return self.get_model().predict_with_confidence(clean_descriptions)
+
+    def get_index(self):
+        """Return the nearest-description index for the current training data."""
+        version = self.data_version()
+        index = self._index
+        if index is not None and index[0] == version:
+            return index[1]
+
+        with self._lock:
+            if self._index is None or self._index[0] != version:
+                path = self.index_path(version)
+                if os.path.exists(path):
+                    built = joblib.load(path)
+                else:
+                    built = self._build_index()
+                    atomic_write(path, lambda tmp: joblib.dump(built, tmp))
+                self._index = (version, built)
+            return self._index[1]
+
+    def neighbours(self, clean_description, k=5):
+        return self.get_index().neighbours(clean_description, k)
+
+    def learn(self, clean_description, category):
+        """Fold one feedback row into the model; the row is already in the training source."""
+        if self.mode != INCREMENTAL:
+            with self._lock:
+                self._pending_rows.append((clean_description, category))
+            # Schedules the retrain once enough feedback has piled up.
+            self.get_model()
+            return
+
+        model = self.get_model()
+        with self._lock:
+            unseen = not model.knows(category)
+            if not unseen:
+                model.partial_fit([clean_description], [category])
+            self._pending_rows.append((clean_description, category))
+        if unseen or self._retrain_due():
+            self.schedule_retrain()
+
+    def _retrain_due(self):
+        return (
+            len(self._pending_rows) >= settings.CATEGORY_RETRAIN_ROWS
+            or time.monotonic() - self.last_retrain >= settings.CATEGORY_RETRAIN_MINUTES * 60
+        )
+
+    def schedule_retrain(self):
+        with self._lock:
+            if self._retraining:
+                return False
+            self._retraining = True
+        self._retrain_thread = threading.Thread(
+            target=self._retrain_in_background, name='category-model-retrain', daemon=True)
+        self._retrain_thread.start()
+        return True
+
+    def retrain(self):
+        """Train a fresh model on the full dataset and swap it in."""
+        with self._lock:
+            seen = len(self._pending_rows)
+        version = self.data_version()
+        if self.mode == INCREMENTAL:
+            model = self._train_incremental(version)
+        else:
+            model = self._load(version) or self._train(version)
+
+        with self._lock:
+            if self.mode == INCREMENTAL:
+                # Replay feedback that arrived while we were training.
+                for clean_description, category in self._pending_rows[seen:]:
+                    if model.knows(category):
+                        model.partial_fit([clean_description], [category])
+            del self._pending_rows[:seen]
+            self._model = model
+            self.last_retrain = time.monotonic()
+        return model
+
+    def status(self):
+        model = self._model
+        return {
+            'mode': self.mode,
+            'version': model.version if model else None,
+            'trained_at': model.trained_at if model else None,
+            'load_seconds': self.load_seconds,
+            'train_seconds': self.train_seconds,
+            'pending_rows': len(self._pending_rows),
+            'retraining': self._retraining,
+        }
+
+    def _retrain_in_background(self):
+        try:
+            self.retrain()
+        finally:
+            self._retraining = False
+
+    def _get_incremental_model(self):
+        pointer_key = self._stat(self.pointer_path)
+        model = self._model
+        if model is not None and pointer_key == self._pointer_key:
+            return model
+
+        with self._lock:
+            # Another worker may have published a retrained model.
+            pointer_key = self._stat(self.pointer_path)
+            if self._model is None or pointer_key != self._pointer_key:
+                loaded = None
+                if pointer_key is not None:
+                    with open(self.pointer_path) as pointer:
+                        loaded = self._load(pointer.read().strip())
+                if loaded is not None:
+                    self._model = loaded
+                    self._pointer_key = pointer_key
+                elif self._model is None:
+                    self._model = self._train_incremental(self.data_version())
+            return self._model
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _load(self, version):
+        path = self.model_path(version)
+        if not os.path.exists(path):
+            return None
+        started = time.perf_counter()
+        payload = joblib.load(path)
+        self.load_seconds = time.perf_counter() - started
+        if self.mode == INCREMENTAL:
+            return IncrementalCategoryModel(
+                version, payload['vectorizer'], payload['classifier'], payload['trained_at'])
+        return CategoryModel(version, payload['vectorizer'], payload['classifier'], payload['trained_at'])
+
+    def _read_all(self):
+        descriptions, clean_descriptions, categories, weights = [], [], [], []
+        for chunk in self.source.iter_chunks(settings.CATEGORY_TRAINING_CHUNK_ROWS):
+            for row in chunk:
+                descriptions.append(row.description)
+                clean_descriptions.append(row.clean_description)
+                categories.append(row.category)
+                weights.append(row.weight)
+        return descriptions, clean_descriptions, categories, np.asarray(weights, dtype=float)
+
+    def _build_index(self):
+        descriptions, clean_descriptions, categories, _ = self._read_all()
+        return SimilarityIndex.build(
+            descriptions, categories, clean_descriptions,
+            max_postings=settings.CATEGORY_SIMILARITY_MAX_POSTINGS,
+        )
+
+    def _train(self, version):
+        started = time.perf_counter()
+        _, clean_descriptions, categories, weights = self._read_all()
+        vectorizer = TfidfVectorizer()
+        X = vectorizer.fit_transform(clean_descriptions)
+        classifier = RandomForestClassifier()
+        classifier.fit(X, categories, sample_weight=weights)
+        model = CategoryModel(version, vectorizer, classifier, time.time())
+        self.train_seconds = time.perf_counter() - started
+        self._save(model)
+        return model
+
+    def _train_incremental(self, version):
+        # Stream the training rows in chunks so memory stays bounded by the
+        # chunk size and the hashing space, not by the size of the corpus.
+        started = time.perf_counter()
+        chunk_rows = settings.CATEGORY_TRAINING_CHUNK_ROWS
+        classes = np.unique([row.category for chunk in self.source.iter_chunks(chunk_rows) for row in chunk])
+        vectorizer = make_hashing_vectorizer()
+        classifier = SGDClassifier(loss='log_loss', random_state=0)
+        for _ in range(settings.CATEGORY_INCREMENTAL_EPOCHS):
+            for chunk in self.source.iter_chunks(chunk_rows):
+                X = vectorizer.transform([row.clean_description for row in chunk])
+                classifier.partial_fit(
+                    X, [row.category for row in chunk], classes=classes,
+                    sample_weight=[row.weight for row in chunk],
+                )
+        model = IncrementalCategoryModel(version, vectorizer, classifier, time.time())
+        self.train_seconds = time.perf_counter() - started
+        self._save(model)
+        self._publish(model)
+        return model
+
+    def _publish(self, model):
+        atomic_write(self.pointer_path, lambda tmp: tmp.write(model.base_version.encode()))
+        self._pointer_key = self._stat(self.pointer_path)
+
+    def _save(self, model):
+        payload = {
+            'version': getattr(model, 'base_version', model.version),
+            'vectorizer': model.vectorizer,
+            'classifier': model.classifier,
+            'trained_at': model.trained_at,
+        }
+        atomic_write(self.model_path(payload['version']), lambda tmp: joblib.dump(payload, tmp))
+
+registry = CategoryModelRegistry()
@@ -1,3 +1,32 @@
 from django.db import models
 
-# Create your models here.
+
+class TrainingFeedback(models.Model):
+    """
+    Append-only log of labelled descriptions.
+
+    Writers only ever insert here, so concurrent feedback cannot lose rows.
+    Compaction folds these rows into ``TrainingExample`` and deletes them.
+    """
+    description = models.TextField()
+    clean_description = models.TextField()
+    category = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.description} -> {self.category}"
+
+
+class TrainingExample(models.Model):
+    """Compacted training corpus: one row per (clean_description, category), repeats counted in weight."""
+    key = models.CharField(max_length=40, unique=True)
+    description = models.TextField()
+    clean_description = models.TextField()
+    category = models.CharField(max_length=255)
+    weight = models.PositiveIntegerField(default=1)
+    # Highest TrainingFeedback id folded into this row; keeps the data
+    # version stable when compaction empties the log.
+    last_feedback_id = models.BigIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.clean_description} -> {self.category} (x{self.weight})"
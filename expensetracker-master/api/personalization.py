@@ -0,0 +1,196 @@
+# api/personalization.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+from django.conf import settings
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+from .background import BackgroundWorker
+from .files import atomic_write
+from .model_registry import registry
+from .prediction_cache import prediction_cache
+from .preprocessing import preprocess_texts
+
+
+class UserCategoryModel:
+    """A small model trained on one user's own expense descriptions and categories."""
+
+    def __init__(self, user_id, vectorizer, classifier, rows, trained_at):
+        self.user_id = user_id
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.rows = rows
+        self.trained_at = trained_at
+
+    @property
+    def classes_(self):
+        return self.classifier.classes_
+
+    def predict_proba(self, clean_descriptions):
+        return self.classifier.predict_proba(self.vectorizer.transform(clean_descriptions))
+
+
+class UserModelCache:
+    """
+    Per-user category models kept in a bounded, LRU-evicted in-memory cache.
+
+    Models are trained from the user's ``Expense`` rows, saved under
+    ``CATEGORY_MODEL_DIR/users`` and loaded on demand. Each cached entry is
+    accounted by its serialized size; once the total passes
+    ``CATEGORY_USER_MODEL_CACHE_BYTES`` the least recently used models are
+    dropped. A user with too little history has no model and gets the
+    global prediction.
+    """
+
+    def __init__(self, model_dir=None, max_bytes=None):
+        self._model_dir = model_dir
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (model, nbytes, stat_key)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.worker = BackgroundWorker('user-category-models')
+
+    @property
+    def model_dir(self):
+        return self._model_dir or os.path.join(settings.CATEGORY_MODEL_DIR, 'users')
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or settings.CATEGORY_USER_MODEL_CACHE_BYTES
+
+    def model_path(self, user_id):
+        return os.path.join(self.model_dir, f'user-{user_id}.joblib')
+
+    def get(self, user_id):
+        """Return the user's model, or None for a cold user."""
+        path = self.model_path(user_id)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.discard(user_id)
+            return None
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[2] == stat_key:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        model = joblib.load(path)
+        self._put(user_id, model, stat.st_size, stat_key)
+        return model
+
+    def discard(self, user_id):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
+
+    def schedule_retrain(self, user_id):
+        self.worker.submit(self.retrain, user_id, key=user_id)
+
+    def retrain(self, user_id):
+        from expenses.models import Expense
+
+        rows = Expense.objects.filter(owner_id=user_id).values_list('description', 'category__name')
+        descriptions, categories = [], []
+        for description, category in rows.iterator(chunk_size=2000):
+            if description and category:
+                descriptions.append(description)
+                categories.append(category)
+
+        if len(descriptions) < settings.CATEGORY_USER_MIN_ROWS or len(set(categories)) < 2:
+            self._remove(user_id)
+            return None
+
+        vectorizer = TfidfVectorizer()
+        X = vectorizer.fit_transform(preprocess_texts(descriptions))
+        classifier = MultinomialNB(alpha=0.1)
+        classifier.fit(X, categories)
+        model = UserCategoryModel(user_id, vectorizer, classifier, len(descriptions), time.time())
+
+        atomic_write(self.model_path(user_id), lambda tmp: joblib.dump(model, tmp))
+        self.discard(user_id)
+        return model
+
+    def stats(self):
+        return {
+            'models': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _put(self, user_id, model, nbytes, stat_key):
+        with self._lock:
+            previous = self._entries.pop(user_id, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[user_id] = (model, nbytes, stat_key)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def _remove(self, user_id):
+        self.discard(user_id)
+        try:
+            os.remove(self.model_path(user_id))
+        except FileNotFoundError:
+            pass
+
+
+user_models = UserModelCache()
+
+
+def blend_probabilities(global_classes, global_proba, user_classes, user_proba, weight):
+    """Mix two probability matrices over the union of their classes."""
+    classes = np.union1d(global_classes, user_classes)
+    blended = np.zeros((global_proba.shape[0], len(classes)))
+    blended[:, np.searchsorted(classes, global_classes)] += (1 - weight) * global_proba
+    blended[:, np.searchsorted(classes, user_classes)] += weight * user_proba
+    return classes, blended
+
+
+def predict_with_confidence(clean_descriptions, user_id=None):
+    """
+    Predict categories and confidences, personalised for ``user_id`` when possible.
+
+    Falls back to the global model when personal models are disabled or the
+    user has no model yet. Results go through the prediction cache, keyed
+    by the version of every model that contributed to them.
+    """
+    global_model = registry.get_model()
+    user_model = None
+    if user_id is not None and settings.CATEGORY_USER_MODELS_ENABLED:
+        user_model = user_models.get(user_id)
+    if user_model is None:
+        return prediction_cache.predict(
+            clean_descriptions, global_model.version, global_model.predict_with_confidence)
+
+    def predict(texts):
+        global_proba = global_model.classifier.predict_proba(global_model.vectorizer.transform(texts))
+        classes, blended = blend_probabilities(
+            global_model.classifier.classes_, global_proba,
+            user_model.classes_, user_model.predict_proba(texts),
+            settings.CATEGORY_USER_MODEL_WEIGHT,
+        )
+        best = blended.argmax(axis=1)
+        return classes[best], blended[np.arange(len(best)), best]
+
+    version = f'{global_model.version}:user-{user_id}-{user_model.trained_at}'
+    return prediction_cache.predict(clean_descriptions, version, predict)
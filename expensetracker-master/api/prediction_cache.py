@@ -0,0 +1,69 @@
+# api/prediction_cache.py
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class PredictionCache:
+    """
+    Caches predictions by normalised description and model version.
+
+    Entries live in the ``CATEGORY_PREDICTION_CACHE`` alias of Django's
+    cache framework, so the TTL and size bound come from that backend's
+    ``TIMEOUT`` and ``MAX_ENTRIES``. The model version is part of every key,
+    so a retrained model never sees entries from the previous one.
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.CATEGORY_PREDICTION_CACHE]
+
+    def key(self, model_version, clean_description):
+        digest = hashlib.sha1(clean_description.encode('utf-8')).hexdigest()
+        return f'category-prediction:{model_version}:{digest}'
+
+    def predict(self, clean_descriptions, model_version, predict):
+        """
+        Return (categories, confidences), calling ``predict`` only for cache misses.
+
+        ``predict`` takes a list of clean descriptions and returns the same
+        pair of sequences for them.
+        """
+        keys = [self.key(model_version, text) for text in clean_descriptions]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            categories, confidences = predict([clean_descriptions[i] for i in missing])
+            fresh = {
+                keys[i]: (str(category), float(confidence))
+                for i, category, confidence in zip(missing, categories, confidences)
+            }
+            self.cache.set_many(fresh)
+            cached.update(fresh)
+
+        results = [cached[key] for key in keys]
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
+
+
+prediction_cache = PredictionCache()
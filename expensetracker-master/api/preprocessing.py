@@ -0,0 +1,92 @@
+# api/preprocessing.py
+"""
+Text normalisation for category prediction.
+
+The stopword list is vendored from NLTK's English corpus so nothing has to
+be downloaded when a worker boots. Tokenisation produces the same tokens as
+``nltk.word_tokenize`` without running the Punkt sentence tokenizer: plain
+descriptions (letters, digits and whitespace, which is nearly all of them)
+are split directly, and anything with punctuation goes through NLTK's
+regex word tokenizer after a light sentence split.
+"""
+import os
+import re
+from functools import lru_cache
+
+
+STOPWORDS_PATH = os.path.join(os.path.dirname(__file__), 'resources', 'english_stopwords.txt')
+PREPROCESS_CACHE_SIZE = 10000
+
+_PLAIN = re.compile(r'[\w\s]*')
+# Contractions NLTK splits even inside plain words.
+_CONTRACTIONS = {
+    'cannot': ['can', 'not'],
+    'gimme': ['gim', 'me'],
+    'gonna': ['gon', 'na'],
+    'gotta': ['got', 'ta'],
+    'lemme': ['lem', 'me'],
+    'wanna': ['wan', 'na'],
+}
+# Tokens Punkt's English model treats as abbreviations, so a following
+# space does not end the sentence.
+_ABBREVIATIONS = frozenset([
+    'mr', 'mrs', 'ms', 'dr', 'st', 'jr', 'sr', 'inc', 'co', 'corp', 'ltd', 'vs', 'etc',
+    'no', 'dept', 'ave', 'blvd', 'approx', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul',
+    'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+])
+_CLOSING = '"\')]}>»”’'
+
+_word_tokenizer = None
+
+
+@lru_cache(maxsize=None)
+def get_stop_words():
+    with open(STOPWORDS_PATH, encoding='utf-8') as stopwords_file:
+        return frozenset(line.strip() for line in stopwords_file if line.strip())
+
+
+def _treebank_tokenize(sentence):
+    global _word_tokenizer
+    if _word_tokenizer is None:
+        from nltk.tokenize.destructive import NLTKWordTokenizer
+        _word_tokenizer = NLTKWordTokenizer()
+    return _word_tokenizer.tokenize(sentence)
+
+
+def _ends_sentence(chunk):
+    stripped = chunk.rstrip(_CLOSING)
+    if not stripped.endswith('.') or stripped.endswith('..'):
+        return False
+    word = stripped[:-1].lstrip(_CLOSING + '(["\'`')
+    return not ('.' in word or len(word) <= 1 or word.isdigit() or word in _ABBREVIATIONS)
+
+
+def _sentences(text):
+    sentence = []
+    for chunk in text.split():
+        sentence.append(chunk)
+        if _ends_sentence(chunk):
+            yield ' '.join(sentence)
+            sentence = []
+    if sentence:
+        yield ' '.join(sentence)
+
+
+def tokenize(text):
+    """Split lower-cased text into the tokens ``nltk.word_tokenize`` would return."""
+    if _PLAIN.fullmatch(text):
+        tokens = []
+        for token in text.split():
+            tokens.extend(_CONTRACTIONS.get(token, (token,)))
+        return tokens
+    return [token for sentence in _sentences(text) for token in _treebank_tokenize(sentence)]
+
+
+@lru_cache(maxsize=PREPROCESS_CACHE_SIZE)
+def preprocess_text(text):
+    stop_words = get_stop_words()
+    return ' '.join(t for t in tokenize(text.lower()) if t.isalnum() and t not in stop_words)
+
+
+def preprocess_texts(texts):
+    return [preprocess_text(text) for text in texts]
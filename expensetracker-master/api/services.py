@@ -0,0 +1,50 @@
+# api/services.py
+from django.conf import settings
+
+from .background import BackgroundWorker
+from .model_registry import registry
+from .personalization import predict_with_confidence
+from .preprocessing import preprocess_text, preprocess_texts
+from .training_store import DatabaseTrainingStore
+
+
+class CategorizationService:
+    """
+    In-process entry point for category prediction and feedback.
+
+    Views call this directly instead of going through the HTTP API, and the
+    DRF endpoints in ``api.views`` are thin wrappers around it. Feedback is
+    queued and written by a background worker, so saving an expense never
+    waits on the dataset or on training.
+    """
+
+    def __init__(self):
+        self.feedback_worker = BackgroundWorker('category-feedback')
+
+    def predict(self, description, user_id=None):
+        """Return (category, confidence) for one description."""
+        categories, confidences = self.predict_many([description], user_id)
+        return categories[0], confidences[0]
+
+    def predict_many(self, descriptions, user_id=None):
+        """Return parallel lists of categories and confidences, in input order."""
+        return predict_with_confidence(preprocess_texts(descriptions), user_id)
+
+    def neighbours(self, description, k=5):
+        return registry.neighbours(preprocess_text(description), k)
+
+    def submit_feedback(self, description, category):
+        """Queue a corrected (description, category) pair for learning."""
+        return self.feedback_worker.submit(self.record_feedback, description, category)
+
+    def record_feedback(self, description, category):
+        clean_description = preprocess_text(description)
+        source = registry.source
+        appended = source.append(description, clean_description, category)
+        registry.learn(clean_description, category)
+
+        if isinstance(source, DatabaseTrainingStore) and appended.pk % settings.CATEGORY_COMPACT_ROWS == 0:
+            source.compact()
+
+
+categorization = CategorizationService()
@@ -0,0 +1,16 @@
+# api/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from expenses.models import Expense
+from .personalization import user_models
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def schedule_user_model_retrain(sender, instance, **kwargs):
+    if settings.CATEGORY_USER_MODELS_ENABLED:
+        owner_id = instance.owner_id
+        transaction.on_commit(lambda: user_models.schedule_retrain(owner_id))
@@ -0,0 +1,80 @@
+# api/similarity.py
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+
+class SimilarityIndex:
+    """
+    Nearest-description lookup over L2-normalised TF-IDF rows.
+
+    Rows are precomputed once, together with an inverted index from term to
+    the rows containing it. A query only scores rows that share a term with
+    it, so it never touches the rest of the corpus. Each posting list is
+    ordered by term weight and capped at ``max_postings`` rows, which keeps
+    query cost bounded as the corpus grows; rows that only share very common
+    terms with the query may be missed, but they are also the lowest scoring.
+    """
+
+    def __init__(self, vectorizer, matrix, descriptions, categories, max_postings=1000):
+        self.vectorizer = vectorizer
+        self.descriptions = np.asarray(descriptions, dtype=object)
+        self.categories = np.asarray(categories, dtype=object)
+        self.max_postings = max_postings
+        self._build_postings(normalize(matrix.tocsr(), norm='l2'))
+
+    @classmethod
+    def build(cls, descriptions, categories, clean_descriptions, **kwargs):
+        vectorizer = TfidfVectorizer()
+        matrix = vectorizer.fit_transform(clean_descriptions)
+        return cls(vectorizer, matrix, descriptions, categories, **kwargs)
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    def _build_postings(self, matrix):
+        coo = matrix.tocoo()
+        # Sort every posting by (term, -weight) and keep the strongest
+        # max_postings rows per term.
+        order = np.lexsort((-coo.data, coo.col))
+        terms, rows, weights = coo.col[order], coo.row[order], coo.data[order]
+        n_terms = matrix.shape[1]
+        starts = np.searchsorted(terms, np.arange(n_terms))
+        keep = np.arange(len(terms)) - starts[terms] < self.max_postings
+        terms, rows, weights = terms[keep], rows[keep], weights[keep]
+
+        self.postings_indptr = np.searchsorted(terms, np.arange(n_terms + 1))
+        self.postings_rows = rows.astype(np.int32)
+        self.postings_weights = weights.astype(np.float32)
+
+    def query(self, clean_description, k=5):
+        """Return up to ``k`` (row, score) pairs, best first."""
+        vector = normalize(self.vectorizer.transform([clean_description]), norm='l2')
+        if not vector.nnz:
+            return []
+
+        rows, scores = [], []
+        for term, weight in zip(vector.indices, vector.data):
+            start, end = self.postings_indptr[term], self.postings_indptr[term + 1]
+            rows.append(self.postings_rows[start:end])
+            scores.append(self.postings_weights[start:end] * weight)
+        rows = np.concatenate(rows)
+        if not len(rows):
+            return []
+
+        candidates, positions = np.unique(rows, return_inverse=True)
+        totals = np.bincount(positions, weights=np.concatenate(scores))
+        k = min(k, len(candidates))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind='stable')]
+        return [(int(candidates[i]), float(totals[i])) for i in top]
+
+    def neighbours(self, clean_description, k=5):
+        return [
+            {
+                'description': self.descriptions[row],
+                'category': self.categories[row],
+                'score': round(score, 4),
+            }
+            for row, score in self.query(clean_description, k)
+        ]
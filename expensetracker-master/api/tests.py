@@ -1,3 +1,465 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from nltk.tokenize.destructive import NLTKWordTokenizer
+
+from expenses.models import Category, Expense
+from .model_registry import INCREMENTAL, CategoryModelRegistry
+from .personalization import UserModelCache, predict_with_confidence
+from .models import TrainingExample, TrainingFeedback
+from .prediction_cache import PredictionCache
+from .training_store import DatabaseTrainingStore
+from .preprocessing import preprocess_text, tokenize
+from .similarity import SimilarityIndex
+
+
+TRAINING_ROWS = [
+    ('coffee shop', 'Food'),
+    ('pizza delivery', 'Food'),
+    ('restaurant dinner', 'Food'),
+    ('uber ride', 'Transportation'),
+    ('gas station', 'Transportation'),
+    ('car repair', 'Transportation'),
+]
+
+
+def write_dataset(path, rows):
+    with open(path, 'w') as dataset:
+        dataset.write('description,category,clean_description\n')
+        for description, category in rows:
+            dataset.write(f'{description},{category},{description}\n')
+
+
+class CategoryModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.dataset_path = os.path.join(self.tmp_dir, 'dataset.csv')
+        self.model_dir = os.path.join(self.tmp_dir, 'models')
+        write_dataset(self.dataset_path, TRAINING_ROWS)
+
+    def make_registry(self):
+        return CategoryModelRegistry(dataset_path=self.dataset_path, model_dir=self.model_dir)
+
+    def test_trains_once_and_saves_versioned_model(self):
+        registry = self.make_registry()
+        model = registry.get_model()
+
+        self.assertIs(registry.get_model(), model)
+        self.assertTrue(os.path.exists(registry.model_path(model.version)))
+        self.assertIsNotNone(registry.train_seconds)
+        self.assertIn(registry.predict(['uber ride'])[0], {'Food', 'Transportation'})
+
+    def test_new_worker_loads_saved_model_without_training(self):
+        version = self.make_registry().get_model().version
+
+        registry = self.make_registry()
+        self.assertEqual(registry.get_model().version, version)
+        self.assertIsNone(registry.train_seconds)
+        self.assertIsNotNone(registry.load_seconds)
+
+    @override_settings(CATEGORY_RETRAIN_MINUTES=0)
+    def test_retrains_in_background_when_training_data_changes(self):
+        registry = self.make_registry()
+        first = registry.get_model()
+
+        write_dataset(self.dataset_path, TRAINING_ROWS + [('electricity bill', 'Utilities')])
+        self.assertIs(registry.get_model(), first)
+        registry._retrain_thread.join()
+        second = registry.get_model()
+
+        self.assertNotEqual(first.version, second.version)
+        self.assertIn('Utilities', second.classifier.classes_)
+
+    @override_settings(CATEGORY_RETRAIN_ROWS=3, CATEGORY_RETRAIN_MINUTES=60)
+    def test_feedback_retrains_once_enough_rows_arrive(self):
+        registry = self.make_registry()
+        first = registry.get_model()
+        rows = list(TRAINING_ROWS)
+
+        for _ in range(2):
+            rows.append(('electricity bill', 'Utilities'))
+            write_dataset(self.dataset_path, rows)
+            registry.learn('electricity bill', 'Utilities')
+        self.assertIs(registry.get_model(), first)
+        self.assertIsNone(registry._retrain_thread)
+
+        rows.append(('electricity bill', 'Utilities'))
+        write_dataset(self.dataset_path, rows)
+        registry.learn('electricity bill', 'Utilities')
+        registry._retrain_thread.join()
+
+        self.assertIn('Utilities', registry.get_model().classifier.classes_)
+        self.assertEqual(registry.status()['pending_rows'], 0)
+        # Other workers load the saved model instead of training it again.
+        self.assertEqual(self.make_registry().get_model().version, registry.get_model().version)
+
+
+@override_settings(CATEGORY_RETRAIN_ROWS=3, CATEGORY_RETRAIN_MINUTES=60)
+class IncrementalCategoryModelTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.dataset_path = os.path.join(self.tmp_dir, 'dataset.csv')
+        self.model_dir = os.path.join(self.tmp_dir, 'models')
+        write_dataset(self.dataset_path, TRAINING_ROWS)
+
+    def make_registry(self):
+        return CategoryModelRegistry(
+            dataset_path=self.dataset_path, model_dir=self.model_dir, mode=INCREMENTAL)
+
+    def test_feedback_updates_live_model_without_retraining(self):
+        registry = self.make_registry()
+        model = registry.get_model()
+        version = model.version
+
+        registry.learn('taxi ride', 'Transportation')
+
+        self.assertIs(registry.get_model(), model)
+        self.assertNotEqual(model.version, version)
+        self.assertEqual(registry.status()['pending_rows'], 1)
+        self.assertFalse(registry.status()['retraining'])
+
+    def test_retrain_is_scheduled_after_enough_rows_and_swapped_in(self):
+        registry = self.make_registry()
+        first = registry.get_model()
+
+        for _ in range(3):
+            write_dataset(self.dataset_path, TRAINING_ROWS + [('taxi ride', 'Transportation')])
+            registry.learn('taxi ride', 'Transportation')
+        registry._retrain_thread.join()
+
+        second = registry.get_model()
+        self.assertIsNot(second, first)
+        self.assertEqual(registry.status()['pending_rows'], 0)
+        # Other workers pick up the published model instead of training.
+        self.assertEqual(self.make_registry().get_model().version, second.version)
+
+    def test_unseen_category_triggers_retrain(self):
+        registry = self.make_registry()
+        registry.get_model()
+
+        write_dataset(self.dataset_path, TRAINING_ROWS + [('electricity bill', 'Utilities')])
+        registry.learn('electricity bill', 'Utilities')
+        registry._retrain_thread.join()
+
+        self.assertTrue(registry.get_model().knows('Utilities'))
+
+
+class PredictCategoryBatchTests(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        dataset_path = os.path.join(tmp_dir, 'dataset.csv')
+        write_dataset(dataset_path, TRAINING_ROWS)
+        registry = CategoryModelRegistry(dataset_path=dataset_path, model_dir=os.path.join(tmp_dir, 'models'))
+        for target in ('api.views.registry', 'api.personalization.registry'):
+            patcher = mock.patch(target, registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='batch', password='secret123'))
+
+    def test_returns_predictions_in_input_order(self):
+        descriptions = ['pizza delivery', 'gas station', 'coffee shop']
+        response = self.client.post(reverse('predict-category-batch'), {'descriptions': descriptions}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        predictions = response.data['predictions']
+        self.assertEqual([p['description'] for p in predictions], descriptions)
+        for prediction in predictions:
+            self.assertIn(prediction['predicted_category'], {'Food', 'Transportation'})
+            self.assertGreater(prediction['confidence'], 0)
+            self.assertLessEqual(prediction['confidence'], 1)
+
+    @override_settings(CATEGORY_PREDICT_BATCH_MAX=2)
+    def test_rejects_batches_over_the_limit(self):
+        response = self.client.post(
+            reverse('predict-category-batch'), {'descriptions': ['a', 'b', 'c']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_list_payload(self):
+        response = self.client.post(reverse('predict-category-batch'), {'descriptions': 'coffee'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_prediction_rejects_missing_or_non_string_description(self):
+        for payload in ({}, {'description': None}, {'description': ['coffee']}, {'description': '  '}):
+            with self.subTest(payload=payload):
+                response = self.client.post(reverse('predict-category'), payload, format='json')
+                self.assertEqual(response.status_code, 400)
+
+
+class SimilarityIndexTests(SimpleTestCase):
+    def build(self, **kwargs):
+        descriptions = [description for description, _ in TRAINING_ROWS] + ['pizza shop']
+        categories = [category for _, category in TRAINING_ROWS] + ['Food']
+        return SimilarityIndex.build(descriptions, categories, descriptions, **kwargs)
+
+    def test_scores_match_brute_force_cosine_similarity(self):
+        index = self.build()
+        query = 'pizza coffee shop'
+        expected = cosine_similarity(
+            index.vectorizer.transform([query]),
+            index.vectorizer.transform(index.descriptions),
+        )[0]
+
+        results = index.query(query, k=3)
+
+        self.assertEqual([row for row, _ in results], list(expected.argsort()[::-1][:3]))
+        for row, score in results:
+            self.assertAlmostEqual(score, expected[row], places=5)
+
+    def test_only_rows_sharing_a_term_are_returned(self):
+        neighbours = self.build().neighbours('pizza', k=10)
+        self.assertEqual({n['description'] for n in neighbours}, {'pizza delivery', 'pizza shop'})
+        self.assertEqual(self.build().neighbours('unknown words', k=10), [])
+
+    def test_posting_lists_are_capped(self):
+        index = self.build(max_postings=1)
+        self.assertEqual(len(index.query('pizza', k=10)), 1)
+
+
+class PreprocessTextTests(SimpleTestCase):
+    def test_tokens_match_nltk_word_tokenizer(self):
+        tokenizer = NLTKWordTokenizer()
+        for text in [
+            'coffee shop',
+            "can't stop, won't stop",
+            "john's pizza (downtown)",
+            'e-mail $5.99 at walmart--online',
+            'gonna buy 5,000 items!',
+            'cannot pay the wanna-be gym',
+            'ahara hotel.',
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(tokenize(text), tokenizer.tokenize(text))
+
+    def test_sentence_final_periods_are_split_off(self):
+        self.assertEqual(tokenize('coffee. shop'), ['coffee', '.', 'shop'])
+        self.assertEqual(tokenize('dr. smith visit'), ['dr.', 'smith', 'visit'])
+
+    def test_removes_stopwords_and_punctuation(self):
+        self.assertEqual(preprocess_text("The Coffee Shop's latte, at 5!"), 'coffee shop latte 5')
+
+
+class UserCategoryModelTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        dataset_path = os.path.join(self.tmp_dir, 'dataset.csv')
+        write_dataset(dataset_path, TRAINING_ROWS)
+        self.registry = CategoryModelRegistry(dataset_path=dataset_path, model_dir=os.path.join(self.tmp_dir, 'models'))
+        self.user_models = UserModelCache(model_dir=os.path.join(self.tmp_dir, 'users'))
+        for target, value in (('api.personalization.registry', self.registry),
+                              ('api.personalization.user_models', self.user_models),
+                              ('api.signals.user_models', self.user_models)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='personal', password='secret123')
+        self.work = Category.objects.create(name='Work')
+        self.food = Category.objects.create(name='Food')
+
+    def add_expenses(self, user, description, category, count):
+        for _ in range(count):
+            Expense.objects.create(owner=user, amount=5, description=description, category=category)
+
+    @override_settings(CATEGORY_USER_MODELS_ENABLED=True, CATEGORY_TASKS_EAGER=True, CATEGORY_USER_MIN_ROWS=4)
+    def test_user_history_overrides_global_labels(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_expenses(self.user, 'coffee shop', self.work, 4)
+            self.add_expenses(self.user, 'pizza delivery', self.food, 2)
+
+        categories, _ = predict_with_confidence(['coffee shop'], self.user.pk)
+        self.assertEqual(categories[0], 'Work')
+
+    @override_settings(CATEGORY_USER_MODELS_ENABLED=True, CATEGORY_TASKS_EAGER=True, CATEGORY_USER_MIN_ROWS=4)
+    def test_cold_user_falls_back_to_global_model(self):
+        self.assertIsNone(self.user_models.get(self.user.pk))
+        categories, _ = predict_with_confidence(['coffee shop'], self.user.pk)
+        self.assertIn(categories[0], {'Food', 'Transportation'})
+
+    @override_settings(CATEGORY_USER_MIN_ROWS=4)
+    def test_least_recently_used_models_are_evicted(self):
+        other = User.objects.create_user(username='other', password='secret123')
+        for user in (self.user, other):
+            self.add_expenses(user, 'coffee shop', self.work, 3)
+            self.add_expenses(user, 'pizza delivery', self.food, 3)
+            self.user_models.retrain(user.pk)
+
+        self.user_models.get(self.user.pk)
+        self.user_models._max_bytes = self.user_models.total_bytes
+        self.user_models.get(other.pk)
+
+        self.assertEqual(self.user_models.stats()['models'], 1)
+        self.assertEqual(self.user_models.evictions, 1)
+        self.assertLessEqual(self.user_models.total_bytes, self.user_models.max_bytes)
+
+    @override_settings(CATEGORY_USER_MIN_ROWS=4)
+    def test_failed_retrain_leaves_no_partial_file(self):
+        self.add_expenses(self.user, 'coffee shop', self.work, 3)
+        self.add_expenses(self.user, 'pizza delivery', self.food, 3)
+        with mock.patch('api.personalization.joblib.dump', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.user_models.retrain(self.user.pk)
+        self.assertEqual(os.listdir(self.user_models.model_dir), [])
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+
+    def predict(self, texts):
+        self.calls.append(list(texts))
+        return [f'category for {t}' for t in texts], [0.9] * len(texts)
+
+    def check_hits_and_version_invalidation(self, cache):
+        cache.cache.clear()
+        cache.predict(['coffee shop', 'uber ride'], 'v1', self.predict)
+        categories, confidences = cache.predict(['uber ride', 'gym'], 'v1', self.predict)
+
+        self.assertEqual(categories, ['category for uber ride', 'category for gym'])
+        self.assertEqual(confidences, [0.9, 0.9])
+        self.assertEqual(self.calls, [['coffee shop', 'uber ride'], ['gym']])
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+        cache.predict(['coffee shop'], 'v2', self.predict)
+        self.assertEqual(self.calls[-1], ['coffee shop'])
+
+    def test_locmem_backend(self):
+        self.check_hits_and_version_invalidation(PredictionCache())
+
+    def test_file_backend(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        caches_setting = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'predictions': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmp_dir},
+        }
+        with override_settings(CACHES=caches_setting):
+            self.check_hits_and_version_invalidation(PredictionCache())
+
+
+@override_settings(CATEGORY_TASKS_EAGER=True)
+class CategorizationServiceTests(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.dataset_path = os.path.join(tmp_dir, 'dataset.csv')
+        write_dataset(self.dataset_path, TRAINING_ROWS)
+        registry = CategoryModelRegistry(dataset_path=self.dataset_path, model_dir=os.path.join(tmp_dir, 'models'))
+        for target in ('api.services.registry', 'api.personalization.registry'):
+            patcher = mock.patch(target, registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='service', password='secret123')
+        Category.objects.create(name='Food')
+
+    def dataset_lines(self):
+        with open(self.dataset_path) as dataset:
+            return dataset.read().splitlines()
+
+    def test_update_dataset_endpoint_queues_feedback(self):
+        client = APIClient()
+        response = client.post(
+            reverse('update-dataset'),
+            {'new_data': {'description': 'Taxi to the airport', 'category': 'Transportation'}},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.dataset_lines()[-1], 'Taxi to the airport,Transportation,taxi airport')
+
+    def test_add_expense_submits_corrections_without_http_calls(self):
+        self.client.force_login(self.user)
+        with mock.patch('api.services.categorization.submit_feedback') as submit_feedback:
+            self.client.post(reverse('add-expenses'), {
+                'amount': '12', 'description': 'team lunch', 'expense_date': '2024-01-10',
+                'category': 'Food', 'initial_predicted_category': 'Food',
+            })
+            submit_feedback.assert_not_called()
+
+            self.client.post(reverse('add-expenses'), {
+                'amount': '12', 'description': 'team lunch', 'expense_date': '2024-01-10',
+                'category': 'Food', 'initial_predicted_category': 'Work',
+            })
+            submit_feedback.assert_called_once_with('team lunch', 'Food')
+
+        self.assertEqual(Expense.objects.filter(owner=self.user).count(), 2)
+
+
+@override_settings(CATEGORY_VERSION_CHECK_SECONDS=0)
+class DatabaseTrainingStoreTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.dataset_path = os.path.join(self.tmp_dir, 'dataset.csv')
+        write_dataset(self.dataset_path, TRAINING_ROWS)
+        patcher = override_settings(CATEGORY_DATASET_PATH=self.dataset_path)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.store = DatabaseTrainingStore()
+
+    def test_seeds_from_dataset_file_on_first_use(self):
+        self.store.version()
+        self.assertEqual(TrainingExample.objects.count(), len(TRAINING_ROWS))
+        self.assertFalse(TrainingFeedback.objects.exists())
+
+    def test_compaction_collapses_repeats_into_weights(self):
+        self.store.ensure_seeded()
+        for _ in range(3):
+            self.store.append('Uber Ride!', 'uber ride', 'Transportation')
+        self.store.append('Uber ride', 'uber ride', 'Food')
+
+        self.assertEqual(self.store.compact(), 4)
+        self.assertFalse(TrainingFeedback.objects.exists())
+        self.assertEqual(TrainingExample.objects.get(clean_description='uber ride', category='Transportation').weight, 4)
+        self.assertEqual(TrainingExample.objects.get(clean_description='uber ride', category='Food').weight, 1)
+
+    def test_compaction_that_loses_the_race_does_nothing(self):
+        self.store.ensure_seeded()
+        self.store.append('taxi', 'taxi', 'Transportation')
+        weights = list(TrainingExample.objects.values_list('key', 'weight'))
+        aggregate = TrainingFeedback.objects.aggregate
+
+        def compacted_meanwhile(**kwargs):
+            latest = aggregate(**kwargs)
+            TrainingFeedback.objects.all().delete()
+            return latest
+
+        with mock.patch.object(TrainingFeedback.objects, 'aggregate', side_effect=compacted_meanwhile):
+            self.assertEqual(self.store.compact(), 0)
+        self.assertEqual(list(TrainingExample.objects.values_list('key', 'weight')), weights)
+
+    def test_version_moves_on_append_but_not_on_compaction(self):
+        before = self.store.version()
+        self.store.append('taxi', 'taxi', 'Transportation')
+        appended = self.store.version()
+        self.store.compact()
+
+        self.assertNotEqual(before, appended)
+        self.assertEqual(self.store.version(), appended)
+
+    def test_training_streams_weighted_rows(self):
+        self.store.append('taxi', 'taxi', 'Transportation')
+        rows = [row for chunk in self.store.iter_chunks(4) for row in chunk]
+
+        self.assertEqual(len(rows), len(TRAINING_ROWS) + 1)
+        self.assertEqual(sum(row.weight for row in rows), len(TRAINING_ROWS) + 1)
+
+        registry = CategoryModelRegistry(model_dir=os.path.join(self.tmp_dir, 'models'), source=self.store)
+        self.assertIn('Transportation', registry.get_model().classifier.classes_)
+        self.assertEqual(registry.get_model().version, self.store.version())
@@ -0,0 +1,207 @@
+# api/training_store.py
+import csv
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.db.models.functions import Greatest
+
+
+class TrainingRow:
+    __slots__ = ('description', 'clean_description', 'category', 'weight')
+
+    def __init__(self, description, clean_description, category, weight=1):
+        self.description = description
+        self.clean_description = clean_description
+        self.category = category
+        self.weight = weight
+
+
+class CsvTrainingSource:
+    """Training rows read from a file in the ``dataset.csv`` schema."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat_key = None
+        self._version = None
+
+    def version(self):
+        # Hash the file only when its size or mtime changes, so checking
+        # for a new version on every request is a single stat() call.
+        stat = os.stat(self.path)
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+        if stat_key != self._stat_key:
+            digest = hashlib.sha1()
+            with open(self.path, 'rb') as dataset:
+                for block in iter(lambda: dataset.read(1 << 20), b''):
+                    digest.update(block)
+            self._version = digest.hexdigest()[:16]
+            self._stat_key = stat_key
+        return self._version
+
+    def append(self, description, clean_description, category):
+        with self._lock:
+            with open(self.path, 'a', newline='') as dataset:
+                csv.writer(dataset).writerow([description, category, clean_description])
+
+    def iter_chunks(self, chunk_rows):
+        with open(self.path, newline='') as dataset:
+            chunk = []
+            for row in csv.DictReader(dataset):
+                if not row.get('category'):
+                    continue
+                chunk.append(TrainingRow(row['description'] or '', row['clean_description'] or '', row['category']))
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+def example_key(clean_description, category):
+    return hashlib.sha1(f'{clean_description}\x00{category}'.encode('utf-8')).hexdigest()
+
+
+class DatabaseTrainingStore:
+    """
+    Training corpus kept in the database as an append-only log plus a compacted table.
+
+    ``append`` is a single INSERT into ``TrainingFeedback``, which is atomic
+    and never rewrites existing rows. ``compact`` periodically collapses the
+    log into ``TrainingExample``, counting repeated (description, category)
+    pairs as weight. Training streams both tables with ``iterator()``.
+
+    The data version is the highest feedback id ever written, so it only
+    moves when rows are added and stays put across compaction.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._checked_at = 0
+        self._seeded = False
+
+    def version(self):
+        self.ensure_seeded()
+        if self._version is None or time.monotonic() - self._checked_at >= settings.CATEGORY_VERSION_CHECK_SECONDS:
+            from .models import TrainingExample, TrainingFeedback
+
+            latest = max(
+                TrainingFeedback.objects.aggregate(latest=Max('id'))['latest'] or 0,
+                TrainingExample.objects.aggregate(latest=Max('last_feedback_id'))['latest'] or 0,
+            )
+            self._version = f'db{latest}'
+            self._checked_at = time.monotonic()
+        return self._version
+
+    def append(self, description, clean_description, category):
+        from .models import TrainingFeedback
+
+        self.ensure_seeded()
+        feedback = TrainingFeedback.objects.create(
+            description=description, clean_description=clean_description, category=category)
+        self._version = None
+        return feedback
+
+    def append_many(self, rows, batch_size=5000):
+        from .models import TrainingFeedback
+
+        TrainingFeedback.objects.bulk_create(
+            (TrainingFeedback(description=d, clean_description=c, category=cat) for d, c, cat in rows),
+            batch_size=batch_size,
+        )
+        self._version = None
+
+    def pending(self):
+        from .models import TrainingFeedback
+
+        return TrainingFeedback.objects.count()
+
+    def compact(self):
+        """Fold the feedback log into weighted examples. Returns the number of log rows folded."""
+        from .models import TrainingExample, TrainingFeedback
+
+        with transaction.atomic():
+            max_id = TrainingFeedback.objects.aggregate(latest=Max('id'))['latest']
+            if max_id is None:
+                return 0
+            log = TrainingFeedback.objects.filter(id__lte=max_id)
+            # Lock the rows in a query of their own: PostgreSQL rejects FOR
+            # UPDATE with GROUP BY. A concurrent compaction waits here until
+            # the first one commits, then finds the rows gone.
+            if not list(log.select_for_update().values_list('id', flat=True)):
+                return 0
+            groups = list(
+                log.values('clean_description', 'category')
+                .annotate(count=Count('id'), description=Min('description'), latest=Max('id'))
+            )
+            by_key = {example_key(g['clean_description'], g['category']): g for g in groups}
+            existing = set(
+                TrainingExample.objects.filter(key__in=by_key).values_list('key', flat=True))
+
+            for key in existing:
+                group = by_key[key]
+                TrainingExample.objects.filter(key=key).update(
+                    weight=F('weight') + group['count'],
+                    last_feedback_id=Greatest('last_feedback_id', group['latest']),
+                )
+            TrainingExample.objects.bulk_create([
+                TrainingExample(
+                    key=key,
+                    description=group['description'],
+                    clean_description=group['clean_description'],
+                    category=group['category'],
+                    weight=group['count'],
+                    last_feedback_id=group['latest'],
+                )
+                for key, group in by_key.items() if key not in existing
+            ], batch_size=1000)
+
+            log.delete()
+        return sum(g['count'] for g in groups)
+
+    def iter_chunks(self, chunk_rows):
+        from .models import TrainingExample, TrainingFeedback
+
+        self.ensure_seeded()
+        sources = [
+            TrainingExample.objects.order_by('id').values_list(
+                'description', 'clean_description', 'category', 'weight'),
+            TrainingFeedback.objects.order_by('id').values_list(
+                'description', 'clean_description', 'category'),
+        ]
+        chunk = []
+        for rows in sources:
+            for row in rows.iterator(chunk_size=chunk_rows):
+                chunk.append(TrainingRow(*row))
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def import_csv(self, path, batch_size=5000):
+        """Append every row of a ``dataset.csv`` style file to the log and compact it."""
+        source = CsvTrainingSource(path)
+        for chunk in source.iter_chunks(batch_size):
+            self.append_many(((r.description, r.clean_description, r.category) for r in chunk), batch_size)
+        return self.compact()
+
+    def ensure_seeded(self):
+        """Seed an empty store from ``CATEGORY_DATASET_PATH`` the first time it is used."""
+        if self._seeded:
+            return
+        from .models import TrainingExample, TrainingFeedback
+
+        with transaction.atomic():
+            empty = not TrainingExample.objects.exists() and not TrainingFeedback.objects.exists()
+            if empty and os.path.exists(settings.CATEGORY_DATASET_PATH):
+                self.import_csv(settings.CATEGORY_DATASET_PATH)
+        self._seeded = True
+
+
+training_store = DatabaseTrainingStore()
@@ -1,8 +1,11 @@
 # api/urls.py
 from django.urls import path
-from .views import PredictCategory, UpdateDataset
+from .views import PredictCategory, PredictCategoryBatch, SimilarDescriptions, UpdateDataset, ModelStatus
 
 urlpatterns = [
     path('predict-category/', PredictCategory.as_view(), name='predict-category'),
+    path('predict-category/batch/', PredictCategoryBatch.as_view(), name='predict-category-batch'),
+    path('similar-descriptions/', SimilarDescriptions.as_view(), name='similar-descriptions'),
     path('update-dataset/', UpdateDataset.as_view(), name='update-dataset'),
+    path('model-status/', ModelStatus.as_view(), name='model-status'),
 ]
@@ -2,20 +2,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics.pairwise import cosine_similarity
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-import nltk
 import json
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated 
 from .serializers import YourDataSerializer  
-
-
-nltk.download('punkt')
-nltk.download('stopwords')
+from .model_registry import registry
+from .personalization import user_models
+from .prediction_cache import prediction_cache
+from .services import categorization
 
 
 class PredictCategory(APIView):
@@ -23,57 +17,72 @@ class PredictCategory(APIView):
 
     def post(self, request):
         user_input = request.data.get('description')
-        data = pd.read_csv(
-            'dataset.csv')
-        tfidf_vectorizer = TfidfVectorizer()
-        X = tfidf_vectorizer.fit_transform(data['clean_description'])
-        model = RandomForestClassifier()
-        model.fit(X, data['category'])
-        user_input = preprocess_text(user_input)
-        user_input_vector = tfidf_vectorizer.transform([user_input])
-        similarities = cosine_similarity(user_input_vector, X)
-        closest_match_index = similarities.argmax()
-        predicted_category = model.predict(X[closest_match_index])
+        if not isinstance(user_input, str) or not user_input.strip():
+            return Response({'error': 'description must be a non-empty string'}, status=status.HTTP_400_BAD_REQUEST)
+        predicted_category, _ = categorization.predict(user_input, request.user.pk)
 
-        return Response({'predicted_category': predicted_category[0]}, status=status.HTTP_200_OK)
+        return Response({'predicted_category': predicted_category}, status=status.HTTP_200_OK)
 
 
+class PredictCategoryBatch(APIView):
+    permission_classes = [IsAuthenticated]
 
+    def post(self, request):
+        descriptions = request.data.get('descriptions')
+        max_batch_size = settings.CATEGORY_PREDICT_BATCH_MAX
 
-class UpdateDataset(APIView):
-    # permission_classes = [IsAuthenticated]
+        if not isinstance(descriptions, list) or not all(isinstance(d, str) for d in descriptions):
+            return Response({'error': 'descriptions must be a list of strings'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(descriptions) > max_batch_size:
+            return Response({'error': f'At most {max_batch_size} descriptions can be predicted at once'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not descriptions:
+            return Response({'predictions': []}, status=status.HTTP_200_OK)
+
+        categories, confidences = categorization.predict_many(descriptions, request.user.pk)
+
+        predictions = [
+            {'description': description, 'predicted_category': category, 'confidence': round(float(confidence), 4)}
+            for description, category, confidence in zip(descriptions, categories, confidences)
+        ]
+        return Response({'predictions': predictions}, status=status.HTTP_200_OK)
+
+
+class SimilarDescriptions(APIView):
+    permission_classes = [IsAuthenticated]
 
     def post(self, request):
-       new_data = request.data.get('new_data')
-
-       if 'description' in new_data and 'category' in new_data:
-            # Load your existing dataset
-            data = pd.read_csv('dataset.csv')  # Load the existing dataset
-            new_category = new_data['category']
-            new_description = new_data['description']
-
-            # Append the new data to the dataset
-            new_row = {'description': new_description, 'category': new_category, 'clean_description': preprocess_text(new_description)}
-            data = pd.concat([data, pd.DataFrame([new_row])], ignore_index=True)
-            # Save the updated dataset
-            data.to_csv('dataset.csv', index=False)
-            
-            try:
-                tfidf_vectorizer = TfidfVectorizer()
-                # Use fit_transform instead of transform for new vectorizer
-                X = tfidf_vectorizer.fit_transform(data['clean_description'])
-                model = RandomForestClassifier()
-                model.fit(X, data['category'])
-                
-                return Response({'message': 'Dataset updated successfully'}, status=status.HTTP_200_OK)
-            except Exception as e:
-                return Response({'error': f'Model training failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-       else:
+        description = request.data.get('description')
+        try:
+            k = min(int(request.data.get('k', 5)), settings.CATEGORY_SIMILARITY_MAX_K)
+        except (TypeError, ValueError):
+            return Response({'error': 'k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(description, str) or k < 1:
             return Response({'error': 'Invalid data format'}, status=status.HTTP_400_BAD_REQUEST)
 
+        neighbours = categorization.neighbours(description, k)
+        return Response({'neighbours': neighbours}, status=status.HTTP_200_OK)
 
-def preprocess_text(text):
-    stop_words = set(stopwords.words('english'))
-    tokens = word_tokenize(text.lower())
-    tokens = [t for t in tokens if t.isalnum() and t not in stop_words]
-    return ' '.join(tokens)
+
+class ModelStatus(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(
+            dict(registry.status(), user_models=user_models.stats(), prediction_cache=prediction_cache.stats()),
+            status=status.HTTP_200_OK,
+        )
+
+
+class UpdateDataset(APIView):
+    # permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        new_data = request.data.get('new_data')
+
+        if isinstance(new_data, dict) and 'description' in new_data and 'category' in new_data:
+            # Learning happens on the feedback queue, off the request path
+            categorization.submit_feedback(new_data['description'], new_data['category'])
+            return Response({'message': 'Feedback accepted'}, status=status.HTTP_202_ACCEPTED)
+        else:
+            return Response({'error': 'Invalid data format'}, status=status.HTTP_400_BAD_REQUEST)
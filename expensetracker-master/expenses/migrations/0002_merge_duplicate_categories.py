@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:54
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    """Point expenses at the oldest category of each name and drop the rest, so the name can be unique."""
+    from analytics.rollups import RollupSpec
+
+    Category = apps.get_model('expenses', 'Category')
+    Expense = apps.get_model('expenses', 'Expense')
+    duplicated = (Category.objects.values('name').annotate(keep=Min('id'), copies=Count('id'))
+                  .filter(copies__gt=1))
+    owners = set()
+    for row in duplicated:
+        extra = Category.objects.filter(name=row['name']).exclude(id=row['keep'])
+        moved = Expense.objects.filter(category__in=extra)
+        owners.update(moved.values_list('owner_id', flat=True).distinct())
+        moved.update(category_id=row['keep'])
+        # Cascades to the rollup rows of the dropped categories.
+        extra.delete()
+    spec = RollupSpec(Expense, 'category_id', apps.get_model('analytics', 'DailyExpenseTotal'),
+                      apps.get_model('analytics', 'MonthlyExpenseTotal'))
+    for owner_id in owners:
+        spec.rebuild(owner_id=owner_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0001_initial'),
+        ('analytics', '0002_populate_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+    ]
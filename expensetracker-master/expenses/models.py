@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 from django.utils.timezone import now
 
 class Category(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
 
     class Meta:
         verbose_name_plural = 'Categories'
@@ -23,6 +23,13 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ['-date']
+        # Every list, export and seek filters by owner first; the id makes
+        # the sort keys unique for keyset pagination (expenses.pagination).
+        indexes = [
+            models.Index(fields=['owner', 'date', 'id'], name='expense_owner_date_idx'),
+            models.Index(fields=['owner', 'amount', 'id'], name='expense_owner_amount_idx'),
+            models.Index(fields=['owner', 'category', 'date'], name='expense_owner_category_idx'),
+        ]
 
 class ExpenseLimit(models.Model):
     owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
@@ -0,0 +1,193 @@
+# expenses/pagination.py
+"""
+Keyset ("seek") pagination for the expense and income lists.
+
+``Paginator`` runs ``COUNT(*)`` on every page view and reads deep pages
+with ``OFFSET``, which walks every skipped row. ``KeysetPaginator`` instead
+continues from the sort key of the row at the edge of the current page,
+``WHERE (date, id) < (last date, last id)``, so every page costs the same
+index range scan. Pages are addressed by opaque signed cursors.
+
+``KeysetPage`` has the parts of ``Page``'s interface the list templates
+use, so they work unchanged: ``next_page_number`` and
+``previous_page_number`` return cursors that go in the same ``?page=``
+parameter. ``?page=1`` is the first page, the last page number (from the
+pagination links) is read backwards from the end, and any other number
+falls back to an offset.
+"""
+import math
+
+from django.core import signing
+from django.db.models import Q
+
+
+# Each list sort option, with the id as tie-breaker so the keys are unique.
+SORTS = {
+    'amount_asc': ('amount', 'id'),
+    'amount_desc': ('-amount', '-id'),
+    'date_asc': ('date', 'id'),
+    'date_desc': ('-date', '-id'),
+}
+DEFAULT_SORT = 'date_desc'
+
+
+def sort_ordering(sort_order):
+    return SORTS.get(sort_order, SORTS[DEFAULT_SORT])
+
+
+def _reverse(ordering):
+    return tuple(key[1:] if key.startswith('-') else f'-{key}' for key in ordering)
+
+
+def _after(ordering, values):
+    """Q for rows strictly after ``values`` in ``ordering``: (a, b) > (x, y) as a < x or (a = x and b < y)."""
+    condition = Q()
+    for depth, key in enumerate(ordering):
+        field = key.lstrip('-')
+        step = Q(**{f'{field}__{"lt" if key.startswith("-") else "gt"}': values[depth]})
+        for previous, value in zip(ordering[:depth], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, a tuple of fields ending in a unique one.
+
+    ``count``, if given, is a callable returning the (possibly approximate)
+    number of rows, used for ``num_pages`` instead of ``COUNT(*)``. The
+    count is only computed when ``num_pages`` is read.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self._count = count
+
+    @property
+    def count(self):
+        if not hasattr(self, '_count_value'):
+            self._count_value = self._count() if self._count is not None else self.queryset.count()
+        return self._count_value
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def get_page(self, page):
+        """Return the page for a cursor or a page number; anything invalid gives the first page."""
+        position = self._read_cursor(page)
+        if position is not None:
+            return self._seek(*position)
+        try:
+            number = int(page)
+        except (TypeError, ValueError):
+            number = 1
+        if number <= 1:
+            return self._page(self._rows(self.ordering, self.per_page + 1), 1, backwards=False, has_previous=False)
+        if number >= self.num_pages:
+            return self._last()
+        return self._offset(number)
+
+    def _rows(self, ordering, limit, after=None, offset=0):
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(_after(ordering, after))
+        return list(queryset.order_by(*ordering)[offset:offset + limit])
+
+    def _page(self, rows, number, backwards, has_previous=True, has_next=True):
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_previous = more
+        else:
+            has_next = more
+        return KeysetPage(rows, number, self, has_previous, has_next)
+
+    def _seek(self, direction, values, number):
+        if direction == 'next':
+            rows = self._rows(self.ordering, self.per_page + 1, after=values)
+            return self._page(rows, number, backwards=False)
+        rows = self._rows(_reverse(self.ordering), self.per_page + 1, after=values)
+        return self._page(rows, max(number, 1), backwards=True)
+
+    def _last(self):
+        rows = self._rows(_reverse(self.ordering), self.per_page + 1)
+        return self._page(rows, self.num_pages, backwards=True, has_next=False)
+
+    def _offset(self, number):
+        rows = self._rows(self.ordering, self.per_page + 1, offset=(number - 1) * self.per_page)
+        if not rows:
+            return self._last()
+        return self._page(rows, number, backwards=False)
+
+    def key(self, row):
+        return [_jsonable(getattr(row, field.lstrip('-'))) for field in self.ordering]
+
+    def cursor(self, direction, row, number):
+        return signing.dumps(
+            {'ordering': self.ordering, 'direction': direction, 'key': self.key(row), 'number': number},
+            salt='keyset-page')
+
+    def _read_cursor(self, page):
+        if not page or str(page).isdigit():
+            return None
+        try:
+            data = signing.loads(page, salt='keyset-page')
+        except signing.BadSignature:
+            return None
+        if tuple(data.get('ordering', ())) != self.ordering:
+            # A cursor from another sort order.
+            return None
+        model = self.queryset.model
+        values = [model._meta.get_field(field.lstrip('-')).to_python(value)
+                  for field, value in zip(self.ordering, data['key'])]
+        return data['direction'], values, data['number']
+
+
+def _jsonable(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class KeysetPage:
+    def __init__(self, object_list, number, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f'<Page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def count(self):
+        # The list templates test ``{% if expenses.count %}``, which used to
+        # run COUNT(*) over the whole queryset; a page answers from its rows.
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    def next_page_number(self):
+        return self.paginator.cursor('next', self.object_list[-1], self.number + 1)
+
+    def previous_page_number(self):
+        return self.paginator.cursor('previous', self.object_list[0], self.number - 1)
@@ -1,3 +1,84 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Category, Expense
+from .pagination import KeysetPaginator, sort_ordering
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.user = User.objects.create_user(username='pager', password='secret')
+        self.client.login(username='pager', password='secret')
+        food = Category.objects.create(name='Food')
+        # Repeated dates and amounts, so every ordering needs the id tie-breaker.
+        rows = [(1, 5), (2, 7), (2, 5), (3, 9), (3, 7), (3, 1), (4, 5)]
+        self.expenses = [
+            Expense.objects.create(owner=self.user, amount=amount, date=datetime.date(2024, 3, day),
+                                   category=food, description=f'e{i}')
+            for i, (day, amount) in enumerate(rows)
+        ]
+        other = User.objects.create_user(username='other', password='secret')
+        Expense.objects.create(owner=other, amount=1, date=datetime.date(2024, 3, 1), category=food, description='x')
+        self.queryset = Expense.objects.filter(owner=self.user)
+
+    def walk(self, sort, per_page=3):
+        paginator = KeysetPaginator(self.queryset, per_page, sort_ordering(sort))
+        page = paginator.get_page(None)
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_page_number())
+            pages.append(page)
+        return paginator, pages
+
+    def test_pages_follow_every_sort_order(self):
+        for sort in (None, 'amount_asc', 'amount_desc', 'date_asc', 'date_desc'):
+            with self.subTest(sort=sort):
+                _, pages = self.walk(sort)
+                expected = list(self.queryset.order_by(*sort_ordering(sort)))
+                self.assertEqual([row for page in pages for row in page], expected)
+                self.assertEqual([page.number for page in pages], [1, 2, 3])
+
+    def test_previous_cursor_returns_the_same_rows(self):
+        paginator, pages = self.walk('amount_desc')
+        back = paginator.get_page(pages[2].previous_page_number())
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertEqual(back.number, 2)
+        self.assertTrue(back.has_next())
+        self.assertTrue(back.has_previous())
+        first = paginator.get_page(back.previous_page_number())
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_page_numbers_and_bad_cursors(self):
+        paginator = KeysetPaginator(self.queryset, 3, sort_ordering('date_asc'), count=lambda: 7)
+        last = paginator.get_page('3')
+        self.assertEqual(last.number, 3)
+        self.assertEqual([row.description for row in last], ['e4', 'e5', 'e6'])
+        self.assertFalse(last.has_next())
+        self.assertEqual(list(paginator.get_page('2')), self.expenses[3:6])
+
+        cursor = paginator.get_page(None).next_page_number()
+        for bad in ('junk', cursor + 'x', cursor.replace(cursor[:4], 'eyJh')):
+            self.assertEqual(paginator.get_page(bad).number, 1)
+        other_sort = KeysetPaginator(self.queryset, 3, sort_ordering('amount_asc'))
+        self.assertEqual(other_sort.get_page(cursor).number, 1)
+
+    def test_index_reads_one_page_without_counting(self):
+        # session, user, page rows, currency; the rollup count is cached on the first request.
+        self.client.get(reverse('expenses'))
+        with self.assertNumQueries(4) as queries:
+            response = self.client.get(reverse('expenses'), {'sort': 'amount_asc'})
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(response.context['total'], 2)
+        self.assertEqual([e.description for e in response.context['expenses']], ['e5', 'e0', 'e2', 'e6', 'e1'])
 
-# Create your tests here.
+        response = self.client.get(reverse('expenses'), {
+            'sort': 'amount_asc', 'page': response.context['page_obj'].next_page_number()})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual([e.description for e in response.context['page_obj']], ['e4', 'e3'])
+        self.assertContains(response, 'Showing page 2 of 2')
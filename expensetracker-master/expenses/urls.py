@@ -10,6 +10,8 @@ urlpatterns = [
     path('expense-delete/<int:id>', views.delete_expense, name="expense-delete"),
     path('search-expenses', csrf_exempt(views.search_expenses),
          name="search_expenses"),
+    path('search-expenses/suggest', views.suggest_expenses,
+         name="suggest_expenses"),
     path('expense_category_summary', views.expense_category_summary,
          name="expense_category_summary"),
     path('stats', views.stats_view,
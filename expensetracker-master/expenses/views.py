@@ -2,48 +2,46 @@ from django.shortcuts import render, redirect, HttpResponseRedirect
 from django.contrib.auth.decorators import login_required
 from .models import Category, Expense, ExpenseLimit
 from django.contrib import messages
-from django.core.paginator import Paginator
-import json
 from django.http import JsonResponse
 from userpreferences.models import UserPreference
 import datetime
 from datetime import date
 from django.core.mail import send_mail
 from django.conf import settings
-import requests
+from api.services import categorization
+from analytics.dashboard_cache import dashboard_cache
+from analytics.rollups import EXPENSES
+from analytics.totals import range_total, row_count, totals_by
+from .pagination import KeysetPaginator, sort_ordering
+from search import index as search_index
+from search.views import search_response, suggestion_response
 
 @login_required(login_url='/authentication/login')
 def search_expenses(request):
     if request.method == 'POST':
-        search_str = json.loads(request.body).get('searchText')
-        expenses = Expense.objects.filter(
-            amount__istartswith=search_str, owner=request.user) | Expense.objects.filter(
-            date__istartswith=search_str, owner=request.user) | Expense.objects.filter(
-            description__icontains=search_str, owner=request.user) | Expense.objects.filter(
-            category__icontains=search_str, owner=request.user)
-        data = expenses.values()
-        return JsonResponse(list(data), safe=False)
+        return search_response(request, search_index.EXPENSES)
+
+
+@login_required(login_url='/authentication/login')
+def suggest_expenses(request):
+    return suggestion_response(request, search_index.EXPENSES)
 
 
 @login_required(login_url='/authentication/login')
 def index(request):
     categories = Category.objects.all()
-    expenses = Expense.objects.filter(owner=request.user)
+    # The list shows each expense's category name.
+    expenses = Expense.objects.filter(owner=request.user).select_related('category')
 
     sort_order = request.GET.get('sort')
 
-    if sort_order == 'amount_asc':
-        expenses = expenses.order_by('amount')
-    elif sort_order == 'amount_desc':
-        expenses = expenses.order_by('-amount')
-    elif sort_order == 'date_asc':
-        expenses = expenses.order_by('date')
-    elif sort_order == 'date_desc':
-        expenses = expenses.order_by('-date')
-
-    paginator = Paginator(expenses, 5)
-    page_number = request.GET.get('page')
-    page_obj = Paginator.get_page(paginator, page_number)
+    # Seek from the edge row of the page instead of COUNT(*) plus OFFSET;
+    # the page count comes from the rollups and is cached per data version.
+    paginator = KeysetPaginator(
+        expenses, 5, sort_ordering(sort_order),
+        count=lambda: dashboard_cache.get_or_compute(
+            request.user.pk, 'row_count', lambda: row_count(EXPENSES, request.user), 'expenses'))
+    page_obj = paginator.get_page(request.GET.get('page'))
     try:
         currency = UserPreference.objects.get(user=request.user).currency
     except:
@@ -51,7 +49,7 @@ def index(request):
 
     total = page_obj.paginator.num_pages
     context = {
-        'expenses': expenses,
+        'expenses': page_obj,
         'page_obj': page_obj,
         'currency': currency,
         'total': total,
@@ -128,13 +126,8 @@ def add_expense(request):
         
         initial_predicted_category = request.POST.get('initial_predicted_category')
         if predicted_category != initial_predicted_category:
-            new_data = {
-            'description': description,
-            'category': predicted_category,  # Keep string for API call
-        }
-
-        update_url = 'http://127.0.0.1:8000/api/update-dataset/'
-        response = requests.post(update_url, json={'new_data': new_data})
+            # Queued; the model learns from the correction in the background
+            categorization.submit_feedback(description, final_category_obj.name)
 
         user = request.user
         expense_limits = ExpenseLimit.objects.filter(owner=user)
@@ -228,29 +221,13 @@ def delete_expense(request, id):
 
 @login_required(login_url='/authentication/login')
 def expense_category_summary(request):
-    todays_date = datetime.date.today()
-    six_months_ago = todays_date-datetime.timedelta(days=30*6)
-    expenses = Expense.objects.filter(owner=request.user,
-                                      date__gte=six_months_ago, date__lte=todays_date)
-    finalrep = {}
-
-    def get_category_name(expense):
-        return expense.category.name
-    
-    # Get unique category names
-    category_list = list(set(map(get_category_name, expenses)))
+    def summarize():
+        todays_date = datetime.date.today()
+        six_months_ago = todays_date-datetime.timedelta(days=30*6)
+        # One GROUP BY over the rollups instead of a query per category
+        return totals_by(EXPENSES, request.user, six_months_ago, todays_date, by='category')
 
-    def get_expense_category_amount(category_name):
-        amount = 0
-        filtered_by_category = expenses.filter(category__name=category_name)
-
-        for item in filtered_by_category:
-            amount += item.amount
-        return amount
-
-    # Calculate total amount for each category
-    for category_name in category_list:
-        finalrep[category_name] = get_expense_category_amount(category_name)
+    finalrep = dashboard_cache.get_or_compute(request.user.pk, 'expense_category_summary', summarize)
 
     return JsonResponse({'expense_category_data': finalrep}, safe=False)
 
@@ -258,19 +235,9 @@ def expense_category_summary(request):
 def stats_view(request):
     return render(request, 'expenses/stats.html')
 
-@login_required(login_url='/authentication/login')
-def predict_category(description):
-    predict_category_url = 'http://localhost:8000/api/predict-category/'  # Use the correct URL path
-    data = {'description': description}
-    response = requests.post(predict_category_url, data=data)
-
-    if response.status_code == 200:
-        # Get the predicted category from the response
-        predicted_category = response.json().get('predicted_category')
-        return predicted_category
-    else:
-        # Handle the case where the prediction request failed
-        return None
+def predict_category(description, user=None):
+    predicted_category, _ = categorization.predict(description, user.pk if user else None)
+    return predicted_category
     
 
 def set_expense_limit(request):
@@ -292,6 +259,5 @@ def set_expense_limit(request):
     
 def get_expense_of_day(user):
     current_date=date.today()
-    expenses=Expense.objects.filter(owner=user,date=current_date)
-    total_expenses=sum(expense.amount for expense in expenses)
+    total_expenses=range_total(EXPENSES, user, current_date, current_date)
     return total_expenses
\ No newline at end of file
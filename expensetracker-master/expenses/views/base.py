@@ -1,7 +1,7 @@
 from django.views import View
 from django.shortcuts import render
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.paginator import Paginator
+from expenses.pagination import KeysetPaginator, sort_ordering
 from userpreferences.models import UserPreference
 
 class BaseFinanceView(LoginRequiredMixin, View):
@@ -16,7 +16,7 @@ class BaseFinanceView(LoginRequiredMixin, View):
         login_url (str): URL to redirect to if user is not authenticated
         items_per_page (int): Number of items to show per page
         template_name (str): Template to render (must be set by subclass)
-        context_object_name (str): Name for the main queryset in context
+        context_object_name (str): Name for the current page in context
     """
     
     login_url = '/authentication/login'
@@ -33,31 +33,24 @@ class BaseFinanceView(LoginRequiredMixin, View):
         except UserPreference.DoesNotExist:
             return None
 
-    def get_sorted_queryset(self, queryset):
-        sort_order = self.request.GET.get('sort')
-        if sort_order == 'amount_asc':
-            return queryset.order_by('amount')
-        elif sort_order == 'amount_desc':
-            return queryset.order_by('-amount')
-        elif sort_order == 'date_asc':
-            return queryset.order_by('date')
-        elif sort_order == 'date_desc':
-            return queryset.order_by('-date')
-        return queryset
+    def get_ordering(self):
+        return sort_ordering(self.request.GET.get('sort'))
+
+    def get_row_count(self):
+        """Row count for the page links; only called when they are rendered. Override to approximate it."""
+        return self.get_queryset().count()
 
     def get_paginated_data(self, queryset):
-        paginator = Paginator(queryset, self.items_per_page)
-        page_number = self.request.GET.get('page')
-        return Paginator.get_page(paginator, page_number)
+        paginator = KeysetPaginator(queryset, self.items_per_page, self.get_ordering(), count=self.get_row_count)
+        return paginator.get_page(self.request.GET.get('page'))
 
     def get_context_data(self, **kwargs):
-        queryset = self.get_queryset()
-        sorted_queryset = self.get_sorted_queryset(queryset)
-        page_obj = self.get_paginated_data(sorted_queryset)
+        page_obj = self.get_paginated_data(self.get_queryset())
         currency = self.get_currency()
 
         context = {
-            self.context_object_name: sorted_queryset,
+            # The page stands in for the queryset, so templates never count it.
+            self.context_object_name: page_obj,
             'page_obj': page_obj,
             'currency': currency,
             'total': page_obj.paginator.num_pages,
@@ -6,6 +6,9 @@ from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 from ..models import ExpenseLimit
+from analytics.dashboard_cache import dashboard_cache
+from analytics.rollups import EXPENSES
+from analytics.totals import row_count
 
 class ExpenseListView(BaseFinanceView):
     """
@@ -29,7 +32,11 @@ class ExpenseListView(BaseFinanceView):
         Returns:
             QuerySet: A queryset of Expense objects filtered by the current user
         """
-        return Expense.objects.filter(owner=self.request.user)
+        return Expense.objects.filter(owner=self.request.user).select_related('category')
+
+    def get_row_count(self):
+        return dashboard_cache.get_or_compute(
+            self.request.user.pk, 'row_count', lambda: row_count(EXPENSES, self.request.user), 'expenses')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from django.contrib import messages
+from celery.schedules import crontab
 import matplotlib
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,7 +55,9 @@ INSTALLED_APPS = [
     'rest_framework',
     'api',
     'userprofile',
-    'report_generation'
+    'report_generation',
+    'analytics',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -99,6 +102,36 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Category predictions keyed by normalised description and model version.
+    # Any backend works; set PREDICTION_CACHE_BACKEND/LOCATION to share it
+    # between workers, e.g. the file based cache.
+    'predictions': {
+        'BACKEND': os.getenv('PREDICTION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('PREDICTION_CACHE_LOCATION', 'category-predictions'),
+        'TIMEOUT': int(os.getenv('PREDICTION_CACHE_TTL', 24 * 60 * 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', 50000)),
+        },
+    },
+    # Per-user dashboard numbers, versioned by the user's data version
+    # (see analytics.dashboard_cache). Use a backend shared by all workers
+    # in production, or a write in one worker won't invalidate the others
+    # and the periodic reports can't reuse the report snapshots.
+    'dashboards': {
+        'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'dashboards'),
+        'TIMEOUT': int(os.getenv('DASHBOARD_CACHE_TTL', 24 * 60 * 60)),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -155,7 +188,90 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 
+# Category prediction model
+CATEGORY_DATASET_PATH = os.path.join(BASE_DIR, 'dataset.csv')
+# 'database' keeps the training corpus in api.TrainingFeedback/TrainingExample
+# (seeded from CATEGORY_DATASET_PATH); 'csv' trains straight from the file
+CATEGORY_TRAINING_STORE = os.getenv('CATEGORY_TRAINING_STORE', 'database')
+CATEGORY_VERSION_CHECK_SECONDS = 5
+CATEGORY_COMPACT_ROWS = 1000
+CATEGORY_MODEL_DIR = os.getenv('CATEGORY_MODEL_DIR', os.path.join(BASE_DIR, 'ml_models'))
+# 'batch' retrains a TF-IDF/random forest model per dataset version,
+# 'incremental' applies feedback online; both retrain in the background
+# after CATEGORY_RETRAIN_ROWS feedback rows or CATEGORY_RETRAIN_MINUTES
+CATEGORY_MODEL_MODE = os.getenv('CATEGORY_MODEL_MODE', 'batch')
+CATEGORY_HASHING_FEATURES = 2 ** 18
+CATEGORY_INCREMENTAL_EPOCHS = 5
+CATEGORY_TRAINING_CHUNK_ROWS = 10000
+CATEGORY_RETRAIN_ROWS = int(os.getenv('CATEGORY_RETRAIN_ROWS', 500))
+CATEGORY_RETRAIN_MINUTES = int(os.getenv('CATEGORY_RETRAIN_MINUTES', 30))
+CATEGORY_PREDICT_BATCH_MAX = int(os.getenv('CATEGORY_PREDICT_BATCH_MAX', 500))
+CATEGORY_SIMILARITY_MAX_POSTINGS = 1000
+CATEGORY_SIMILARITY_MAX_K = 50
+# Per-user models trained from each user's own expenses, blended with the global model
+CATEGORY_USER_MODELS_ENABLED = os.getenv('CATEGORY_USER_MODELS_ENABLED', 'False').lower() == 'true'
+CATEGORY_USER_MIN_ROWS = 20
+CATEGORY_USER_MODEL_WEIGHT = 0.5
+CATEGORY_USER_MODEL_CACHE_BYTES = 64 * 1024 * 1024
+CATEGORY_PREDICTION_CACHE = 'predictions'
+# Run model retraining inline instead of on a background thread
+CATEGORY_TASKS_EAGER = False
+
+# Cache alias for the per-user dashboard numbers
+DASHBOARD_CACHE = 'dashboards'
+# Rows fetched per database round trip, and written per chunk, by report exports
+EXPORT_CHUNK_ROWS = 2000
+
+# Redis unless CELERY_BROKER_URL says otherwise. Set it to memory:// for local
+# runs and tests without Redis: celery then uses an in-process broker, beat
+# keeps its schedule in memory and PDF report jobs run on a worker thread.
+# A memory broker is never shared between processes, so a separate beat or
+# worker process receives nothing. Connections are opened on first use,
+# never at import.
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+IN_MEMORY_BROKER = CELERY_BROKER_URL == 'memory://'
+CELERY_BEAT_SCHEDULER = os.getenv(
+    'CELERY_BEAT_SCHEDULER',
+    'celery.beat:Scheduler' if IN_MEMORY_BROKER else 'celery.beat:PersistentScheduler',
+)
+CELERY_BEAT_SCHEDULE = {
+    'weekly-financial-report': {
+        'task': 'report_generation.tasks.generate_report_and_send_email',
+        'schedule': crontab(minute=30, hour=23, day_of_week='sunday'),
+        'args': ('weekly',),
+    },
+    'monthly-financial-report': {
+        'task': 'report_generation.tasks.generate_report_and_send_email',
+        'schedule': crontab(minute=30, hour=0, day_of_month=1),
+        'args': ('monthly',),
+    },
+}
+CELERY_TIMEZONE = TIME_ZONE
+
+# PDF reports are rendered by a background job: 'celery' sends it to the
+# broker, 'thread' runs it on an in-process worker thread and 'eager' runs
+# it inside the request. With the memory broker, the thread runner is used.
+REPORT_JOB_RUNNER = os.getenv('REPORT_JOB_RUNNER', 'thread' if IN_MEMORY_BROKER else 'celery')
+# Rendered PDFs, keyed by owner, date range and the owner's data version
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(BASE_DIR, 'report_cache'))
+# Users per periodic report email subtask; each subtask sends over one SMTP connection
+REPORT_EMAIL_CHUNK_USERS = int(os.getenv('REPORT_EMAIL_CHUNK_USERS', 500))
+# Report snapshots with more rows than this are not cached (24 bytes a row)
+REPORT_SNAPSHOT_MAX_ROWS = int(os.getenv('REPORT_SNAPSHOT_MAX_ROWS', 200000))
+
+# Full-text search over descriptions, categories and sources: an FTS5 index
+# on SQLite; other databases fall back to icontains filters unless a backend
+# for them is configured.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', (
+    'search.backends.SqliteFtsBackend' if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3'
+    else 'search.backends.DatabaseBackend'
+))
+# Rows per search results page, by default and at most
+SEARCH_PAGE_SIZE = 25
+SEARCH_MAX_PAGE_SIZE = 100
+# Typeahead suggestions per request, and the most-used terms kept per user
+SEARCH_SUGGESTION_LIMIT = 8
+SEARCH_SUGGESTION_TERMS = int(os.getenv('SEARCH_SUGGESTION_TERMS', 5000))
 
 # Security settings for production
 if not DEBUG:
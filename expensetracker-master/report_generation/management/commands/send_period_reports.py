@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from report_generation.periodic_reports import (
+    MONTHLY, WEEKLY, period_range, report_periods, send_period_reports,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Send the weekly or monthly report emails now, printing progress and timing. '
+        'Without --period, sends whichever reports are due on --date (default today).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=[WEEKLY, MONTHLY])
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            help='Last day of the weekly report, or any day of the month after a monthly one')
+
+    def handle(self, *args, **options):
+        day = options['date'] or datetime.date.today()
+        if options['period']:
+            periods = [(options['period'], *period_range(options['period'], day))]
+        else:
+            periods = report_periods(day)
+            if not periods:
+                raise CommandError(f'No reports are due on {day}; pass --period to send one anyway')
+
+        for period, start, end in periods:
+            stats = send_period_reports(period, start, end, progress=self.report_progress)
+            self.stdout.write(
+                f"{period} {start}..{end}: {stats['users']} users in {stats['chunks']} chunks, "
+                f"{stats['reused']} snapshots reused, "
+                f"{stats['sent']} sent inline, {stats['seconds']:.1f}s")
+
+    def report_progress(self, stats):
+        rate = stats['users'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(f"  {stats['users']} users, {stats['chunks']} chunks, "
+                          f"{stats['seconds']:.1f}s ({rate:.0f} users/s)")
@@ -1,3 +1,32 @@
+import uuid
+
 from django.db import models
+from django.contrib.auth.models import User
 
 # Create your models here.
+
+
+class PdfReportJob(models.Model):
+    """A request to render one user's PDF report for a date range in the background."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    data_version = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.owner.username} - {self.start_date} to {self.end_date} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
@@ -0,0 +1,99 @@
+# report_generation/pdf_reports.py
+import contextlib
+import glob
+import logging
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+from xhtml2pdf import pisa
+
+from analytics.dashboard_cache import dashboard_cache
+from api.background import BackgroundWorker
+from api.files import atomic_write
+from .models import PdfReportJob
+from .snapshots import report_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+report_worker = BackgroundWorker('pdf-reports')
+
+
+def cache_path(owner_id, start, end, data_version):
+    return os.path.join(settings.REPORT_CACHE_DIR, str(owner_id), f'report_{start}_to_{end}_{data_version}.pdf')
+
+
+def cached_report(owner_id, start, end):
+    """Return the path of an up-to-date rendered report, or None."""
+    path = cache_path(owner_id, start, end, dashboard_cache.data_version(owner_id))
+    return path if os.path.exists(path) else None
+
+
+def render_pdf(snapshot, path):
+    html = get_template('income/pdf_template.html').render(snapshot.context())
+
+    def write(tmp):
+        result = pisa.CreatePDF(html, dest=tmp, encoding='UTF-8')
+        if result.err:
+            raise RuntimeError(f'PDF rendering failed with {result.err} error(s)')
+
+    # A download never sees a half-written file.
+    atomic_write(path, write)
+
+    # Reports rendered for older data versions of this range are stale now.
+    for stale in glob.glob(cache_path(snapshot.owner_id, snapshot.start, snapshot.end, '*')):
+        if stale != path:
+            # Another job or a cleanup run may have removed it first.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(stale)
+
+
+def request_report(owner, start, end):
+    """Return the job for this report, reusing a finished or in-flight one, and start it if needed."""
+    version = dashboard_cache.data_version(owner.pk)
+    job = (
+        PdfReportJob.objects
+        .filter(owner=owner, start_date=start, end_date=end, data_version=version)
+        .exclude(status=PdfReportJob.FAILED)
+        .first()
+    )
+    if job is not None and (job.status != PdfReportJob.DONE or os.path.exists(job_path(job))):
+        return job
+
+    job = PdfReportJob.objects.create(owner=owner, start_date=start, end_date=end, data_version=version)
+    dispatch(job)
+    job.refresh_from_db()
+    return job
+
+
+def job_path(job):
+    return cache_path(job.owner_id, job.start_date, job.end_date, job.data_version)
+
+
+def dispatch(job):
+    runner = settings.REPORT_JOB_RUNNER
+    if runner == 'eager':
+        run_job(job.pk)
+    elif runner == 'celery':
+        from .tasks import render_pdf_report
+        transaction.on_commit(lambda: render_pdf_report.delay(str(job.pk)))
+    else:
+        transaction.on_commit(lambda: report_worker.submit(run_job, job.pk, key=job.pk))
+
+
+def run_job(job_id):
+    job = PdfReportJob.objects.get(pk=job_id)
+    path = job_path(job)
+    PdfReportJob.objects.filter(pk=job.pk).update(status=PdfReportJob.RUNNING)
+    try:
+        if not os.path.exists(path):
+            render_pdf(report_snapshot(job.owner_id, job.start_date, job.end_date), path)
+    except Exception as exc:
+        logger.exception('PDF report job %s failed', job.pk)
+        PdfReportJob.objects.filter(pk=job.pk).update(
+            status=PdfReportJob.FAILED, error=str(exc), finished_at=timezone.now())
+    else:
+        PdfReportJob.objects.filter(pk=job.pk).update(status=PdfReportJob.DONE, finished_at=timezone.now())
@@ -0,0 +1,177 @@
+# report_generation/periodic_reports.py
+import datetime
+import logging
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+
+from expenses.models import Expense
+from userincome.exports import XLSX_CONTENT_TYPE, write_xlsx_report
+from userincome.models import UserIncome
+from .snapshots import ReportSection, ReportSnapshot, cached_snapshots, store_snapshots
+
+
+logger = logging.getLogger(__name__)
+
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+SUBJECTS = {WEEKLY: 'Weekly Financial Report', MONTHLY: 'Monthly Financial Report'}
+
+
+def period_range(period, day):
+    """Return (start, end) of the report sent on ``day``: the week ending that day, or the previous month."""
+    if period == WEEKLY:
+        return day - datetime.timedelta(days=6), day
+    if period == MONTHLY:
+        last_day = day.replace(day=1) - datetime.timedelta(days=1)
+        return last_day.replace(day=1), last_day
+    raise ValueError(f'Unknown report period {period!r}')
+
+
+def report_periods(today):
+    """Return the (period, start, end) reports due on ``today``: last week on Sundays, last month on the 1st."""
+    due = []
+    if today.weekday() == 6:
+        due.append(WEEKLY)
+    if today.day == 1:
+        due.append(MONTHLY)
+    return [(period, *period_range(period, today)) for period in due]
+
+
+class _OwnerRows:
+    """Cursor over ``(owner_id, *row)`` tuples ordered by owner, consumed one owner at a time."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.pending = next(rows, None)
+
+    def take(self, owner_id):
+        rows = []
+        while self.pending is not None and self.pending[0] <= owner_id:
+            if self.pending[0] == owner_id:
+                rows.append(self.pending[1:])
+            self.pending = next(self.rows, None)
+        return rows
+
+
+def iter_report_chunks(start, end):
+    """
+    Yield ``(chunk, reused)`` for every user with an email address, where
+    ``chunk`` is a list of ``(username, email, snapshot)`` and ``reused``
+    counts the snapshots in it that came from the cache.
+
+    Users are streamed with ``iterator()`` and handled in chunks of
+    ``REPORT_EMAIL_CHUNK_USERS``, so memory holds one chunk at a time. Users
+    whose snapshot of the period is already cached at their current data
+    version reuse it. The income and expenses of the rest are read by one
+    query each per chunk, filtered to those users, and their snapshots are
+    cached for the report page and exports.
+
+    Reuse needs a cache shared by every process that is large enough to
+    keep a snapshot per user between runs. The default local-memory
+    ``dashboards`` cache is per process and evicts past 300 entries, so
+    with it most users are rebuilt on every run; set
+    ``DASHBOARD_CACHE_BACKEND`` to a shared backend such as Redis.
+    """
+    chunk_size = settings.EXPORT_CHUNK_ROWS
+    users = User.objects.exclude(email='').order_by('id').values_list('id', 'username', 'email')
+
+    def period_rows(model, label, owner_ids):
+        return _OwnerRows(
+            model.objects.filter(owner_id__in=owner_ids, date__range=(start, end))
+            .order_by('owner_id', 'date', 'id')
+            .values_list('owner_id', 'date', label, 'amount')
+            .iterator(chunk_size=chunk_size)
+        )
+
+    def snapshots(batch):
+        versions, cached = cached_snapshots([user_id for user_id, _, _ in batch], start, end)
+        missing = [user_id for user_id, _, _ in batch if user_id not in cached]
+        if missing:
+            incomes = period_rows(UserIncome, 'source', missing)
+            expenses = period_rows(Expense, 'category__name', missing)
+        built, chunk = [], []
+        for user_id, username, email in batch:
+            snapshot = cached.get(user_id)
+            if snapshot is None:
+                snapshot = ReportSnapshot(user_id, start, end, versions[user_id],
+                                          ReportSection.from_rows(incomes.take(user_id)),
+                                          ReportSection.from_rows(expenses.take(user_id)))
+                built.append(snapshot)
+            chunk.append((username, email, snapshot))
+        store_snapshots(built)
+        return chunk, len(chunk) - len(built)
+
+    batch = []
+    for user in users.iterator(chunk_size=chunk_size):
+        batch.append(user)
+        if len(batch) >= settings.REPORT_EMAIL_CHUNK_USERS:
+            yield snapshots(batch)
+            batch = []
+    if batch:
+        yield snapshots(batch)
+
+
+def report_workbook(snapshot):
+    """Return the XLSX report as bytes, built in memory."""
+    content = BytesIO()
+    write_xlsx_report(snapshot, content)
+    return content.getvalue()
+
+
+def build_message(period, username, email, snapshot):
+    message = EmailMessage(
+        subject=SUBJECTS[period],
+        body=f'Please find attached your {period} financial report.',
+        to=[email],  # Send only to the current user
+    )
+    message.attach(f'{period}_report_{username}.xlsx', report_workbook(snapshot), XLSX_CONTENT_TYPE)
+    return message
+
+
+def send_report_chunk(period, reports):
+    """Render and send one chunk of ``(username, email, snapshot)`` reports over a single SMTP connection."""
+    started = time.perf_counter()
+    messages = [build_message(period, username, email, snapshot) for username, email, snapshot in reports]
+    with get_connection() as connection:
+        sent = connection.send_messages(messages) or 0
+    logger.info('Sent %d/%d %s reports in %.2fs', sent, len(reports), period, time.perf_counter() - started)
+    return sent
+
+
+def send_period_reports(period, start, end, progress=None):
+    """
+    Stream every user's data for the period and fan it out in chunks of ``REPORT_EMAIL_CHUNK_USERS``.
+
+    With the celery runner each chunk becomes a ``send_report_chunk_task``
+    subtask; otherwise chunks are sent inline. ``progress``, if given, is
+    called with the running stats after each chunk, and the final stats
+    are returned.
+    """
+    from .tasks import send_report_chunk_task
+
+    stats = {'period': period, 'start': str(start), 'end': str(end), 'users': 0, 'chunks': 0, 'sent': 0,
+             'reused': 0}
+    started = time.perf_counter()
+    use_celery = settings.REPORT_JOB_RUNNER == 'celery'
+
+    for chunk, reused in iter_report_chunks(start, end):
+        if use_celery:
+            send_report_chunk_task.delay(
+                period, [[username, email, snapshot.to_payload()] for username, email, snapshot in chunk])
+        else:
+            stats['sent'] += send_report_chunk(period, chunk)
+        stats['users'] += len(chunk)
+        stats['reused'] += reused
+        stats['chunks'] += 1
+        stats['seconds'] = round(time.perf_counter() - started, 2)
+        logger.info('%s reports: %d users (%d snapshots reused) in %d chunks after %.1fs',
+                    period, stats['users'], stats['reused'], stats['chunks'], stats['seconds'])
+        if progress is not None:
+            progress(dict(stats))
+
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
@@ -0,0 +1,172 @@
+# report_generation/snapshots.py
+"""
+Report snapshots: one owner's income and expenses over a date range, read once.
+
+The report page, the PDF and the periodic emails render a
+``ReportSnapshot`` instead of querying on their own. A snapshot is keyed
+by (owner, range, data version) in the dashboard cache, so opening a
+report and then exporting it costs one pair of queries, and any write to
+the owner's data (which bumps the version, see
+``analytics.dashboard_cache``) makes the next request rebuild it. The CSV
+and XLSX exports use a snapshot only when one is already cached, and
+otherwise stream the rows with ``userincome.exports.StreamedReport``
+rather than loading the whole range.
+"""
+import datetime
+from array import array
+
+from django.conf import settings
+
+from analytics.dashboard_cache import dashboard_cache
+from userincome.exports import expense_rows, income_rows, report_querysets
+
+
+class ReportSection:
+    """
+    The rows of one report section in columnar form.
+
+    Dates are stored as ordinals and amounts as doubles in ``array``s, and
+    each distinct source or category name once, so a cached snapshot costs
+    24 bytes per row instead of a pickled tuple of objects.
+    """
+
+    def __init__(self, labels=(), days=None, label_ids=None, amounts=None):
+        self.labels = list(labels)
+        self.days = days if days is not None else array('l')
+        self.label_ids = label_ids if label_ids is not None else array('l')
+        self.amounts = amounts if amounts is not None else array('d')
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a section from ``(date, label, amount)`` rows."""
+        section = cls()
+        index = {}
+        for date, label, amount in rows:
+            label_id = index.get(label)
+            if label_id is None:
+                label_id = index[label] = len(section.labels)
+                section.labels.append(label)
+            section.days.append(date.toordinal())
+            section.label_ids.append(label_id)
+            section.amounts.append(amount)
+        return section
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __iter__(self):
+        """Yield ``(date, label, amount)`` rows in report order."""
+        labels, from_ordinal = self.labels, datetime.date.fromordinal
+        for day, label_id, amount in zip(self.days, self.label_ids, self.amounts):
+            yield from_ordinal(day), labels[label_id], amount
+
+    @property
+    def total(self):
+        return sum(self.amounts)
+
+    def to_payload(self):
+        return {'labels': self.labels, 'days': self.days.tolist(),
+                'label_ids': self.label_ids.tolist(), 'amounts': self.amounts.tolist()}
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(payload['labels'], array('l', payload['days']), array('l', payload['label_ids']),
+                   array('d', payload['amounts']))
+
+
+class ReportSnapshot:
+    def __init__(self, owner_id, start, end, data_version, incomes, expenses):
+        self.owner_id = owner_id
+        self.start = start
+        self.end = end
+        self.data_version = data_version
+        self.incomes = incomes
+        self.expenses = expenses
+
+    @property
+    def total_income(self):
+        return self.incomes.total
+
+    @property
+    def total_expense(self):
+        return self.expenses.total
+
+    @property
+    def savings(self):
+        return self.total_income - self.total_expense
+
+    def __len__(self):
+        return len(self.incomes) + len(self.expenses)
+
+    def context(self):
+        """Template context shared by the report page and the PDF template."""
+        return {
+            'incomes': [{'date': d, 'source': s, 'amount': a} for d, s, a in self.incomes],
+            'expenses': [{'date': d, 'category': c, 'amount': a} for d, c, a in self.expenses],
+            'total_income': self.total_income,
+            'total_expense': self.total_expense,
+            'savings': self.savings,
+            'start_date': self.start,
+            'end_date': self.end,
+        }
+
+    def to_payload(self):
+        """A JSON-serialisable form, for passing snapshots to celery tasks."""
+        return {
+            'owner_id': self.owner_id, 'start': self.start.isoformat(), 'end': self.end.isoformat(),
+            'data_version': self.data_version,
+            'incomes': self.incomes.to_payload(), 'expenses': self.expenses.to_payload(),
+        }
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(
+            payload['owner_id'], datetime.date.fromisoformat(payload['start']),
+            datetime.date.fromisoformat(payload['end']), payload['data_version'],
+            ReportSection.from_payload(payload['incomes']), ReportSection.from_payload(payload['expenses']),
+        )
+
+
+def snapshot_key(owner_id, start, end, data_version):
+    return f'report-snapshot:{owner_id}:{data_version}:{start}:{end}'
+
+
+def build_snapshot(owner_id, start, end, data_version):
+    incomes, expenses = report_querysets(owner_id, start, end)
+    return ReportSnapshot(owner_id, start, end, data_version,
+                          ReportSection.from_rows(income_rows(incomes)),
+                          ReportSection.from_rows(expense_rows(expenses)))
+
+
+def store_snapshots(snapshots):
+    """Cache the snapshots small enough to share; larger ones are rebuilt per request."""
+    dashboard_cache.cache.set_many({
+        snapshot_key(s.owner_id, s.start, s.end, s.data_version): s
+        for s in snapshots if len(s) <= settings.REPORT_SNAPSHOT_MAX_ROWS
+    })
+
+
+def cached_snapshots(owner_ids, start, end):
+    """Return ({owner id: data version}, {owner id: cached snapshot}) for the range."""
+    versions = dashboard_cache.data_versions(owner_ids)
+    keys = {snapshot_key(owner_id, start, end, version): owner_id for owner_id, version in versions.items()}
+    found = dashboard_cache.cache.get_many(keys)
+    return versions, {keys[key]: snapshot for key, snapshot in found.items()}
+
+
+def cached_snapshot(owner_id, start, end):
+    """Return the owner's cached snapshot of the range at the current data version, or None."""
+    version = dashboard_cache.data_version(owner_id)
+    return dashboard_cache.cache.get(snapshot_key(owner_id, start, end, version))
+
+
+def report_snapshot(owner_id, start, end):
+    """Return the owner's snapshot of the range at the current data version, building it on a miss."""
+    # Read the version before the rows, so a write racing with the build
+    # bumps it afterwards and the snapshot is never cached as current.
+    version = dashboard_cache.data_version(owner_id)
+    snapshot = dashboard_cache.cache.get(snapshot_key(owner_id, start, end, version))
+    if snapshot is None:
+        snapshot = build_snapshot(owner_id, start, end, version)
+        store_snapshots([snapshot])
+    return snapshot
@@ -1,3 +1,295 @@
-from django.test import TestCase
+import datetime
+import html
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from expenses.models import Category, Expense
+from userincome.models import UserIncome
+from .models import PdfReportJob
+from .pdf_reports import job_path, run_job
+from .periodic_reports import period_range, report_periods, send_period_reports
+from .snapshots import ReportSnapshot, build_snapshot, report_snapshot
+
+
+class PdfReportJobTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = override_settings(REPORT_CACHE_DIR=self.cache_dir, REPORT_JOB_RUNNER='eager')
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        self.user = User.objects.create_user(username='pdf', password='secret')
+        self.client.login(username='pdf', password='secret')
+        food = Category.objects.create(name='Food')
+        day = datetime.date(2024, 3, 5)
+        UserIncome.objects.create(owner=self.user, amount=100, date=day, source='Salary')
+        Expense.objects.create(owner=self.user, amount=30, date=day, category=food, description='x')
+        self.url = reverse('export_pdf') + '?start_date=2024-03-01&end_date=2024-03-31'
+
+    def test_eager_job_renders_and_redirects_to_the_download(self):
+        response = self.client.get(self.url)
+        job = PdfReportJob.objects.get()
+        self.assertRedirects(response, reverse('pdf_report_download', args=[job.pk]), fetch_redirect_response=False)
+        self.assertEqual(job.status, PdfReportJob.DONE)
+
+        download = self.client.get(response['Location'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+    def test_repeat_request_is_served_from_the_disk_cache(self):
+        self.client.get(self.url)
+        with mock.patch('report_generation.pdf_reports.render_pdf') as render_pdf:
+            response = self.client.get(self.url)
+        render_pdf.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PdfReportJob.objects.count(), 1)
+
+    def test_new_data_renders_a_new_report(self):
+        self.client.get(self.url)
+        old_path = job_path(PdfReportJob.objects.get())
+        with self.captureOnCommitCallbacks(execute=True):
+            UserIncome.objects.create(owner=self.user, amount=1, date=datetime.date(2024, 3, 6), source='Gift')
+
+        self.client.get(self.url)
+        self.assertEqual(PdfReportJob.objects.count(), 2)
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_stale_report_removed_concurrently_does_not_fail_the_job(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserIncome.objects.create(owner=self.user, amount=1, date=datetime.date(2024, 3, 6), source='Gift')
+
+        remove = os.remove
+
+        def removed_meanwhile(path):
+            remove(path)
+            remove(path)
+
+        with mock.patch('report_generation.pdf_reports.os.remove', side_effect=removed_meanwhile):
+            self.client.get(self.url)
+        self.assertEqual(PdfReportJob.objects.latest('created_at').status, PdfReportJob.DONE)
+
+    @override_settings(REPORT_JOB_RUNNER='thread')
+    def test_background_job_reports_status_until_done(self):
+        with mock.patch('report_generation.pdf_reports.report_worker.submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], PdfReportJob.PENDING)
+        self.assertEqual(self.client.get(job['download_url']).status_code, 409)
+
+        submit.assert_called_once()
+        run_job(*submit.call_args.args[1:])
+        self.assertEqual(self.client.get(job['status_url']).json()['status'], PdfReportJob.DONE)
+        self.assertEqual(self.client.get(job['download_url']).status_code, 200)
+
+    def test_jobs_are_private_to_their_owner(self):
+        self.client.get(self.url)
+        job = PdfReportJob.objects.get()
+        User.objects.create_user(username='intruder', password='secret')
+        self.client.login(username='intruder', password='secret')
+        self.assertEqual(self.client.get(reverse('pdf_report_status', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('pdf_report_download', args=[job.pk])).status_code, 404)
+
+    def test_failed_render_is_reported(self):
+        with mock.patch('report_generation.pdf_reports.render_pdf', side_effect=RuntimeError('boom')):
+            response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['status'], PdfReportJob.FAILED)
+        self.assertEqual(response.json()['error'], 'boom')
+
+    def test_report_context_joins_category_names(self):
+        context = report_snapshot(self.user.pk, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31)).context()
+        self.assertEqual(context['expenses'][0]['category'], 'Food')
+        self.assertEqual(context['savings'], 70)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   REPORT_JOB_RUNNER='thread', REPORT_EMAIL_CHUNK_USERS=2)
+class PeriodicReportTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.users = [User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com') for i in range(5)]
+        User.objects.create_user(username='no-email')
+        self.start, self.end = datetime.date(2024, 3, 4), datetime.date(2024, 3, 10)
+        for i, user in enumerate(self.users[:3]):
+            UserIncome.objects.create(owner=user, amount=10 * (i + 1), date=self.end, source='Salary',
+                                      description=f'pay {i}')
+        UserIncome.objects.create(owner=self.users[0], amount=5, date=self.end - datetime.timedelta(days=7),
+                                  source='Old', description='outside the week')
+
+    def attachment_rows(self, message):
+        filename, content, _ = message.attachments[0]
+        sheet = openpyxl.load_workbook(BytesIO(content))['Income']
+        return filename, [tuple(row) for row in sheet.iter_rows(values_only=True)][1:-2]
+
+    def test_reports_are_due_on_sundays_and_the_first(self):
+        self.assertEqual(report_periods(datetime.date(2024, 3, 10)), [('weekly', self.start, self.end)])
+        self.assertEqual(report_periods(datetime.date(2024, 3, 1)),
+                         [('monthly', datetime.date(2024, 2, 1), datetime.date(2024, 2, 29))])
+        self.assertEqual(report_periods(datetime.date(2024, 3, 5)), [])
+
+    def test_every_user_with_an_email_gets_their_own_rows(self):
+        # Users are streamed by one query; income and expenses by one each per chunk of users.
+        with self.assertNumQueries(7):
+            stats = send_period_reports('weekly', self.start, self.end)
+        self.assertEqual((stats['users'], stats['chunks'], stats['sent']), (5, 3, 5))
+        self.assertEqual([m.to for m in mail.outbox], [[u.email] for u in self.users])
+
+        filename, rows = self.attachment_rows(mail.outbox[1])
+        self.assertEqual(filename, 'weekly_report_user1.xlsx')
+        self.assertEqual([row[1:] for row in rows], [('Salary', 20)])
+        self.assertEqual(self.attachment_rows(mail.outbox[4])[1], [])
+
+    def test_progress_is_reported_per_chunk(self):
+        seen = []
+        send_period_reports('weekly', self.start, self.end, progress=seen.append)
+        self.assertEqual([s['users'] for s in seen], [2, 4, 5])
+
+    @override_settings(REPORT_JOB_RUNNER='celery')
+    def test_celery_runner_fans_chunks_out_to_subtasks(self):
+        with mock.patch('report_generation.tasks.send_report_chunk_task.delay') as delay:
+            stats = send_period_reports('weekly', self.start, self.end)
+        self.assertEqual(delay.call_count, 3)
+        self.assertEqual(stats['sent'], 0)
+        self.assertEqual(mail.outbox, [])
+        period, reports = delay.call_args_list[0].args
+        username, email, payload = reports[0]
+        self.assertEqual((username, email), ('user0', 'user0@example.com'))
+        self.assertEqual(list(ReportSnapshot.from_payload(payload).incomes), [(self.end, 'Salary', 10.0)])
+
+    def test_a_rerun_reuses_snapshots_of_unchanged_users(self):
+        self.assertEqual(send_period_reports('weekly', self.start, self.end)['reused'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserIncome.objects.create(owner=self.users[3], amount=7, date=self.end, source='Gift')
+        # Only the chunk holding the changed user reads rows.
+        with self.assertNumQueries(3):
+            stats = send_period_reports('weekly', self.start, self.end)
+        self.assertEqual(stats['reused'], 4)
+        self.assertEqual([row[1:] for row in self.attachment_rows(mail.outbox[-2])[1]], [('Gift', 7)])
+
+
+class ReportSnapshotTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.user = User.objects.create_user(username='snap', password='secret')
+        self.client.login(username='snap', password='secret')
+        food = Category.objects.create(name='Food')
+        day = datetime.date(2024, 3, 5)
+        UserIncome.objects.create(owner=self.user, amount=100, date=day, source='Salary')
+        UserIncome.objects.create(owner=self.user, amount=50, date=day, source='Salary')
+        Expense.objects.create(owner=self.user, amount=30, date=day, category=food, description='x')
+        self.query = '?start_date=2024-03-01&end_date=2024-03-31'
+
+    def test_page_and_every_export_share_one_snapshot(self):
+        with mock.patch('report_generation.snapshots.build_snapshot', wraps=build_snapshot) as build, \
+                override_settings(REPORT_CACHE_DIR=tempfile.mkdtemp(), REPORT_JOB_RUNNER='eager'):
+            self.addCleanup(shutil.rmtree, settings.REPORT_CACHE_DIR)
+            page = self.client.post(reverse('generate-report'),
+                                    {'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+            self.assertEqual(page.context['total_income'], 150)
+            self.assertEqual(page.context['savings'], 120)
+            for name in ('export_csv', 'export_xlsx', 'export_pdf'):
+                response = self.client.get(reverse(name) + self.query)
+                self.assertIn(response.status_code, (200, 302))
+            self.assertEqual(build.call_count, 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                UserIncome.objects.create(owner=self.user, amount=1, date=datetime.date(2024, 3, 6), source='Tip')
+            # Without a current snapshot the export streams from the database.
+            csv_text = b''.join(self.client.get(reverse('export_csv') + self.query).streaming_content).decode()
+            self.assertEqual(build.call_count, 1)
+            self.assertIn('Total Income: 151', csv_text)
+
+    def test_export_links_on_the_report_page_work(self):
+        page = self.client.post(reverse('generate-report'), {'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+        links = [html.unescape(href) for href in re.findall(r'href="([^"]*\?start_date=[^"]*)"', page.content.decode())]
+        self.assertEqual(len(links), 2)
+        with override_settings(REPORT_CACHE_DIR=tempfile.mkdtemp(), REPORT_JOB_RUNNER='eager'):
+            self.addCleanup(shutil.rmtree, settings.REPORT_CACHE_DIR)
+            for link in links:
+                with self.subTest(link=link):
+                    self.assertIn('start_date=2024-03-01&end_date=2024-03-31', link)
+                    self.assertEqual(self.client.get(link, follow=True).status_code, 200)
+
+    def test_sections_are_compact_and_round_trip(self):
+        snapshot = report_snapshot(self.user.pk, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+        self.assertEqual(snapshot.incomes.labels, ['Salary'])
+        self.assertEqual(list(snapshot.expenses), [(datetime.date(2024, 3, 5), 'Food', 30.0)])
+        copy = ReportSnapshot.from_payload(json.loads(json.dumps(snapshot.to_payload())))
+        self.assertEqual(copy.context(), snapshot.context())
+
+    @override_settings(REPORT_SNAPSHOT_MAX_ROWS=2)
+    def test_large_snapshots_are_not_cached(self):
+        with mock.patch('report_generation.snapshots.build_snapshot', wraps=build_snapshot) as build:
+            for _ in range(2):
+                report_snapshot(self.user.pk, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+        self.assertEqual(build.call_count, 2)
+
+
+# Run in a fresh interpreter with every way of opening a socket disabled,
+# then load the project and import each app's tasks the way a worker does.
+NO_NETWORK_STARTUP = """
+import socket
+
+def refuse(*args, **kwargs):
+    raise AssertionError(f'network I/O during startup: {args!r}')
+
+socket.socket.connect = socket.socket.connect_ex = refuse
+socket.create_connection = socket.getaddrinfo = refuse
+
+import django
+django.setup()
+from expensetracker import celery_app
+celery_app.loader.import_default_modules()
+import report_generation.tasks
+from django.conf import settings
+print(celery_app.conf.broker_url, celery_app.conf.beat_scheduler, settings.REPORT_JOB_RUNNER)
+"""
+
+
+class StartupTests(SimpleTestCase):
+    def run_startup(self, **env):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'expensetracker.settings', **env}
+        env = {name: value for name, value in env.items() if value is not None}
+        return subprocess.run([sys.executable, '-c', NO_NETWORK_STARTUP], cwd=settings.BASE_DIR, env=env,
+                              capture_output=True, text=True, timeout=120)
+
+    def test_importing_tasks_performs_no_network_io(self):
+        result = self.run_startup()
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_a_configured_broker_is_not_contacted_at_import(self):
+        result = self.run_startup(CELERY_BROKER_URL='redis://broker.invalid:6379/0')
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_defaults_to_redis_and_uses_memory_only_when_asked(self):
+        result = self.run_startup(CELERY_BROKER_URL=None, CELERY_BEAT_SCHEDULER=None, REPORT_JOB_RUNNER=None)
+        self.assertEqual(result.stdout.splitlines()[-1].split(), ['redis://localhost:6379/0', 'celery.beat:PersistentScheduler', 'celery'])
+        result = self.run_startup(CELERY_BROKER_URL='memory://', CELERY_BEAT_SCHEDULER=None, REPORT_JOB_RUNNER=None)
+        self.assertEqual(result.stdout.splitlines()[-1].split(), ['memory://', 'celery.beat:Scheduler', 'thread'])
+
+    def test_schedules_weekly_and_monthly_reports(self):
+        from expensetracker import celery_app
+        schedule = celery_app.conf.beat_schedule
+        self.assertEqual({entry['args'] for entry in schedule.values()}, {('weekly',), ('monthly',)})
+        self.assertEqual(period_range('monthly', datetime.date(2024, 1, 1)),
+                         (datetime.date(2023, 12, 1), datetime.date(2023, 12, 31)))
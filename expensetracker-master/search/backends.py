@@ -0,0 +1,127 @@
+# search/backends.py
+"""
+Search backends, chosen by the ``SEARCH_BACKEND`` setting (a dotted path).
+
+``SqliteFtsBackend`` keeps an FTS5 table per searchable model, written by
+``search.signals`` in the same transaction as the row it mirrors.
+``DatabaseBackend`` keeps no index and filters with ``icontains``; it works
+on any database and is the fallback for engines without a full-text
+backend here.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+class DatabaseBackend:
+    def install(self, spec):
+        pass
+
+    def uninstall(self, spec):
+        pass
+
+    def index(self, spec, document):
+        pass
+
+    def remove(self, spec, pk):
+        pass
+
+    def relabel(self, spec, queryset, label):
+        pass
+
+    def rebuild(self, spec, owner_id=None, batch_size=2000):
+        return 0
+
+    def filter(self, spec, queryset, owner_id, words):
+        """Narrow ``owner_id``'s ``queryset`` to rows matching every word, newest first (no relevance ranking)."""
+        for word in words:
+            queryset = queryset.filter(Q(description__icontains=word) | Q(**{f'{spec.label}__icontains': word}))
+        return queryset.order_by('-date', '-id')
+
+
+class SqliteFtsBackend(DatabaseBackend):
+    """
+    SQLite FTS5 index over description and label, with the owner as a token.
+
+    Rows are keyed by the model's primary key as the FTS ``rowid``. Matching
+    the owner's token inside the index keeps a short prefix from walking
+    other users' documents, and results are ordered by BM25.
+    """
+
+    def table(self, spec):
+        return f'search_{spec.kind}_fts'
+
+    def install(self, spec):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table(spec)} USING fts5("
+                f"owner, description, label, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+
+    def uninstall(self, spec):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table(spec)}')
+
+    def index(self, spec, document):
+        pk, owner_id, description, label = document
+        table = self.table(spec)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+            cursor.execute(f'INSERT INTO {table} (rowid, owner, description, label) VALUES (%s, %s, %s, %s)',
+                           [pk, owner_token(owner_id), description, label])
+
+    def remove(self, spec, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table(spec)} WHERE rowid = %s', [pk])
+
+    def relabel(self, spec, queryset, label):
+        ids_sql, params = queryset.values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {self.table(spec)} SET label = %s WHERE rowid IN ({ids_sql})', [label, *params])
+
+    def rebuild(self, spec, owner_id=None, batch_size=2000):
+        table = self.table(spec)
+        documents = spec.model.objects.all()
+        with connection.cursor() as cursor:
+            if owner_id is None:
+                cursor.execute(f'DELETE FROM {table}')
+            else:
+                documents = documents.filter(owner_id=owner_id)
+                cursor.execute(f'DELETE FROM {table} WHERE rowid IN '
+                               f'(SELECT rowid FROM {table} WHERE {table} MATCH %s)',
+                               [f'owner : {owner_token(owner_id)}'])
+            rows, batch = 0, []
+            insert = f'INSERT INTO {table} (rowid, owner, description, label) VALUES (%s, %s, %s, %s)'
+            for pk, owner, description, label in spec.documents(documents).iterator(chunk_size=batch_size):
+                batch.append((pk, owner_token(owner), description, label))
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert, batch)
+                    rows += len(batch)
+                    batch = []
+            cursor.executemany(insert, batch)
+        return rows + len(batch)
+
+    def filter(self, spec, queryset, owner_id, words):
+        table = self.table(spec)
+        model_table = spec.model._meta.db_table
+        # A join rather than a pk__in subquery, so bm25() can rank the matches.
+        return queryset.extra(
+            tables=[table],
+            where=[f'{table}.rowid = {model_table}.id', f'{table} MATCH %s'],
+            params=[match_expression(words, owner_id)],
+            select={'search_rank': f'bm25({table}, 0.0, 1.0, 1.0)'},
+        ).order_by('search_rank', '-date', '-id')
+
+
+def owner_token(owner_id):
+    return f'u{owner_id}'
+
+
+def match_expression(words, owner_id):
+    """FTS5 query: the owner's token and a prefix match of every word in description or label."""
+    phrases = ['{description label} : "%s" *' % word.replace('"', '""') for word in words]
+    return ' AND '.join([f'owner : {owner_token(owner_id)}', *phrases])
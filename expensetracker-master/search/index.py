@@ -0,0 +1,121 @@
+# search/index.py
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+
+from expenses.models import Expense
+from userincome.models import UserIncome
+from .backends import get_backend
+from .query import parse_query
+
+
+class SearchSpec:
+    """
+    What is searchable on one transaction model.
+
+    ``kind`` names the model's index, and ``label`` is the lookup of the
+    text shown next to the description: the category name for expenses and
+    the source for income. A document is the ``(pk, owner_id, description,
+    label)`` tuple the index stores for a row. ``fields`` maps the names a
+    search result may project to their lookups.
+    """
+
+    def __init__(self, model, kind, label):
+        self.model = model
+        self.kind = kind
+        self.label = label
+        self.fields = {
+            'id': 'id', 'amount': 'amount', 'date': 'date', 'description': 'description',
+            label.split('__')[0]: label,
+        }
+
+    def documents(self, queryset):
+        return queryset.order_by('pk').values_list('pk', 'owner_id', 'description', self.label)
+
+    def document(self, instance):
+        label = instance.category.name if self.label == 'category__name' else getattr(instance, self.label)
+        return instance.pk, instance.owner_id, instance.description, label
+
+
+EXPENSES = SearchSpec(Expense, 'expense', 'category__name')
+INCOME = SearchSpec(UserIncome, 'income', 'source')
+
+SPECS = {Expense: EXPENSES, UserIncome: INCOME}
+
+
+def search(spec, owner, text):
+    """
+    Return ``owner``'s rows matching the search box ``text``.
+
+    Numbers and date prefixes filter the ``amount`` and ``date`` columns by
+    range, and words are prefix-matched against description and label by
+    the configured backend, best match first. Without words, the newest
+    rows come first.
+    """
+    words, filters = parse_query(text)
+    queryset = spec.model.objects.filter(*filters, owner=owner)
+    if words:
+        return get_backend().filter(spec, queryset, owner.pk, words)
+    return queryset.order_by('-date', '-id')
+
+
+def search_page(spec, owner, text, cursor=None, limit=None, fields=None):
+    """
+    Return one page of ``search()`` results as ``{'results': [...], 'next': token}``.
+
+    At most ``limit`` rows (``SEARCH_PAGE_SIZE`` by default, capped at
+    ``SEARCH_MAX_PAGE_SIZE``) are returned, each as a dict of the requested
+    ``fields`` (all of ``spec.fields`` by default). ``next`` is an opaque
+    token for the following page, or None after the last one. Raises
+    ValueError for an unknown field, a bad limit or a cursor issued for
+    another search.
+    """
+    fields = list(fields or spec.fields)
+    unknown = [field for field in fields if field not in spec.fields]
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(map(str, unknown))}')
+    limit = min(int(limit or settings.SEARCH_PAGE_SIZE), settings.SEARCH_MAX_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    position = _read_cursor(cursor, spec, text) if cursor else None
+
+    queryset = search(spec, owner, text)
+    ranked = 'search_rank' in queryset.query.extra_select
+    if ranked:
+        # Relevance has no stable key to seek from, so ranked pages continue by offset.
+        offset = position or 0
+        queryset = queryset[offset:offset + limit + 1]
+    else:
+        # Newest first: continue strictly after the last (date, id) returned.
+        if position is not None:
+            date, pk = position
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+        queryset = queryset[:limit + 1]
+
+    lookups = [spec.fields[field] for field in fields]
+    extras = ['search_rank'] if ranked else []
+    rows = list(queryset.values(*dict.fromkeys([*lookups, 'date', 'id', *extras])))
+    page, more = rows[:limit], len(rows) > limit
+
+    next_position = None
+    if more:
+        next_position = offset + limit if ranked else (page[-1]['date'].isoformat(), page[-1]['id'])
+    return {
+        'results': [{field: row[lookup] for field, lookup in zip(fields, lookups)} for row in page],
+        'next': _make_cursor(spec, text, next_position) if more else None,
+    }
+
+
+def _make_cursor(spec, text, position):
+    return signing.dumps({'kind': spec.kind, 'text': text, 'position': position}, salt='search.cursor', compress=True)
+
+
+def _read_cursor(cursor, spec, text):
+    try:
+        data = signing.loads(cursor, salt='search.cursor')
+    except signing.BadSignature:
+        raise ValueError('Invalid cursor')
+    if data.get('kind') != spec.kind or data.get('text') != text:
+        raise ValueError('The cursor belongs to a different search')
+    position = data['position']
+    return position if isinstance(position, int) else (position[0], position[1])
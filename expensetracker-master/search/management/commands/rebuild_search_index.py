@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from search.backends import get_backend
+from search.index import EXPENSES, INCOME
+
+
+class Command(BaseCommand):
+    help = 'Create the search index tables if needed and re-index expenses and income'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only re-index the rows of this user id')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        for label, spec in (('expense', EXPENSES), ('income', INCOME)):
+            backend.install(spec)
+            rows = backend.rebuild(spec, owner_id=options['user'])
+            self.stdout.write(f'{rows} {label} documents indexed')
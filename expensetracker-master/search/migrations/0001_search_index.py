@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def historical_specs(apps):
+    from search.index import SearchSpec
+
+    return [
+        SearchSpec(apps.get_model('expenses', 'Expense'), 'expense', 'category__name'),
+        SearchSpec(apps.get_model('userincome', 'UserIncome'), 'income', 'source'),
+    ]
+
+
+def create_index(apps, schema_editor):
+    from search.backends import get_backend
+
+    backend = get_backend()
+    for spec in historical_specs(apps):
+        backend.install(spec)
+        backend.rebuild(spec)
+
+
+def drop_index(apps, schema_editor):
+    from search.backends import get_backend
+
+    backend = get_backend()
+    for spec in historical_specs(apps):
+        backend.uninstall(spec)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0001_initial'),
+        ('userincome', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
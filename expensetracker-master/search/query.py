@@ -0,0 +1,85 @@
+# search/query.py
+"""
+Parsing of the search box text.
+
+Each whitespace-separated token is either a number or a date prefix, which
+becomes a range filter on the indexed ``amount`` or ``date`` column, or
+text, whose words are matched by prefix against the full-text index.
+Tokens are ANDed together.
+"""
+import calendar
+import datetime
+import re
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+
+WORD = re.compile(r'\w+')
+NUMBER = re.compile(r'\d+(?:\.\d*)?|\.\d+')
+DATE = re.compile(r'(\d{4})(?:-(\d{0,2})(?:-(\d{0,2}))?)?')
+
+
+def parse_query(text):
+    """Return ``(words, filters)``: words for the full-text index and ``Q`` range filters."""
+    words, filters = [], []
+    for token in text.split():
+        ranges = [q for q in (amount_range(token), date_range(token)) if q is not None]
+        if ranges:
+            filters.append(reduce(or_, ranges))
+        else:
+            words.extend(WORD.findall(token))
+    return words, filters
+
+
+def amount_range(token):
+    """
+    ``12`` matches amounts in [12, 13) and ``12.5`` amounts in [12.5, 12.6).
+
+    The old ``amount__istartswith`` also matched 120 or 1234, and could not
+    use an index.
+    """
+    if not NUMBER.fullmatch(token):
+        return None
+    try:
+        low = Decimal(token.rstrip('.') or '0')
+    except InvalidOperation:
+        return None
+    decimals = len(token.partition('.')[2])
+    return Q(amount__gte=float(low), amount__lt=float(low + Decimal(1).scaleb(-decimals)))
+
+
+def date_range(token):
+    """A date prefix (``2024``, ``2024-03``, ``2024-03-0`` ...) as a range of the days it starts."""
+    match = DATE.fullmatch(token)
+    if match is None or int(match[1]) < 1:
+        return None
+    year, month_part, day_part = int(match[1]), match[2], match[3]
+    months = _digit_range(month_part, 1, 12)
+    if months is None:
+        return None
+    if day_part is None:
+        start = datetime.date(year, months[0], 1)
+        end = datetime.date(year, months[1], calendar.monthrange(year, months[1])[1])
+    else:
+        if len(month_part) != 2:
+            return None
+        days = _digit_range(day_part, 1, calendar.monthrange(year, months[0])[1])
+        if days is None:
+            return None
+        start, end = datetime.date(year, months[0], days[0]), datetime.date(year, months[0], days[1])
+    return Q(date__range=(start, end))
+
+
+def _digit_range(part, low, high):
+    """The values in [low, high] whose two-digit form starts with ``part``, as (first, last)."""
+    if not part:
+        return low, high
+    if len(part) == 1:
+        first, last = int(part) * 10, int(part) * 10 + 9
+    else:
+        first = last = int(part)
+    first, last = max(first, low), min(last, high)
+    return (first, last) if first <= last else None
@@ -0,0 +1,32 @@
+# search/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from expenses.models import Category, Expense
+from userincome.models import UserIncome
+from .backends import get_backend
+from .index import EXPENSES, SPECS
+
+
+# Model.save() and delete() keep the index current, in the same transaction
+# as the write. Queryset update(), bulk_create() and raw SQL bypass these
+# signals; run rebuild_search_index after using them.
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=UserIncome)
+def index_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        spec = SPECS[sender]
+        get_backend().index(spec, spec.document(instance))
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=UserIncome)
+def remove_on_delete(sender, instance, **kwargs):
+    get_backend().remove(SPECS[sender], instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def relabel_on_category_rename(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        get_backend().relabel(EXPENSES, Expense.objects.filter(category=instance), instance.name)
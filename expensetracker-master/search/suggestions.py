@@ -0,0 +1,93 @@
+# search/suggestions.py
+"""
+Typeahead suggestions from a per-user prefix index.
+
+The index holds the distinct descriptions and category names (or sources)
+of one owner's rows, most used first, and finds a term by the start of
+any of its words: "lun" suggests both "Lunch" and "Team lunch". It is
+built with one grouped query and kept in the dashboard cache under the
+owner's data version, so any write to the owner's rows (see
+``analytics.dashboard_cache``) makes the next request rebuild it. A
+lookup is a binary search over the sorted keys, with no database access.
+"""
+import bisect
+import heapq
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from analytics.dashboard_cache import dashboard_cache
+
+
+def _fold(text):
+    return ' '.join(text.casefold().split())
+
+
+def _word_starts(term):
+    """Yield the folded ``term`` from the start of each of its words."""
+    folded = _fold(term)
+    yield folded
+    for position, char in enumerate(folded):
+        if char == ' ':
+            yield folded[position + 1:]
+
+
+class SuggestionIndex:
+    """
+    Sorted folded keys, each pointing at the term it came from.
+
+    Terms are numbered by descending use, then alphabetically, so the
+    lowest ids in a key range are the best suggestions.
+    """
+
+    def __init__(self, terms, keys, term_ids):
+        self.terms = terms
+        self.keys = keys
+        self.term_ids = term_ids
+
+    @classmethod
+    def from_counts(cls, counts, max_terms):
+        terms = sorted(counts, key=lambda term: (-counts[term], term))[:max_terms]
+        entries = sorted({(key, term_id) for term_id, term in enumerate(terms) for key in _word_starts(term)})
+        return cls(terms, [key for key, _ in entries], array('l', (term_id for _, term_id in entries)))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def suggest(self, prefix, limit):
+        prefix = _fold(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        return [self.terms[term_id] for term_id in heapq.nsmallest(limit, set(self.term_ids[start:end]))]
+
+
+def build_index(spec, owner_id):
+    """Index the descriptions and labels of ``owner_id``'s rows, weighted by how many rows use them."""
+    counts = Counter()
+    rows = (spec.model.objects.filter(owner_id=owner_id).values_list('description', spec.label)
+            .annotate(uses=Count('id')).order_by())
+    for description, label, uses in rows:
+        for term in (description, label):
+            term = ' '.join((term or '').split())
+            if term:
+                counts[term] += uses
+    return SuggestionIndex.from_counts(counts, settings.SEARCH_SUGGESTION_TERMS)
+
+
+def suggestions(spec, owner, prefix, limit=None):
+    """
+    Return up to ``limit`` of ``owner``'s terms with a word starting with ``prefix``.
+
+    ``limit`` defaults to ``SEARCH_SUGGESTION_LIMIT`` and is capped at
+    ``SEARCH_MAX_PAGE_SIZE``; ValueError if it is not a positive number.
+    """
+    limit = min(int(limit or settings.SEARCH_SUGGESTION_LIMIT), settings.SEARCH_MAX_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    index = dashboard_cache.get_or_compute(
+        owner.pk, 'search_suggestions', lambda: build_index(spec, owner.pk), spec.kind)
+    return index.suggest(prefix, limit)
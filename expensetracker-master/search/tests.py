@@ -0,0 +1,233 @@
+import datetime
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from expenses.models import Category, Expense
+from userincome.models import UserIncome
+from .index import EXPENSES, INCOME, search
+from .query import amount_range, date_range, parse_query
+
+
+def fts_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid, owner, description, label FROM {table} ORDER BY rowid')
+        return cursor.fetchall()
+
+
+class QueryParsingTests(SimpleTestCase):
+    def bounds(self, q):
+        return dict(q.children)
+
+    def test_numbers_become_amount_ranges(self):
+        self.assertEqual(self.bounds(amount_range('12')), {'amount__gte': 12.0, 'amount__lt': 13.0})
+        self.assertEqual(self.bounds(amount_range('12.5')), {'amount__gte': 12.5, 'amount__lt': 12.6})
+        self.assertIsNone(amount_range('12a'))
+
+    def test_date_prefixes_become_day_ranges(self):
+        def days(token):
+            return self.bounds(date_range(token))['date__range']
+
+        d = datetime.date
+        self.assertEqual(days('2024'), (d(2024, 1, 1), d(2024, 12, 31)))
+        self.assertEqual(days('2024-1'), (d(2024, 10, 1), d(2024, 12, 31)))
+        self.assertEqual(days('2024-02'), (d(2024, 2, 1), d(2024, 2, 29)))
+        self.assertEqual(days('2024-02-'), (d(2024, 2, 1), d(2024, 2, 29)))
+        self.assertEqual(days('2024-02-2'), (d(2024, 2, 20), d(2024, 2, 29)))
+        self.assertEqual(days('2024-03-05'), (d(2024, 3, 5), d(2024, 3, 5)))
+        self.assertIsNone(date_range('2024-13'))
+        self.assertIsNone(date_range('2024-02-3'))
+
+    def test_text_is_split_into_words(self):
+        words, filters = parse_query("McDonald's  2024 lunch")
+        self.assertEqual(words, ['McDonald', 's', 'lunch'])
+        # 2024 could be an amount or a year.
+        self.assertEqual(len(filters), 1)
+        self.assertEqual(filters[0].connector, 'OR')
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='secret')
+        self.other = User.objects.create_user(username='other', password='secret')
+        self.food = Category.objects.create(name='Food')
+        self.travel = Category.objects.create(name='Travel')
+
+    def expense(self, description, amount=10, date=datetime.date(2024, 3, 5), category=None, owner=None):
+        return Expense.objects.create(owner=owner or self.user, amount=amount, date=date,
+                                      category=category or self.food, description=description)
+
+    def found(self, text, spec=EXPENSES):
+        return [row.description for row in search(spec, self.user, text)]
+
+    def test_index_follows_saves_deletes_and_category_renames(self):
+        lunch = self.expense('Team lunch')
+        self.assertEqual(fts_rows('search_expense_fts'), [(lunch.pk, f'u{self.user.pk}', 'Team lunch', 'Food')])
+
+        lunch.description = 'Team dinner'
+        lunch.category = self.travel
+        lunch.save()
+        self.assertEqual(fts_rows('search_expense_fts')[0][2:], ('Team dinner', 'Travel'))
+
+        self.travel.name = 'Trips'
+        self.travel.save()
+        self.assertEqual(self.found('trip'), ['Team dinner'])
+
+        lunch.delete()
+        self.assertEqual(fts_rows('search_expense_fts'), [])
+
+    def test_prefix_words_match_description_or_label_and_rank(self):
+        self.expense('Coffee beans', date=datetime.date(2024, 3, 1))
+        self.expense('Coffee with coffee lovers', date=datetime.date(2024, 3, 2))
+        self.expense('Bus ticket', category=self.travel)
+        self.expense('Coffee', owner=self.other)
+
+        self.assertEqual(self.found('cof'), ['Coffee with coffee lovers', 'Coffee beans'])
+        self.assertEqual(self.found('coffee bea'), ['Coffee beans'])
+        self.assertEqual(self.found('trav'), ['Bus ticket'])
+        self.assertEqual(self.found('tea'), [])
+
+    def test_amounts_and_dates_filter_by_range(self):
+        self.expense('a', amount=12.5, date=datetime.date(2024, 3, 5))
+        self.expense('b', amount=120, date=datetime.date(2024, 4, 1))
+        self.expense('c', amount=12, date=datetime.date(2023, 3, 5))
+        self.assertEqual(sorted(self.found('12')), ['a', 'c'])
+        self.assertEqual(self.found('2024-0'), ['b', 'a'])
+        self.assertEqual(self.found('2024-03 a'), ['a'])
+
+    def test_income_is_indexed_by_source(self):
+        UserIncome.objects.create(owner=self.user, amount=100, date=datetime.date(2024, 3, 5),
+                                  source='Freelance', description='Logo design')
+        self.assertEqual(self.found('free', INCOME), ['Logo design'])
+        self.assertEqual(self.found('logo des', INCOME), ['Logo design'])
+
+    @override_settings(SEARCH_BACKEND='search.backends.DatabaseBackend')
+    def test_database_backend_needs_no_index(self):
+        self.expense('Coffee beans')
+        self.expense('Bus ticket', category=self.travel)
+        self.assertEqual(self.found('cof'), ['Coffee beans'])
+        self.assertEqual(self.found('travel'), ['Bus ticket'])
+
+    def test_rebuild_restores_rows_written_in_bulk(self):
+        Expense.objects.bulk_create([
+            Expense(owner=self.user, amount=1, category=self.food, description='Bulk snack'),
+            Expense(owner=self.other, amount=1, category=self.food, description='Bulk snack'),
+        ])
+        self.assertEqual(self.found('snack'), [])
+        call_command('rebuild_search_index', '--user', str(self.user.pk), stdout=StringIO())
+        self.assertEqual(self.found('snack'), ['Bulk snack'])
+        self.assertEqual(len(fts_rows('search_expense_fts')), 1)
+
+    def test_search_views_use_the_index(self):
+        self.expense('Coffee beans')
+        self.client.login(username='searcher', password='secret')
+        response = self.client.post(reverse('search_expenses'), json.dumps({'searchText': 'coff'}),
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'results': [{
+            'id': Expense.objects.get().pk, 'amount': 10.0, 'date': '2024-03-05',
+            'description': 'Coffee beans', 'category': 'Food',
+        }], 'next': None})
+
+
+@override_settings(SEARCH_PAGE_SIZE=2, SEARCH_MAX_PAGE_SIZE=3)
+class SearchPageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='secret')
+        self.client.login(username='pager', password='secret')
+        food = Category.objects.create(name='Food')
+        # Two rows share a date, so the keyset has to break the tie by id.
+        for i, day in enumerate([1, 2, 2, 3, 4]):
+            Expense.objects.create(owner=self.user, amount=10 + i, date=datetime.date(2024, 3, day),
+                                   category=food, description=f'lunch {"lunch " * i}{i}')
+
+    def post(self, **body):
+        return self.client.post(reverse('search_expenses'), json.dumps(body), content_type='application/json')
+
+    def collect(self, **body):
+        pages, cursor = [], None
+        while True:
+            data = self.post(cursor=cursor, **body).json()
+            pages.append([row['description'][-1] for row in data['results']])
+            cursor = data['next']
+            if cursor is None:
+                return pages
+
+    def test_date_ordered_pages_continue_after_the_last_row(self):
+        self.assertEqual(self.collect(searchText='2024-03'), [['4', '3'], ['2', '1'], ['0']])
+
+    def test_ranked_pages_continue_by_offset(self):
+        self.assertEqual(self.collect(searchText='lunch', limit=3), [['4', '3', '2'], ['1', '0']])
+
+    def test_limit_is_capped_and_fields_are_projected(self):
+        data = self.post(searchText='lunch', limit=50, fields=['amount', 'category']).json()
+        self.assertEqual(data['results'], [{'amount': 14.0, 'category': 'Food'},
+                                           {'amount': 13.0, 'category': 'Food'},
+                                           {'amount': 12.0, 'category': 'Food'}])
+
+    def test_bad_requests_are_rejected(self):
+        cursor = self.post(searchText='lunch').json()['next']
+        self.assertEqual(self.post(searchText='dinner', cursor=cursor).status_code, 400)
+        self.assertEqual(self.post(searchText='lunch', cursor=cursor + 'x').status_code, 400)
+        self.assertEqual(self.post(searchText='lunch', fields=['owner_id']).status_code, 400)
+        self.assertEqual(self.post(searchText='lunch', limit=-1).status_code, 400)
+        for search_text in (5, None, ['lunch']):
+            with self.subTest(searchText=search_text):
+                self.assertEqual(self.post(searchText=search_text).status_code, 400)
+        for body in ('null', '[]', '"lunch"'):
+            with self.subTest(body=body):
+                response = self.client.post(reverse('search_expenses'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        income = self.client.post(reverse('search_income'), json.dumps({'searchText': 'x', 'cursor': cursor}),
+                                  content_type='application/json')
+        self.assertEqual(income.status_code, 400)
+
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.user = User.objects.create_user(username='typist', password='secret')
+        self.client.login(username='typist', password='secret')
+        self.food = Category.objects.create(name='Food')
+        for description in ('Team lunch', 'Lunch', 'Lunch', 'Groceries'):
+            Expense.objects.create(owner=self.user, amount=5, date=datetime.date(2024, 3, 5),
+                                   category=self.food, description=description)
+        other = User.objects.create_user(username='other', password='secret')
+        Expense.objects.create(owner=other, amount=5, category=self.food, description='Lunar eclipse')
+
+    def suggest(self, q, **params):
+        return self.client.get(reverse('suggest_expenses'), {'q': q, **params})
+
+    def test_words_match_by_prefix_most_used_first(self):
+        self.assertEqual(self.suggest('LUN').json(), {'suggestions': ['Lunch', 'Team lunch']})
+        self.assertEqual(self.suggest('team l').json()['suggestions'], ['Team lunch'])
+        self.assertEqual(self.suggest('f').json()['suggestions'], ['Food'])
+        self.assertEqual(self.suggest('', limit=3).json()['suggestions'], [])
+        self.assertEqual(self.suggest('', limit=0).status_code, 400)
+        self.assertEqual(self.suggest('lun', limit=1).json()['suggestions'], ['Lunch'])
+
+    def test_index_is_cached_until_the_owner_writes(self):
+        self.suggest('l')
+        # session, user
+        with self.assertNumQueries(2):
+            self.suggest('gro')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(owner=self.user, amount=5, category=self.food, description='Lunch box')
+        self.assertEqual(self.suggest('lunch').json()['suggestions'], ['Lunch', 'Lunch box', 'Team lunch'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.food.name = 'Meals'
+            self.food.save()
+        self.assertEqual(self.suggest('mea').json()['suggestions'], ['Meals'])
+
+    def test_income_suggests_sources(self):
+        UserIncome.objects.create(owner=self.user, amount=100, date=datetime.date(2024, 3, 5),
+                                  source='Freelance', description='Logo design')
+        response = self.client.get(reverse('suggest_income'), {'q': 'fr'})
+        self.assertEqual(response.json(), {'suggestions': ['Freelance']})
@@ -0,0 +1,37 @@
+# search/views.py
+import json
+
+from django.http import JsonResponse
+
+from .index import search_page
+from .suggestions import suggestions
+
+
+def search_response(request, spec):
+    """
+    Answer a search box request for ``spec``'s rows of the logged-in user.
+
+    The JSON body has ``searchText`` and optionally ``cursor`` (the
+    ``next`` token of the previous page), ``limit`` and ``fields``.
+    """
+    try:
+        body = json.loads(request.body)
+        if not isinstance(body, dict):
+            raise TypeError('the body must be a JSON object')
+        search_text = body.get('searchText', '')
+        if not isinstance(search_text, str):
+            raise TypeError('searchText must be a string')
+        page = search_page(spec, request.user, search_text, cursor=body.get('cursor'),
+                           limit=body.get('limit'), fields=body.get('fields'))
+    except (ValueError, TypeError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(page)
+
+
+def suggestion_response(request, spec):
+    """Answer a typeahead request: ``q`` is what was typed so far and ``limit`` is optional."""
+    try:
+        terms = suggestions(spec, request.user, request.GET.get('q', ''), limit=request.GET.get('limit'))
+    except (ValueError, TypeError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'suggestions': terms})
@@ -0,0 +1,150 @@
+// Search box of the expense and income lists, shared by searchExpenses.js
+// and searchIncome.js, which pass the endpoints and the result fields in
+// column order. Results arrive a page at a time; the next page is
+// fetched when the user scrolls near the end of the table.
+const setUpSearch = ({ searchUrl, suggestUrl, fields }) => {
+  const searchField = document.querySelector("#searchField");
+
+  const tableOutput = document.querySelector(".table-output");
+  const appTable = document.querySelector(".app-table");
+  const paginationContainer = document.querySelector(".pagination-container");
+  tableOutput.style.display = "none";
+  const noResults = document.querySelector(".no-results");
+  const tbody = document.querySelector(".table-body");
+
+  // Typing only sends requests once it pauses: suggestions are cheap (a
+  // cached prefix index), so they wait less than the full search.
+  const SUGGEST_DELAY_MS = 150;
+  const SEARCH_DELAY_MS = 400;
+  let searchText = "";
+  let nextCursor = null;
+  let loading = false;
+  // Aborted when the text changes, cancelling the requests still in flight.
+  let searchController = new AbortController();
+  let suggestController = new AbortController();
+  let suggestTimer = null;
+  let searchTimer = null;
+
+  const suggestionList = document.createElement("datalist");
+  suggestionList.id = "searchSuggestions";
+  searchField.after(suggestionList);
+  searchField.setAttribute("list", suggestionList.id);
+  searchField.setAttribute("autocomplete", "off");
+
+  // Cells are set with textContent, so descriptions, categories and sources
+  // are shown as typed and never parsed as HTML.
+  const renderRows = (rows) => {
+    const fragment = document.createDocumentFragment();
+    rows.forEach((item) => {
+      const row = document.createElement("tr");
+      fields.forEach((field) => {
+        const cell = document.createElement("td");
+        cell.textContent = item[field];
+        row.appendChild(cell);
+      });
+      fragment.appendChild(row);
+    });
+    tbody.appendChild(fragment);
+  };
+
+  const nearBottom = () =>
+    window.innerHeight + window.scrollY >= document.body.offsetHeight - 200;
+
+  const loadMore = () => {
+    if (nextCursor && !loading && nearBottom()) {
+      fetchPage(nextCursor);
+    }
+  };
+
+  const fetchSuggestions = (text) => {
+    const { signal } = suggestController;
+    fetch(`${suggestUrl}?${new URLSearchParams({ q: text })}`, { signal })
+      .then((res) => res.json())
+      .then((data) => {
+        suggestionList.replaceChildren(
+          ...data.suggestions.map((term) => {
+            const option = document.createElement("option");
+            option.value = term;
+            return option;
+          })
+        );
+      })
+      .catch(() => {});
+  };
+
+  const fetchPage = (cursor) => {
+    const { signal } = searchController;
+    loading = true;
+    fetch(searchUrl, {
+      body: JSON.stringify({ searchText, cursor, fields }),
+      method: "POST",
+      signal,
+    })
+      .then((res) => res.json())
+      .then((data) => {
+        loading = false;
+        nextCursor = data.next;
+        appTable.style.display = "none";
+        tableOutput.style.display = "block";
+
+        if (!cursor && data.results.length === 0) {
+          noResults.style.display = "block";
+          tableOutput.style.display = "none";
+        } else {
+          noResults.style.display = "none";
+          renderRows(data.results);
+          // Keep going until the rows fill the window or run out.
+          loadMore();
+        }
+      })
+      .catch(() => {
+        // An aborted search was replaced; the new one resets the state.
+        if (!signal.aborted) {
+          loading = false;
+        }
+      });
+  };
+
+  const startSearch = (searchValue) => {
+    searchText = searchValue;
+    nextCursor = null;
+    loading = false;
+    tbody.innerHTML = "";
+
+    if (searchValue.trim().length > 0) {
+      paginationContainer.style.display = "none";
+      fetchPage(null);
+    } else {
+      tableOutput.style.display = "none";
+      noResults.style.display = "none";
+      appTable.style.display = "block";
+      paginationContainer.style.display = "block";
+    }
+  };
+
+  searchField.addEventListener("input", (e) => {
+    const searchValue = e.target.value;
+    clearTimeout(suggestTimer);
+    suggestController.abort();
+    suggestController = new AbortController();
+    if (searchValue.trim().length > 0) {
+      suggestTimer = setTimeout(() => fetchSuggestions(searchValue), SUGGEST_DELAY_MS);
+    } else {
+      suggestionList.replaceChildren();
+    }
+
+    // Requests in flight are for searchText and stay valid while the text
+    // matches it. Once they are aborted nothing is shown for any text, so the
+    // next pause always starts a search.
+    clearTimeout(searchTimer);
+    if (searchValue !== searchText) {
+      searchController.abort();
+      searchController = new AbortController();
+      searchText = null;
+      nextCursor = null;
+      searchTimer = setTimeout(() => startSearch(searchValue), SEARCH_DELAY_MS);
+    }
+  });
+
+  window.addEventListener("scroll", loadMore);
+};
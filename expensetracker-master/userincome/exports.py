@@ -0,0 +1,158 @@
+# userincome/exports.py
+import csv
+import datetime
+from io import StringIO
+
+import openpyxl
+from django.conf import settings
+from django.db.models import Sum
+from openpyxl.cell import WriteOnlyCell
+
+from expenses.models import Expense
+from .models import UserIncome
+
+
+def parse_report_range(params):
+    """Return (start, end) dates from ``start_date``/``end_date`` params, or raise ValueError."""
+    start = datetime.datetime.strptime(params.get('start_date') or '', '%Y-%m-%d').date()
+    end = datetime.datetime.strptime(params.get('end_date') or '', '%Y-%m-%d').date()
+    if start > end:
+        raise ValueError('Start date cannot be greater than end date.')
+    return start, end
+
+
+def report_querysets(owner, start, end):
+    """The owner's income and expenses in the range, oldest first."""
+    incomes = UserIncome.objects.filter(owner=owner, date__range=(start, end)).order_by('date', 'id')
+    expenses = Expense.objects.filter(owner=owner, date__range=(start, end)).order_by('date', 'id')
+    return incomes, expenses
+
+
+def income_rows(incomes):
+    return incomes.values_list('date', 'source', 'amount').iterator(chunk_size=settings.EXPORT_CHUNK_ROWS)
+
+
+def expense_rows(expenses):
+    # The category name is joined in SQL instead of fetched per row.
+    return expenses.values_list('date', 'category__name', 'amount').iterator(chunk_size=settings.EXPORT_CHUNK_ROWS)
+
+
+def total(queryset):
+    return queryset.aggregate(total=Sum('amount'))['total'] or 0
+
+
+class StreamedReport:
+    """
+    A report read straight from the database, with the same interface as
+    ``report_generation.snapshots.ReportSnapshot``.
+
+    Rows come from ``values_list().iterator()`` each time a section is
+    iterated, so memory stays flat however large the range is, and the
+    totals are summed by the database.
+    """
+
+    def __init__(self, owner, start, end):
+        self.start = start
+        self.end = end
+        self._incomes, self._expenses = report_querysets(owner, start, end)
+
+    @property
+    def incomes(self):
+        return income_rows(self._incomes)
+
+    @property
+    def expenses(self):
+        return expense_rows(self._expenses)
+
+    @property
+    def total_income(self):
+        return total(self._incomes)
+
+    @property
+    def total_expense(self):
+        return total(self._expenses)
+
+
+def iter_csv_report(report):
+    """
+    Yield the CSV of a ``StreamedReport`` or ``ReportSnapshot`` in chunks of ``EXPORT_CHUNK_ROWS`` rows.
+
+    The response starts streaming while later rows are still being read,
+    and only one chunk of text is held at a time. Each total is read once
+    its section has been written.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    # Label the income section
+    writer.writerow(['Income'])
+    writer.writerow(['Date', 'Source', 'Amount'])
+    yield flush()
+    for i, row in enumerate(report.incomes, 1):
+        writer.writerow(row)
+        if i % settings.EXPORT_CHUNK_ROWS == 0:
+            yield flush()
+    writer.writerow(['', f'Total Income: {report.total_income}'])
+
+    # Label the expense section
+    writer.writerow(['Expenses'])
+    writer.writerow(['Date', 'Category', 'Amount'])
+    yield flush()
+    for i, row in enumerate(report.expenses, 1):
+        writer.writerow(row)
+        if i % settings.EXPORT_CHUNK_ROWS == 0:
+            yield flush()
+    writer.writerow([])
+    writer.writerow(['', f'Total Expenses: {report.total_expense}'])
+    yield flush()
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def write_xlsx_report(report, target):
+    """
+    Write a ``StreamedReport`` or ``ReportSnapshot`` as an XLSX workbook to ``target`` (a path or binary file).
+
+    Uses openpyxl's write-only mode, which streams each row to a temporary
+    sheet file as it is appended instead of keeping a cell grid in memory.
+    Income and expenses get their own sheets, with real date and number
+    cells so the columns sort and sum in a spreadsheet.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    _write_sheet(workbook, 'Income', ['Date', 'Source', 'Amount'], report.incomes,
+                 'Total Income', report.total_income)
+    _write_sheet(workbook, 'Expenses', ['Date', 'Category', 'Amount'], report.expenses,
+                 'Total Expenses', report.total_expense)
+    workbook.save(target)
+
+
+def _write_sheet(workbook, title, header, rows, total_label, total_amount):
+    sheet = workbook.create_sheet(title)
+    sheet.column_dimensions['A'].width = 12
+    sheet.column_dimensions['B'].width = 24
+    sheet.column_dimensions['C'].width = 14
+    sheet.append(header)
+
+    # A write-only sheet serialises each row as it is appended, so the two
+    # formatted cells can be refilled for every row instead of rebuilt.
+    date_cell = WriteOnlyCell(sheet)
+    date_cell.number_format = 'yyyy-mm-dd'
+    amount_cell = WriteOnlyCell(sheet)
+    amount_cell.number_format = '#,##0.00'
+
+    def typed(date, label, amount):
+        date_cell.value = date
+        amount_cell.value = amount
+        return [date_cell, label, amount_cell]
+
+    for date, label, amount in rows:
+        sheet.append(typed(date, label, amount))
+    sheet.append([])
+    sheet.append(typed(None, total_label, total_amount))
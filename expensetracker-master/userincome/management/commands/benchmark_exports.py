@@ -0,0 +1,107 @@
+import datetime
+import json
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import ROLLED_BACK_NOTE, PeakRssGrowth, rolled_back, seed_transactions
+from userincome.exports import StreamedReport, iter_csv_report, report_querysets, write_xlsx_report
+
+
+def legacy_xlsx_report(owner, start, end, target):
+    """The previous export: a regular in-memory workbook filled from model instances."""
+    incomes, expenses = report_querysets(owner, start, end)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Income'])
+    for income in incomes:
+        sheet.append([income.date, income.source, income.amount])
+    sheet.append(['Expenses'])
+    for expense in expenses:
+        sheet.append([expense.date, expense.category.name, expense.amount])
+    workbook.save(target)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure CSV and XLSX report export time and memory on synthetic data. ' + ROLLED_BACK_NOTE
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000],
+                            help='Total rows per run, split evenly between income and expenses')
+        parser.add_argument('--formats', nargs='+', choices=['csv', 'xlsx', 'legacy-xlsx'], default=['csv', 'xlsx'])
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='Also record the peak Python heap with tracemalloc (slows the export down)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        results = {'seed': options['seed'], 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'runs': []}
+        self.stdout.write(
+            f"{'rows':>10} {'format':>12} {'seconds':>9} {'first byte ms':>14} {'MB out':>8} "
+            f"{'rss +MB':>8} {'heap MB':>8}")
+        for size in sorted(options['sizes']):
+            with rolled_back():
+                owner, start, end = self.seed(size, options['seed'])
+                for export_format in options['formats']:
+                    run = self.measure(export_format, owner, start, end, options['trace_memory'])
+                    run['rows'] = size
+                    results['runs'].append(run)
+                    heap = run.get('heap_peak_bytes')
+                    self.stdout.write(
+                        f"{size:>10} {export_format:>12} {run['seconds']:>9.2f} "
+                        f"{run['first_byte_ms']:>14.1f} {run['bytes'] / 2 ** 20:>8.1f} "
+                        f"{run['peak_rss_growth_bytes'] / 2 ** 20:>8.1f} "
+                        f"{heap / 2 ** 20 if heap is not None else float('nan'):>8.1f}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def seed(self, size, seed):
+        owner = User.objects.create_user(username=f'export-benchmark-{size}')
+        start = datetime.date(2024, 1, 1)
+        # Exports do not read the rollups, so they are not rebuilt.
+        seed_transactions(owner, size, start, seed=seed)
+        return owner, start, start + datetime.timedelta(days=364)
+
+    def measure(self, export_format, owner, start, end, trace_memory):
+        with PeakRssGrowth() as rss:
+            if trace_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            first_byte = None
+            written = 0
+
+            if export_format == 'csv':
+                for chunk in iter_csv_report(StreamedReport(owner, start, end)):
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    written += len(chunk.encode())
+            else:
+                with tempfile.TemporaryFile() as spool:
+                    if export_format == 'xlsx':
+                        write_xlsx_report(StreamedReport(owner, start, end), spool)
+                    else:
+                        legacy_xlsx_report(owner, start, end, spool)
+                    # The XLSX response can only start once the workbook is complete.
+                    first_byte = time.perf_counter() - started
+                    written = spool.tell()
+
+        run = {
+            'format': export_format,
+            'seconds': round(time.perf_counter() - started, 4),
+            'first_byte_ms': round(first_byte * 1000, 2),
+            'bytes': written,
+            'peak_rss_growth_bytes': rss.bytes,
+        }
+        if trace_memory:
+            run['heap_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return run
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userincome', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='source',
+            index=models.Index(fields=['owner', 'name'], name='source_owner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userincome',
+            index=models.Index(fields=['owner', 'date', 'id'], name='income_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userincome',
+            index=models.Index(fields=['owner', 'amount', 'id'], name='income_owner_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userincome',
+            index=models.Index(fields=['owner', 'source', 'date'], name='income_owner_source_idx'),
+        ),
+    ]
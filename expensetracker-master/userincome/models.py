@@ -17,11 +17,19 @@ class UserIncome(models.Model):
 
     class Meta:
         ordering: ['-date']
+        indexes = [
+            models.Index(fields=['owner', 'date', 'id'], name='income_owner_date_idx'),
+            models.Index(fields=['owner', 'amount', 'id'], name='income_owner_amount_idx'),
+            models.Index(fields=['owner', 'source', 'date'], name='income_owner_source_idx'),
+        ]
 
 
 class Source(models.Model):
     name = models.CharField(max_length=255)
     owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'name'], name='source_owner_name_idx')]
+
     def __str__(self):
         return self.name
@@ -1,3 +1,97 @@
-from django.test import TestCase
+import csv
+import datetime
+from io import BytesIO
 
-# Create your tests here.
+import openpyxl
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from expenses.models import Category, Expense
+from .exports import XLSX_CONTENT_TYPE
+from .models import UserIncome
+
+
+class ExportCsvTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.user = User.objects.create_user(username='exporter', password='secret')
+        other = User.objects.create_user(username='other', password='secret')
+        self.client.login(username='exporter', password='secret')
+        food = Category.objects.create(name='Food')
+        day = datetime.date(2024, 3, 5)
+        for amount in (100, 50.5):
+            UserIncome.objects.create(owner=self.user, amount=amount, date=day, source='Salary')
+        for amount in (12, 8, 4):
+            Expense.objects.create(owner=self.user, amount=amount, date=day, category=food, description='x')
+        UserIncome.objects.create(owner=other, amount=999, date=day, source='Salary')
+        Expense.objects.create(owner=other, amount=999, date=day, category=food, description='x')
+        self.url = reverse('export_csv') + '?start_date=2024-03-01&end_date=2024-03-31'
+
+    def read(self, response):
+        return list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+    expected = [
+        ['Income'], ['Date', 'Source', 'Amount'],
+        ['2024-03-05', 'Salary', '100.0'], ['2024-03-05', 'Salary', '50.5'],
+        ['', 'Total Income: 150.5'],
+        ['Expenses'], ['Date', 'Category', 'Amount'],
+        ['2024-03-05', 'Food', '12.0'], ['2024-03-05', 'Food', '8.0'], ['2024-03-05', 'Food', '4.0'],
+        [], ['', 'Total Expenses: 24.0'],
+    ]
+
+    @override_settings(EXPORT_CHUNK_ROWS=2)
+    def test_streams_the_owners_rows_with_database_totals(self):
+        # session, user, then rows and SUM for each section
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+            self.assertTrue(response.streaming)
+            rows = self.read(response)
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="report_2024-03-01_to_2024-03-31.csv"')
+        self.assertEqual(rows, self.expected)
+
+    def test_reuses_the_snapshot_cached_by_the_report_page(self):
+        self.client.post(reverse('generate-report'), {'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+        # session, user
+        with self.assertNumQueries(2):
+            rows = self.read(self.client.get(self.url))
+        self.assertEqual(rows, self.expected)
+
+    def test_rejects_a_missing_or_inverted_range(self):
+        self.assertEqual(self.client.get(reverse('export_csv')).status_code, 400)
+        response = self.client.get(reverse('export_csv') + '?start_date=2024-03-31&end_date=2024-03-01')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class ExportXlsxTests(TestCase):
+    def setUp(self):
+        caches['dashboards'].clear()
+        self.user = User.objects.create_user(username='sheets', password='secret')
+        other = User.objects.create_user(username='other', password='secret')
+        self.client.login(username='sheets', password='secret')
+        food = Category.objects.create(name='Food')
+        day = datetime.date(2024, 3, 5)
+        UserIncome.objects.create(owner=self.user, amount=100, date=day, source='Salary')
+        Expense.objects.create(owner=self.user, amount=12.5, date=day, category=food, description='x')
+        Expense.objects.create(owner=other, amount=999, date=day, category=food, description='x')
+
+    def test_writes_typed_income_and_expense_sheets(self):
+        response = self.client.get(reverse('export_xlsx') + '?start_date=2024-03-01&end_date=2024-03-31')
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertIn('report_2024-03-01_to_2024-03-31.xlsx', response['Content-Disposition'])
+
+        workbook = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ['Income', 'Expenses'])
+        expenses = list(workbook['Expenses'].values)
+        self.assertEqual(expenses[0], ('Date', 'Category', 'Amount'))
+        self.assertEqual(expenses[1], (datetime.datetime(2024, 3, 5), 'Food', 12.5))
+        self.assertEqual(expenses[-1], (None, 'Total Expenses', 12.5))
+        self.assertEqual(workbook['Income']['A2'].number_format, 'yyyy-mm-dd')
+        self.assertEqual(list(workbook['Income'].values)[-1], (None, 'Total Income', 100))
@@ -10,11 +10,15 @@ urlpatterns = [
     path('income-delete/<int:id>', views.delete_income, name="income-delete"),
     path('search-income', csrf_exempt(views.search_income),
          name="search_income"),
+    path('search-income/suggest', views.suggest_income,
+         name="suggest_income"),
     path('income-summary/',views.income_summary,name="income-summary"),
     path('get_monthly_data/',views.get_monthly_income,name="get_monthly_data"),
     path('report/',views.report,name="report"),
     path('generate-report/',views.generate_report,name="generate-report"),
     path('export_pdf/', views.export_pdf, name='export_pdf'),
+    path('export_pdf/jobs/<uuid:job_id>/', views.pdf_report_status, name='pdf_report_status'),
+    path('export_pdf/jobs/<uuid:job_id>/download/', views.pdf_report_download, name='pdf_report_download'),
     path('export_csv/', views.export_csv, name='export_csv'),
     path('export_xlsx/', views.export_xlsx, name='export_xlsx'),
     path("monthly-income-data/",views.monthly_income_data,name="monthly_income_data")
@@ -1,51 +1,50 @@
-from django.db.models import Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 
 from django.shortcuts import render, redirect,HttpResponseRedirect
 from .models import Source, UserIncome
-from django.core.paginator import Paginator
 from userpreferences.models import UserPreference
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-import json
 from django.http import JsonResponse
 import datetime
 from django.contrib.auth.decorators import login_required
 from datetime import date, timedelta
 
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.contrib import messages
-from django.http import HttpResponse
+import os
+from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
 from .models import UserIncome
-from expenses.models import Expense
-from django.db.models import Sum
-import csv
-import openpyxl
-from io import BytesIO
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+import tempfile
 
 
 from .models import UserIncome
-from django.db.models import Sum
-from django.db.models.functions import ExtractMonth
 from datetime import datetime
+from analytics.dashboard_cache import dashboard_cache
+from analytics.rollups import INCOME
+from analytics.totals import grouped_totals, monthly_series, row_count
+from expenses.pagination import KeysetPaginator, sort_ordering
+from .exports import XLSX_CONTENT_TYPE, StreamedReport, iter_csv_report, parse_report_range, write_xlsx_report
+from report_generation.models import PdfReportJob
+from report_generation.pdf_reports import cached_report, job_path, request_report
+from report_generation.snapshots import cached_snapshot, report_snapshot
+from search import index as search_index
+from search.views import search_response, suggestion_response
 # Create your views here.
 
 @login_required(login_url='/authentication/login')
 
 def search_income(request):
     if request.method == 'POST':
-        search_str = json.loads(request.body).get('searchText')
-        income = UserIncome.objects.filter(
-            amount__istartswith=search_str, owner=request.user) | UserIncome.objects.filter(
-            date__istartswith=search_str, owner=request.user) | UserIncome.objects.filter(
-            description__icontains=search_str, owner=request.user) | UserIncome.objects.filter(
-            source__icontains=search_str, owner=request.user)
-        data = income.values()
-        return JsonResponse(list(data), safe=False)
+        return search_response(request, search_index.INCOME)
+
+
+@login_required(login_url='/authentication/login')
+def suggest_income(request):
+    return suggestion_response(request, search_index.INCOME)
 
 
 @login_required(login_url='/authentication/login')
@@ -55,25 +54,18 @@ def index(request):
 
     sort_order = request.GET.get('sort')
 
-    if sort_order == 'amount_asc':
-        income = income.order_by('amount')
-    elif sort_order == 'amount_desc':
-        income = income.order_by('-amount')
-    elif sort_order == 'date_asc':
-        income = income.order_by('date')
-    elif sort_order == 'date_desc':
-        income = income.order_by('-date')
-
-    paginator = Paginator(income, 5)
-    page_number = request.GET.get('page')
-    page_obj = Paginator.get_page(paginator, page_number)
+    paginator = KeysetPaginator(
+        income, 5, sort_ordering(sort_order),
+        count=lambda: dashboard_cache.get_or_compute(
+            request.user.pk, 'row_count', lambda: row_count(INCOME, request.user), 'income'))
+    page_obj = paginator.get_page(request.GET.get('page'))
     try:
         currency = UserPreference.objects.get(user=request.user).currency
     except:
         currency=None
     total = page_obj.paginator.num_pages
     context = {
-        'income': income,
+        'income': page_obj,
         'page_obj': page_obj,
         'currency': currency,
         'total': total,
@@ -206,24 +198,23 @@ def delete_income(request, id):
 def income_summary(request):
     user = request.user  # Get the logged-in user
 
-    today = timezone.now()
-    one_week_ago = today - timedelta(days=7)
-    first_day_of_month = today.replace(day=1)
-    first_day_of_year = today.replace(month=1, day=1)
-
-    # Query the database to get daily, weekly, monthly, and yearly income for the logged-in user
-    daily_income = user.userincome_set.filter(date=today).aggregate(Sum('amount'))['amount__sum'] or 0
-    weekly_income = user.userincome_set.filter(date__range=[one_week_ago, today]).aggregate(Sum('amount'))['amount__sum'] or 0
-    monthly_income = user.userincome_set.filter(date__month=today.month).aggregate(Sum('amount'))['amount__sum'] or 0
-    yearly_income = user.userincome_set.filter(date__year=today.year).aggregate(Sum('amount'))['amount__sum'] or 0
+    def summarize():
+        today = timezone.localdate()
+        one_week_ago = today - timedelta(days=7)
+        first_day_of_month = today.replace(day=1)
+        first_day_of_year = today.replace(month=1, day=1)
+
+        # One GROUP BY over this year's daily rollups instead of four scans of UserIncome
+        days = grouped_totals(INCOME, user, min(one_week_ago, first_day_of_year), today, bucket='day')
+        return {
+            'daily_income': sum(row['total'] for row in days if row['bucket'] == today),
+            'weekly_income': sum(row['total'] for row in days if row['bucket'] >= one_week_ago),
+            'monthly_income': sum(row['total'] for row in days if row['bucket'] >= first_day_of_month),
+            'yearly_income': sum(row['total'] for row in days if row['bucket'] >= first_day_of_year),
+        }
 
-    context = {
-        'daily_income': daily_income,
-        'weekly_income': weekly_income,
-        'monthly_income': monthly_income,
-        'yearly_income': yearly_income,
-        # You can add more context data here if needed
-    }
+    # Served from the per-user cache until this user's data changes
+    context = dashboard_cache.get_or_compute(user.pk, 'income_summary', summarize)
     return render(request, 'income/dashboard.html', context)
 
 # @login_required(login_url='/authentication/login')
@@ -256,219 +247,132 @@ def income_summary(request):
 
 from datetime import datetime
 
+@login_required(login_url='/authentication/login')
 def monthly_income_data(request):
     # Get the current year
     current_year = datetime.now().year
 
-    # Initialize a list to store monthly income data for the current year
-    monthly_income_data = [0] * 12  # Initialize with zeros for 12 months
-
-    # Get the monthly income data for the current year, grouped by month
-    monthly_data = (
-        UserIncome.objects
-        .filter(date__year=current_year)  # Filter for the current year
-        .annotate(month=ExtractMonth('date'))
-        .values('month')
-        .annotate(total_income=Sum('amount'))
-        .order_by('month')
-    )
-
-    # Populate the list with the income data
-    for item in monthly_data:
-        month_index = item['month'] - 1  # Subtract 1 to convert month to zero-based index
-        monthly_income_data[month_index] = item['total_income']
+    # Monthly totals for the current year, one GROUP BY over the rollups
+    monthly_income_data = dashboard_cache.get_or_compute(
+        request.user.pk, 'monthly_income', lambda: monthly_series(INCOME, request.user, current_year), current_year)
 
     # Return the data as JSON
     return JsonResponse({'monthly_income_data': monthly_income_data})
 
 
-
-
-
-
-
 @login_required(login_url='/authentication/login')
 def get_monthly_income(request):
     today = date.today()
-    first_day_of_year = today.replace(month=1, day=1)
-    last_day_of_year = today.replace(month=12, day=31)
-
-    # Create a list to hold income data for all 12 months
-    monthly_data = [0] * 12
 
-    # Retrieve and fill in the actual monthly income data
-    income_data = UserIncome.objects.filter(
-        date__range=(first_day_of_year, last_day_of_year),
-        owner=request.user
-    ).values('date', 'amount')
-
-    for entry in income_data:
-        month = entry['date'].month - 1  # Convert month (1-12) to index (0-11)
-        monthly_data[month] = entry['amount']
+    # Every entry in a month is summed into that month's total
+    monthly_data = dashboard_cache.get_or_compute(
+        request.user.pk, 'monthly_income', lambda: monthly_series(INCOME, request.user, today.year), today.year)
 
     return JsonResponse({'monthly_data': monthly_data})
 
 
+@login_required(login_url='/authentication/login')
+def export_pdf(request):
+    try:
+        start_date, end_date = parse_report_range(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('start_date and end_date must be valid YYYY-MM-DD dates, start first')
+
+    # A report already rendered for the current data is just a file send.
+    path = cached_report(request.user.pk, start_date, end_date)
+    if path is not None:
+        return pdf_file_response(path, start_date, end_date)
+
+    job = request_report(request.user, start_date, end_date)
+    if job.status == PdfReportJob.DONE:
+        return redirect('pdf_report_download', job_id=job.pk)
+    if request.headers.get('Accept') == 'application/json':
+        return JsonResponse(pdf_job_data(job), status=202)
+    return render(request, 'income/pdf_report.html', {'job': pdf_job_data(job)}, status=202)
+
+
+def pdf_file_response(path, start_date, end_date):
+    return FileResponse(open(path, 'rb'), as_attachment=True,
+                        filename=f'report_{start_date}_to_{end_date}.pdf', content_type='application/pdf')
+
+
+def pdf_job_data(job):
+    return {
+        'id': str(job.pk),
+        'status': job.status,
+        'error': job.error,
+        'status_url': reverse('pdf_report_status', args=[job.pk]),
+        'download_url': reverse('pdf_report_download', args=[job.pk]),
+    }
 
 
-
-def render_to_pdf(template_path, context_dict):
-    template = get_template(template_path)
-    html = template.render(context_dict)
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type="application/pdf")
-        response["Content-Disposition"] = 'attachment; filename="expense_report.pdf"'
-        return response
-    return HttpResponse("Error rendering PDF", status=400)
+@login_required(login_url='/authentication/login')
+def pdf_report_status(request, job_id):
+    job = get_object_or_404(PdfReportJob, pk=job_id, owner=request.user)
+    return JsonResponse(pdf_job_data(job))
 
 
-def export_pdf(request):
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    incomes = UserIncome.objects.filter(date__range=[start_date, end_date])
-    expenses = Expense.objects.filter(date__range=[start_date, end_date])
-    
-    total_income = incomes.aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expense = expenses.aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    savings = total_income - total_expense
-    
-    context = {
-        'incomes': incomes,
-        'expenses': expenses,
-        'total_income': total_income,
-        'total_expense': total_expense,
-        'savings': savings,
-        'start_date': start_date,
-        'end_date': end_date,
-    }
-    
-    pdf = render_to_pdf('income/pdf_template.html', context)
-    return pdf
+@login_required(login_url='/authentication/login')
+def pdf_report_download(request, job_id):
+    job = get_object_or_404(PdfReportJob, pk=job_id, owner=request.user)
+    path = job_path(job)
+    if job.status != PdfReportJob.DONE or not os.path.exists(path):
+        # Not rendered yet, failed, or replaced by a newer version of the data.
+        return JsonResponse(pdf_job_data(job), status=409)
+    return pdf_file_response(path, job.start_date, job.end_date)
 
 @login_required(login_url='/authentication/login')
 def report(request):
     report_generated=False
     return render(request, 'income/report.html',{'report_generated':report_generated})
 
+@login_required(login_url='/authentication/login')
 def generate_report(request):
     if request.method == "POST":
-        start_date = request.POST.get('start_date')
-        end_date = request.POST.get('end_date')
-        user = request.user
-        report_generated=True
-
-        if start_date > end_date:
+        try:
+            start_date, end_date = parse_report_range(request.POST)
+        except ValueError:
             messages.error(request, "Start date cannot be greater than end date.")
             return redirect('report')
 
-        # incomes = UserIncome.objects.filter(date__range=[start_date, end_date])
-        # expenses = Expense.objects.filter(date__range=[start_date, end_date])
-
-        incomes = UserIncome.objects.filter(owner=user, date__range=[start_date, end_date])
-        expenses = Expense.objects.filter(owner=user, date__range=[start_date, end_date])
-
-        total_income = incomes.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = expenses.aggregate(Sum('amount'))['amount__sum'] or 0
-
-        savings = total_income - total_expense
-        
-        context = {
-            'incomes': incomes,
-            'expenses': expenses,
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'savings': savings,
-            'start_date': start_date,
-            'end_date': end_date,
-            'report_generated':report_generated
-        }
-
+        # The exports linked from the page reuse this snapshot from the cache.
+        context = report_snapshot(request.user.pk, start_date, end_date).context()
+        context['report_generated'] = True
         return render(request, 'income/report.html', context)
     else:
         
         return render(request, 'income/report.html')
 
+def export_report(owner, start_date, end_date):
+    """The snapshot cached by the report page if there is one, else the rows streamed from the database."""
+    snapshot = cached_snapshot(owner.pk, start_date, end_date)
+    return snapshot if snapshot is not None else StreamedReport(owner, start_date, end_date)
+
+@login_required(login_url='/authentication/login')
 def export_csv(request):
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    incomes = UserIncome.objects.filter(date__range=[start_date, end_date])
-    expenses = Expense.objects.filter(date__range=[start_date, end_date])
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="report_{start_date}_to_{end_date}.csv'
-    
-    writer = csv.writer(response)
-    
-    # Label the income section
-    writer.writerow(['Income'])
-    writer.writerow(['Date', 'Source', 'Amount'])
-    
-    income_total = 0
-    for income in incomes:
-        writer.writerow([income.date, income.source, income.amount])
-        income_total += income.amount
-    
-    # Display the total income
-    writer.writerow(['', f'Total Income: {income_total}'])
-
-    # Label the expense section
-    writer.writerow(['Expenses'])
-    writer.writerow(['Date', 'Category', 'Amount'])
-    
-    expense_total = 0
-    for expense in expenses:
-        writer.writerow([expense.date, expense.category, expense.amount])
-        expense_total += expense.amount
-    
-    # Add an empty line
-    writer.writerow([])
-    
-    # Display the total expense
-    writer.writerow(['', f'Total Expenses: {expense_total}'])
-    
+    try:
+        start_date, end_date = parse_report_range(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('start_date and end_date must be valid YYYY-MM-DD dates, start first')
+
+    # Streamed chunk by chunk, so the first byte goes out before the whole
+    # report has been read and memory does not grow with the row count.
+    report = export_report(request.user, start_date, end_date)
+    response = StreamingHttpResponse(iter_csv_report(report), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="report_{start_date}_to_{end_date}.csv"'
     return response
 
+@login_required(login_url='/authentication/login')
 def export_xlsx(request):
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    incomes = UserIncome.objects.filter(date__range=[start_date, end_date])
-    expenses = Expense.objects.filter(date__range=[start_date, end_date])
-    
-    response = HttpResponse(content_type='application/ms-excel')
-    response['Content-Disposition'] = f'attachment; filename="report_{start_date}_to_{end_date}.xlsx"'
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    
-    # Label the income section
-    ws.append(['Income'])
-    ws.append(['Date', 'Source', 'Amount'])
-    
-    income_total = 0
-    for income in incomes:
-        ws.append([income.date, income.source, income.amount])
-        income_total += income.amount
-    
-    # Display the total income
-    ws.append(['', f'Total Income: {income_total}'])
-
-    # Label the expense section
-    ws.append(['Expenses'])
-    ws.append(['Date', 'Category', 'Amount'])
-    
-    expense_total = 0
-    for expense in expenses:
-        ws.append([expense.date, expense.category, expense.amount])
-        expense_total += expense.amount
-    
-    # Add an empty line
-    ws.append([])
-    
-    # Display the total expense
-    ws.append(['', f'Total Expenses: {expense_total}'])
-    
-    wb.save(response)
-    return response
+    try:
+        start_date, end_date = parse_report_range(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('start_date and end_date must be valid YYYY-MM-DD dates, start first')
+
+    # Built in write-only mode into a temporary file, then streamed back
+    # from disk; FileResponse closes (and so deletes) the file when done.
+    spool = tempfile.TemporaryFile()
+    write_xlsx_report(export_report(request.user, start_date, end_date), spool)
+    spool.seek(0)
+    return FileResponse(
+        spool, as_attachment=True, filename=f'report_{start_date}_to_{end_date}.xlsx', content_type=XLSX_CONTENT_TYPE)